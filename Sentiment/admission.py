@@ -0,0 +1,207 @@
+"""Admission control in front of the Ollama call sites.
+
+At most LLM_MAX_IN_FLIGHT generations run at once per worker process; further callers
+wait in per-tenant (company) FIFO queues that are served round-robin, so one large
+company cannot starve the others. Interactive callers are rejected immediately with
+AdmissionRejected (HTTP 429 + Retry-After) once the waiting queue is full
+(LLM_MAX_QUEUE overall, LLM_MAX_QUEUE_PER_TENANT per company), or with HTTP 503 after
+waiting LLM_QUEUE_TIMEOUT seconds. Background work (company analyses) waits instead
+of being rejected but still takes its turn in the fair queue.
+"""
+import os
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional
+
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+
+
+class AdmissionRejected(Exception):
+    """Raised when an LLM call is not admitted; carries the HTTP status and Retry-After."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("tenant", "event", "granted")
+
+    def __init__(self, tenant: str):
+        self.tenant = tenant
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AdmissionController:
+    """Bounded in-flight counter with a round-robin fair queue per tenant."""
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_queue_per_tenant: int, queue_timeout: float):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.max_queue_per_tenant = max(0, max_queue_per_tenant)
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        # Tenants with waiting callers, in round-robin order
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+
+        self._admitted = 0
+        self._queued = 0
+        self._rejected_queue_full = 0
+        self._rejected_tenant_full = 0
+        self._timeouts = 0
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+        self._service_time_total = 0.0
+        self._completed = 0
+
+    # ---------- internal helpers (lock held) ----------
+    def _retry_after(self) -> int:
+        avg_service = self._service_time_total / self._completed if self._completed else 10.0
+        return max(1, math.ceil(avg_service * (self._waiting + 1) / self.max_in_flight))
+
+    def _grant_next(self) -> None:
+        while self._in_flight < self.max_in_flight and self._queues:
+            tenant, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(tenant)
+            else:
+                del self._queues[tenant]
+            self._waiting -= 1
+            self._in_flight += 1
+            waiter.granted = True
+            waiter.event.set()
+
+    def _record_admit(self, queued_for: float) -> None:
+        self._admitted += 1
+        self._queue_time_total += queued_for
+        self._queue_time_max = max(self._queue_time_max, queued_for)
+        metrics.ADMISSION_WAIT.observe(queued_for)
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.ADMISSION_IN_FLIGHT.set(self._in_flight)
+        metrics.ADMISSION_WAITING.set(self._waiting)
+
+    # ---------- public API ----------
+    def acquire(self, tenant: Optional[str] = None, reject_when_full: bool = True) -> None:
+        tenant = str(tenant or DEFAULT_TENANT)
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._queues:
+                self._in_flight += 1
+                self._record_admit(0.0)
+                return
+
+            if reject_when_full:
+                if self._waiting >= self.max_queue:
+                    self._rejected_queue_full += 1
+                    raise AdmissionRejected(
+                        f"LLM queue is full ({self._waiting} waiting)", 429, self._retry_after()
+                    )
+                if len(self._queues.get(tenant, ())) >= self.max_queue_per_tenant:
+                    self._rejected_tenant_full += 1
+                    raise AdmissionRejected(
+                        f"Too many queued LLM requests for {tenant}", 429, self._retry_after()
+                    )
+
+            waiter = _Waiter(tenant)
+            self._queues.setdefault(tenant, deque()).append(waiter)
+            self._waiting += 1
+            self._queued += 1
+            self._publish()
+
+        start = time.monotonic()
+        waiter.event.wait(self.queue_timeout if reject_when_full else None)
+        queued_for = time.monotonic() - start
+
+        with self._lock:
+            if not waiter.granted:
+                queue = self._queues.get(tenant)
+                if queue is not None:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._queues[tenant]
+                self._waiting -= 1
+                self._timeouts += 1
+                self._publish()
+                raise AdmissionRejected(
+                    f"Timed out after {queued_for:.0f}s waiting for an LLM slot", 503, self._retry_after()
+                )
+            self._record_admit(queued_for)
+
+    def release(self, service_time: float = 0.0) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+            self._service_time_total += service_time
+            self._grant_next()
+            self._publish()
+
+    @contextmanager
+    def slot(self, tenant: Optional[str] = None, reject_when_full: bool = True):
+        """Hold one LLM slot for the duration of the block."""
+        self.acquire(tenant, reject_when_full)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "waiting_by_tenant": {tenant: len(q) for tenant, q in self._queues.items()},
+                "admitted": self._admitted,
+                "queued": self._queued,
+                "rejected_queue_full": self._rejected_queue_full,
+                "rejected_tenant_full": self._rejected_tenant_full,
+                "timeouts": self._timeouts,
+                "queue_time_avg_ms": round(self._queue_time_total / self._admitted * 1000, 2) if self._admitted else 0.0,
+                "queue_time_max_ms": round(self._queue_time_max * 1000, 2),
+                "service_time_avg_ms": round(self._service_time_total / self._completed * 1000, 2) if self._completed else 0.0,
+            }
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                max_queue = int(os.getenv("LLM_MAX_QUEUE", 32))
+                _controller = AdmissionController(
+                    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", 4)),
+                    max_queue=max_queue,
+                    max_queue_per_tenant=int(os.getenv("LLM_MAX_QUEUE_PER_TENANT", max(1, max_queue // 2))),
+                    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", 60)),
+                )
+    return _controller
+
+
+def slot(tenant: Optional[str] = None, reject_when_full: bool = True):
+    return get_controller().slot(tenant, reject_when_full)
+
+
+def admission_stats() -> Dict[str, object]:
+    return get_controller().stats()
@@ -0,0 +1,293 @@
+"""Content-addressed cache for per-employee sentiment analyses.
+
+The key is a SHA-256 over the normalised survey text (the output of
+``format_survey_responses_for_flask``), the model name, the prompt template version
+and the temperature, so resubmitting the same answers skips the model entirely.
+
+Tiers:
+- memory: per-process LRU with TTL (always on while the cache is enabled)
+- shared (optional, ANALYSIS_CACHE_SHARED): 'sqlite' for an on-disk file shared by
+  the worker processes on one host, or 'mysql' for a table shared by every host
+  (see migrations/002_analysis_cache.sql)
+
+Configuration: ANALYSIS_CACHE_ENABLED (true), ANALYSIS_CACHE_TTL seconds (86400),
+ANALYSIS_CACHE_MAX_ENTRIES (1024, memory tier), ANALYSIS_CACHE_SHARED_MAX_ENTRIES
+(100000), ANALYSIS_CACHE_SQLITE_PATH.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import db_pool
+
+
+logger = logging.getLogger(__name__)
+
+MISS = "miss"
+MEMORY = "memory"
+SHARED = "shared"
+
+# Expired/excess rows are trimmed from the shared tier once every this many writes
+_PRUNE_EVERY = 200
+
+
+def normalize_survey_text(text: str) -> str:
+    """Canonical form of the formatted survey: NFC, trimmed lines, collapsed whitespace."""
+    text = unicodedata.normalize("NFC", text)
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def cache_key(survey_text: str, model: str, prompt_version: str, temperature: float) -> str:
+    material = json.dumps(
+        {
+            "survey": normalize_survey_text(survey_text),
+            "model": model,
+            "prompt_version": prompt_version,
+            "temperature": float(temperature),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def prompt_version(template: str) -> str:
+    """Short, stable version id for a prompt template (changes whenever the text does)."""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+
+class MemoryTier:
+    """Thread-safe LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteTier:
+    """On-disk tier shared by the worker processes of one host."""
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_cache ("
+            " cache_key TEXT PRIMARY KEY, analysis TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_access ON analysis_cache (last_access)")
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis FROM analysis_cache WHERE cache_key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE analysis_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (cache_key, analysis, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM analysis_cache WHERE expires_at <= ?", (now,))
+                self._conn.execute(
+                    "DELETE FROM analysis_cache WHERE cache_key IN ("
+                    " SELECT cache_key FROM analysis_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+
+class MySQLTier:
+    """Tier stored in the ForteAI database, shared by every host (uses the connection pool)."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with db_pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(
+                    "SELECT analysis FROM analysis_cache WHERE cache_key = %s AND expires_at > NOW()", (key,)
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                cursor.execute("UPDATE analysis_cache SET last_access = NOW() WHERE cache_key = %s", (key,))
+                connection.commit()
+            finally:
+                cursor.close()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY == 0
+
+        with db_pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(
+                    "INSERT INTO analysis_cache (cache_key, analysis, expires_at, last_access) "
+                    "VALUES (%s, %s, NOW() + INTERVAL %s SECOND, NOW()) "
+                    "ON DUPLICATE KEY UPDATE analysis = VALUES(analysis), "
+                    "expires_at = VALUES(expires_at), last_access = NOW()",
+                    (key, json.dumps(value), int(self.ttl)),
+                )
+                if prune:
+                    cursor.execute("DELETE FROM analysis_cache WHERE expires_at <= NOW()")
+                    cursor.execute("SELECT COUNT(*) FROM analysis_cache")
+                    excess = cursor.fetchone()[0] - self.max_entries
+                    if excess > 0:
+                        cursor.execute("DELETE FROM analysis_cache ORDER BY last_access LIMIT %s", (excess,))
+                connection.commit()
+            finally:
+                cursor.close()
+
+
+class AnalysisCache:
+    """Memory tier in front of an optional shared tier, with hit/miss counters."""
+
+    def __init__(self, memory: MemoryTier, shared=None):
+        self.memory = memory
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._counts = {"memory_hits": 0, "shared_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def get(self, key: str) -> Tuple[Optional[dict], str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value, MEMORY
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Shared analysis cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.memory.put(key, value)
+                self._count("shared_hits")
+                return value, SHARED
+
+        self._count("misses")
+        return None, MISS
+
+    def put(self, key: str, value: dict) -> None:
+        self.memory.put(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, value)
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Shared analysis cache write failed: {e}")
+        self._count("stores")
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts["memory_hits"] + counts["shared_hits"] + counts["misses"]
+        hits = counts["memory_hits"] + counts["shared_hits"]
+        return dict(
+            counts,
+            memory_entries=len(self.memory),
+            shared_tier=type(self.shared).__name__ if self.shared is not None else None,
+            hit_rate=round(hits / lookups, 4) if lookups else 0.0,
+        )
+
+
+def _default_sqlite_path() -> str:
+    base = os.path.join(os.path.dirname(__file__), "cache")
+    os.makedirs(base, exist_ok=True)
+    return os.path.join(base, "analysis_cache.sqlite3")
+
+
+_cache: Optional[AnalysisCache] = None
+_cache_pid: Optional[int] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[AnalysisCache]:
+    """Return the process-wide cache, or None when ANALYSIS_CACHE_ENABLED is false."""
+    global _cache, _cache_pid
+    if os.getenv("ANALYSIS_CACHE_ENABLED", "True").lower() != "true":
+        return None
+    pid = os.getpid()
+    if _cache is not None and _cache_pid == pid:
+        return _cache
+
+    with _cache_lock:
+        if _cache is None or _cache_pid != pid:
+            ttl = float(os.getenv("ANALYSIS_CACHE_TTL", 86400))
+            shared_max = int(os.getenv("ANALYSIS_CACHE_SHARED_MAX_ENTRIES", 100000))
+            backend = os.getenv("ANALYSIS_CACHE_SHARED", "").lower()
+            shared = None
+            if backend == "sqlite":
+                shared = SQLiteTier(os.getenv("ANALYSIS_CACHE_SQLITE_PATH") or _default_sqlite_path(), shared_max, ttl)
+            elif backend == "mysql":
+                shared = MySQLTier(shared_max, ttl)
+            elif backend:
+                logger.warning(f"Unknown ANALYSIS_CACHE_SHARED backend '{backend}', using memory tier only")
+            _cache = AnalysisCache(MemoryTier(int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 1024)), ttl), shared)
+            _cache_pid = pid
+    return _cache
+
+
+def cache_stats() -> Dict[str, object]:
+    cache = get_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
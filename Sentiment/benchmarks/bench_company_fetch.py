@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-employee (N+1) vs set-based fetch of company survey responses.
+
+Uses an in-memory SQLite stand-in with the same table/column names as the ForteAI
+MySQL schema and the indexes from migrations/001_company_employee_data_indexes.sql.
+Each query execution counts as one round trip; --rtt-ms adds a simulated network
+round-trip time per execution so the numbers resemble a remote MySQL server.
+
+    python benchmarks/bench_company_fetch.py --sizes 10 100 500 2000 --rtt-ms 0.5
+"""
+import argparse
+import sqlite3
+import time
+
+QUESTIONS = 25
+
+SCHEMA = """
+CREATE TABLE employees (employeesID INTEGER PRIMARY KEY, name TEXT, company_id INTEGER, role TEXT, is_filled INTEGER);
+CREATE TABLE masterquestions_sentiment (master_question_id INTEGER PRIMARY KEY, question_number INTEGER);
+CREATE TABLE formquestions_sentiment (form_question_id INTEGER PRIMARY KEY, master_question_id INTEGER, question_text TEXT);
+CREATE TABLE responses_sentiment (id INTEGER PRIMARY KEY, employeesID INTEGER, form_question_id INTEGER,
+                                  answer_text TEXT, answer_choice TEXT);
+CREATE INDEX idx_employees_company_filled_role ON employees (company_id, is_filled, role, employeesID, name);
+CREATE INDEX idx_responses_sentiment_employee_question ON responses_sentiment (employeesID, form_question_id);
+"""
+
+EMPLOYEES_QUERY = """
+SELECT employeesID, name FROM employees
+WHERE company_id = ? AND role != 'HR' AND COALESCE(is_filled, 0) = 1
+ORDER BY employeesID
+"""
+
+PER_EMPLOYEE_QUERY = """
+SELECT rs.form_question_id, rs.answer_text, rs.answer_choice, fq.master_question_id,
+       mq.question_number, fq.question_text
+FROM responses_sentiment rs
+JOIN formquestions_sentiment fq ON rs.form_question_id = fq.form_question_id
+JOIN masterquestions_sentiment mq ON fq.master_question_id = mq.master_question_id
+WHERE rs.employeesID = ?
+ORDER BY mq.question_number
+"""
+
+# Mirrors main.COMPANY_RESPONSES_QUERY (SQLite placeholders)
+COMPANY_QUERY = """
+SELECT e.employeesID, e.name, rs.form_question_id, rs.answer_text, rs.answer_choice,
+       fq.master_question_id, mq.question_number, fq.question_text
+FROM employees e
+JOIN responses_sentiment rs ON rs.employeesID = e.employeesID
+JOIN formquestions_sentiment fq ON rs.form_question_id = fq.form_question_id
+JOIN masterquestions_sentiment mq ON fq.master_question_id = mq.master_question_id
+WHERE e.company_id = ? AND e.role != 'HR' AND e.is_filled = 1
+ORDER BY e.employeesID, mq.question_number
+"""
+
+
+class CountingCursor:
+    """Wraps a cursor, counting executions and simulating network round-trip time."""
+
+    def __init__(self, cursor, rtt_s):
+        self._cursor = cursor
+        self._rtt_s = rtt_s
+        self.round_trips = 0
+
+    def execute(self, sql, params=()):
+        self.round_trips += 1
+        if self._rtt_s:
+            time.sleep(self._rtt_s)
+        return self._cursor.execute(sql, params)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+
+def build_db(company_size):
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    conn.executemany(
+        "INSERT INTO masterquestions_sentiment VALUES (?, ?)",
+        [(q, q) for q in range(1, QUESTIONS + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO formquestions_sentiment VALUES (?, ?, ?)",
+        [(q, q, f"Question {q}?") for q in range(1, QUESTIONS + 1)],
+    )
+    # Target company 1 plus an equally sized neighbour so the filters have work to do
+    employees = []
+    responses = []
+    emp_id = 0
+    for company_id in (1, 2):
+        for i in range(company_size):
+            emp_id += 1
+            role = "HR" if i % 50 == 0 else "Employee"
+            employees.append((emp_id, f"Employee {emp_id}", company_id, role, 1))
+            for q in range(1, QUESTIONS + 1):
+                responses.append((emp_id, q, f"Answer {q} from {emp_id}", None))
+    conn.executemany("INSERT INTO employees VALUES (?, ?, ?, ?, ?)", employees)
+    conn.executemany(
+        "INSERT INTO responses_sentiment (employeesID, form_question_id, answer_text, answer_choice) "
+        "VALUES (?, ?, ?, ?)",
+        responses,
+    )
+    conn.commit()
+    return conn
+
+
+def _answer(row):
+    return (row["answer_text"] if row["answer_text"] else row["answer_choice"]) or "No response"
+
+
+def fetch_n_plus_one(cursor, company_id):
+    cursor.execute(EMPLOYEES_QUERY, (company_id,))
+    data = []
+    for emp in cursor.fetchall():
+        cursor.execute(PER_EMPLOYEE_QUERY, (emp["employeesID"],))
+        responses = {
+            f"q{r['question_number']}": {"question": r["question_text"], "answer": _answer(r)}
+            for r in cursor.fetchall()
+        }
+        if responses:
+            data.append({"employeesID": emp["employeesID"], "name": emp["name"], "responses": responses})
+    return data
+
+
+def fetch_set_based(cursor, company_id, batch_size=1000):
+    cursor.execute(COMPANY_QUERY, (company_id,))
+    employees = {}
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        for r in batch:
+            emp = employees.get(r["employeesID"])
+            if emp is None:
+                emp = employees[r["employeesID"]] = {
+                    "employeesID": r["employeesID"], "name": r["name"], "responses": {}
+                }
+            emp["responses"][f"q{r['question_number']}"] = {
+                "question": r["question_text"], "answer": _answer(r)
+            }
+    return list(employees.values())
+
+
+def run(fetch, conn, rtt_s):
+    cursor = CountingCursor(conn.cursor(), rtt_s)
+    start = time.perf_counter()
+    data = fetch(cursor, 1)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return data, cursor.round_trips, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 2000])
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="simulated network round-trip time per query")
+    args = parser.parse_args()
+    rtt_s = args.rtt_ms / 1000
+
+    print(f"Simulated RTT per round trip: {args.rtt_ms} ms")
+    print(f"{'employees':>10} | {'N+1 trips':>9} | {'N+1 ms':>9} | {'set trips':>9} | {'set ms':>9} | {'speedup':>7}")
+    print("-" * 68)
+    for size in args.sizes:
+        conn = build_db(size)
+        old, old_trips, old_ms = run(fetch_n_plus_one, conn, rtt_s)
+        new, new_trips, new_ms = run(fetch_set_based, conn, rtt_s)
+        assert old == new, "set-based fetch must return the same data as the N+1 fetch"
+        print(f"{size:>10} | {old_trips:>9} | {old_ms:>9.1f} | {new_trips:>9} | {new_ms:>9.1f} | {old_ms / new_ms:>6.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
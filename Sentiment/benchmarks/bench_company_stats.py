@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vectorized company sentiment statistics (company_stats.compute_stats) versus
+the same numbers computed row by row in pure Python.
+
+Synthetic companies get Dirichlet-distributed positive/neutral/negative percentages
+and a role label per employee, like rows of responses_langchain_sentiment joined to
+employees. Times exclude the database fetch.
+
+    python benchmarks/bench_company_stats.py --sizes 100 1000 10000 100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import company_stats  # noqa: E402
+
+ROLES = ["engineering", "operations", "sales", "support", "finance", "marketing"]
+
+
+def synthetic_company(n, seed=0):
+    rng = np.random.default_rng(seed)
+    scores = np.round(rng.dirichlet([4, 2.5, 1.5], size=n) * 100)
+    return scores, rng.choice(ROLES, size=n).tolist()
+
+
+def python_stats(rows, groups):
+    """Row-by-row reference for the main statistics (means, medians, percentiles, histogram, groups)."""
+    columns = list(zip(*rows))
+    result = {
+        "mean": [statistics.fmean(c) for c in columns],
+        "median": [statistics.median(c) for c in columns],
+        "std": [statistics.pstdev(c) for c in columns],
+        "percentiles": [statistics.quantiles(c, n=20, method="inclusive") for c in columns],
+        "distribution": [[sum(1 for v in c if lo <= v < lo + 10 or (lo == 90 and v == 100)) for lo in range(0, 100, 10)]
+                         for c in columns],
+    }
+    dominant = [0, 0, 0]
+    by_group = defaultdict(list)
+    for row, group in zip(rows, groups):
+        dominant[max(range(3), key=lambda i: (row[i], -i))] += 1
+        by_group[group].append(row)
+    result["dominant"] = dominant
+    result["groups"] = {g: ([statistics.fmean(c) for c in zip(*r)], [statistics.median(c) for c in zip(*r)])
+                        for g, r in by_group.items()}
+    return result
+
+
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'employees':>10} | {'numpy ms':>10} | {'python ms':>10} | {'speedup':>8}")
+    print("-" * 48)
+    for n in args.sizes:
+        scores, groups = synthetic_company(n)
+        rows = scores.tolist()
+
+        vectorized = best_of(args.repeat, lambda: company_stats.compute_stats(scores, groups))
+        reference = best_of(max(1, args.repeat // 2), lambda: python_stats(rows, groups))
+
+        # Sanity check: both paths agree on the means
+        stats = company_stats.compute_stats(scores, groups)
+        expected = python_stats(rows, groups)["mean"]
+        assert all(abs(stats["mean"][f] - m) < 0.01 for f, m in zip(company_stats.SENTIMENT_FIELDS, expected))
+
+        print(f"{n:>10} | {vectorized:>10.2f} | {reference:>10.2f} | {reference / vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request overhead of building ChatOllama/PromptTemplate/LLMChain and a new
+HTTP client on every call, versus reusing them from llm_registry.
+
+Two measurements:
+1. Object construction - ChatOllama + PromptTemplate + LLMChain per request vs registry lookup.
+2. HTTP round trip to Ollama - new ollama.Client per request (new TCP connection) vs the
+   shared keep-alive client. Uses GET /api/version so no model time is included.
+
+    python benchmarks/bench_llm_registry.py --requests 200 --threads 8
+    python benchmarks/bench_llm_registry.py --base-url http://gpu-box:11434
+
+Pass --stub to run the HTTP part against a local keep-alive stub instead of a real Ollama.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ollama  # noqa: E402
+from langchain.chains import LLMChain  # noqa: E402
+from langchain.prompts import PromptTemplate  # noqa: E402
+from langchain_ollama import ChatOllama  # noqa: E402
+
+import llm_registry  # noqa: E402
+
+TEMPLATE = "Analyze this employee's survey:\n{survey_responses}\nReturn JSON."
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"version":"stub"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", server
+
+
+def timed(fn, requests, threads):
+    latencies = []
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "mean_ms": statistics.mean(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "req_per_s": requests / wall,
+    }
+
+
+def report(label, before, after):
+    print(f"\n{label}")
+    print(f"  {'':<22}{'mean ms':>10}{'p95 ms':>10}{'req/s':>12}")
+    for name, r in (("per-request build", before), ("registry", after)):
+        print(f"  {name:<22}{r['mean_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['req_per_s']:>12.1f}")
+    print(f"  overhead saved per request: {before['mean_ms'] - after['mean_ms']:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--base-url", default=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"))
+    parser.add_argument("--model", default=os.getenv("OLLAMA_MODEL", "llama3.1:latest"))
+    parser.add_argument("--stub", action="store_true", help="use a local keep-alive HTTP stub instead of Ollama")
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    if args.stub:
+        base_url, _server = start_stub()
+
+    def build_per_request():
+        model = ChatOllama(base_url=base_url, model=args.model, temperature=0.3)
+        prompt = PromptTemplate(template=TEMPLATE, input_variables=["survey_responses"])
+        LLMChain(llm=model, prompt=prompt)
+
+    def registry_lookup():
+        llm_registry.get_chain(TEMPLATE, ["survey_responses"], base_url=base_url, model=args.model, temperature=0.3)
+
+    report(
+        "Object construction (ChatOllama + PromptTemplate + LLMChain)",
+        timed(build_per_request, args.requests, args.threads),
+        timed(registry_lookup, args.requests, args.threads),
+    )
+
+    # ollama.Client keeps its httpx.Client in `_client`; it is used directly so that
+    # only connection handling differs between the two runs.
+    def new_client_call():
+        # Original langchain_ollama behaviour: a fresh Client (and TCP connection) per call
+        client = ollama.Client(host=base_url)
+        try:
+            client._client.get("/api/version").raise_for_status()
+        finally:
+            client._client.close()
+
+    def shared_client_call():
+        llm_registry.get_client(base_url)._client.get("/api/version").raise_for_status()
+
+    try:
+        report(
+            f"HTTP round trip to {base_url} (GET /api/version)",
+            timed(new_client_call, args.requests, args.threads),
+            timed(shared_client_call, args.requests, args.threads),
+        )
+    except Exception as e:
+        print(f"\nHTTP benchmark skipped, {base_url} not reachable: {e} (try --stub)")
+
+
+if __name__ == "__main__":
+    main()
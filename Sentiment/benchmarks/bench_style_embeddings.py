@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: style memory retrieval latency per embedding backend (style_embeddings).
+
+For every backend the script embeds a corpus of style docs and synthetic report
+exemplars in batches into an in-memory Chroma collection. It then times
+get_style_context-style lookups: one query embedding plus a k-nearest similarity search.
+Backends that cannot start here (no GOOGLE_API_KEY, Ollama model not pulled,
+sentence-transformers missing) are reported and skipped.
+
+    python benchmarks/bench_style_embeddings.py --backends google ollama local --docs 200 --queries 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import chromadb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import style_embeddings  # noqa: E402
+import style_memory  # noqa: E402
+
+QUERY = "HR analytics assistant sentiment report style with fixed headings and tone"
+TOPICS = ["compensation", "workload", "management", "career growth", "recognition", "flexibility", "team culture"]
+
+
+def corpus(n):
+    texts, _ = style_memory._style_guide_docs()
+    docs = list(texts)
+    for i in range(max(0, n - len(docs))):
+        topic = TOPICS[i % len(TOPICS)]
+        docs.append(
+            f"Of course. As an HR analytics assistant, here is report {i}. 1. Sentiment Analysis: "
+            f"positive {40 + i % 30}%, negative {10 + i % 20}%. Employees mention {topic} most often; "
+            f"the main attrition risk is {TOPICS[(i + 3) % len(TOPICS)]}."
+        )
+    return docs
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def bench_backend(name, docs, queries, k):
+    embeddings = style_embeddings.create(name)
+    # Warm-up (model load / connection setup) is excluded from the timings
+    embeddings.embed_query(QUERY)
+
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(docs)
+    index_s = time.perf_counter() - start
+
+    collection = chromadb.EphemeralClient().create_collection(f"bench_{name}")
+    collection.add(ids=[str(i) for i in range(len(docs))], documents=docs, embeddings=vectors)
+
+    embed_ms, search_ms = [], []
+    for i in range(queries):
+        query = QUERY if i % 2 == 0 else f"{QUERY} about {TOPICS[i % len(TOPICS)]}"
+        t0 = time.perf_counter()
+        vector = embeddings.embed_query(query)
+        t1 = time.perf_counter()
+        collection.query(query_embeddings=[vector], n_results=k)
+        t2 = time.perf_counter()
+        embed_ms.append((t1 - t0) * 1000)
+        search_ms.append((t2 - t1) * 1000)
+
+    total = [e + s for e, s in zip(embed_ms, search_ms)]
+    return {
+        "model": style_embeddings.model_name(name),
+        "dim": len(vectors[0]),
+        "index_docs_per_s": len(docs) / index_s,
+        "embed_p50": statistics.median(embed_ms),
+        "search_p50": statistics.median(search_ms),
+        "total_p50": statistics.median(total),
+        "total_p95": percentile(total, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(style_embeddings.BACKENDS), choices=style_embeddings.BACKENDS)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    docs = corpus(args.docs)
+    print(f"{'backend':>8} | {'model':<40} | {'dim':>5} | {'index docs/s':>12} | "
+          f"{'embed p50':>9} | {'search p50':>10} | {'total p50':>9} | {'total p95':>9}  (ms)")
+    print("-" * 130)
+    for name in args.backends:
+        try:
+            r = bench_backend(name, docs, args.queries, args.k)
+        except Exception as e:
+            print(f"{name:>8} | skipped: {e}")
+            continue
+        print(f"{name:>8} | {r['model']:<40} | {r['dim']:>5} | {r['index_docs_per_s']:>12.1f} | "
+              f"{r['embed_p50']:>9.2f} | {r['search_p50']:>10.2f} | {r['total_p50']:>9.2f} | {r['total_p95']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
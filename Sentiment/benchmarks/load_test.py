@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Load test: throughput of the gunicorn deployment as the worker count grows.
+
+For every value of --workers the script starts `gunicorn -c gunicorn.conf.py wsgi:app`
+with GUNICORN_WORKERS set accordingly, fires --requests requests at --concurrency, and
+reports throughput and latency percentiles. The default target is POST /test-ai, which
+performs one small Ollama generation per request, so Ollama and the DB settings from
+.env must be reachable.
+
+    python benchmarks/load_test.py --workers 1 2 4 --threads 8 --requests 200 --concurrency 32
+    python benchmarks/load_test.py --url http://localhost:5000 --path /health --method GET
+
+With --url the script does not start gunicorn and only measures the given server.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SENTIMENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            return
+        except urllib.error.HTTPError:
+            return  # the app is answering, even if with an error status
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout}s")
+
+
+def one_request(url, method, body):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=600) as resp:
+            resp.read()
+            ok = 200 <= resp.status < 300
+    except urllib.error.HTTPError as e:
+        ok = e.code < 500
+    except Exception:
+        ok = False
+    return (time.perf_counter() - start) * 1000, ok
+
+
+def run_load(url, method, body, requests, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: one_request(url, method, body), range(requests)))
+    wall = time.perf_counter() - start
+    latencies = sorted(ms for ms, _ in results)
+    return {
+        "req_per_s": requests / wall,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)],
+        "errors": sum(1 for _, ok in results if not ok),
+    }
+
+
+def start_gunicorn(workers, threads, port):
+    env = dict(os.environ, GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads),
+               FLASK_HOST="127.0.0.1", FLASK_PORT=str(port), GUNICORN_LOG_LEVEL="warning")
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=SENTIMENT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def print_row(label, r):
+    print(f"{label:>10} | {r['req_per_s']:>9.2f} | {r['p50_ms']:>9.1f} | {r['p95_ms']:>9.1f} | {r['errors']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--path", default="/test-ai")
+    parser.add_argument("--method", default="POST")
+    parser.add_argument("--body", default='{"text": "load test"}', help="JSON body for POST requests")
+    parser.add_argument("--url", help="measure an already running server instead of starting gunicorn")
+    args = parser.parse_args()
+    body = json.loads(args.body) if args.method.upper() != "GET" else None
+
+    print(f"{args.requests} x {args.method} {args.path} at concurrency {args.concurrency}")
+    print(f"{'workers':>10} | {'req/s':>9} | {'p50 ms':>9} | {'p95 ms':>9} | {'errors':>6}")
+    print("-" * 56)
+
+    if args.url:
+        print_row("external", run_load(args.url + args.path, args.method, body, args.requests, args.concurrency))
+        return
+
+    for workers in args.workers:
+        port = free_port()
+        proc = start_gunicorn(workers, args.threads, port)
+        try:
+            base = f"http://127.0.0.1:{port}"
+            wait_until_up(base + "/health")
+            # One warm-up request per worker so model loading is not measured
+            run_load(base + args.path, args.method, body, workers, workers)
+            print_row(str(workers), run_load(base + args.path, args.method, body, args.requests, args.concurrency))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Concurrency test: several processes sharing one small embedding cache.
+
+Every process repeatedly puts and gets random keys in an embedding_cache.EmbeddingCache
+whose capacity is far below the number of keys, so rows are constantly reused by other
+processes between one process's index lookup and its copy of the row. Each key's vector
+is derived from the key itself, so a hit holding any other vector is a wrong result.
+
+    python benchmarks/stress_embedding_cache.py --processes 4 --iterations 4000
+
+Uses a temporary directory. Exits non-zero if any lookup returned another key's vector.
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import embedding_cache  # noqa: E402
+
+
+DIM = 16
+
+
+def make_key(i):
+    return hashlib.sha256(str(i).encode("utf-8")).digest()
+
+
+def make_vector(i):
+    return np.full(DIM, float(i), dtype=np.float32)
+
+
+def worker(args):
+    directory, capacity, keys, iterations, seed = args
+    cache = embedding_cache.EmbeddingCache(directory, max_entries=capacity)
+    rnd = random.Random(seed)
+    hits = wrong = 0
+    for _ in range(iterations):
+        ids = rnd.sample(range(keys), 8)
+        if rnd.random() < 0.5:
+            cache.put_many({make_key(i): make_vector(i).tolist() for i in ids})
+        found = cache.get_many([make_key(i) for i in ids])
+        for i in ids:
+            vector = found.get(make_key(i))
+            if vector is not None:
+                hits += 1
+                wrong += not np.array_equal(vector, make_vector(i))
+    return hits, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=4000)
+    parser.add_argument("--capacity", type=int, default=64)
+    parser.add_argument("--keys", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.processes) as pool:
+            results = pool.map(worker, [
+                (directory, args.capacity, args.keys, args.iterations, seed) for seed in range(args.processes)
+            ])
+        wall = time.perf_counter() - start
+
+    hits = sum(r[0] for r in results)
+    wrong = sum(r[1] for r in results)
+    print(f"{args.processes} processes x {args.iterations} iterations in {wall:.2f}s: {hits} hits, {wrong} wrong")
+    if wrong:
+        print(f"FAIL: {wrong} lookups returned another key's vector")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Concurrency test: many threads saving the same employee and company at once.
+
+Every thread repeatedly calls main.save_analysis_to_fortai_db and
+main.save_company_analysis_to_db for ONE employee id and ONE company id, each write
+tagged with its thread and iteration. Afterwards the script checks that exactly one
+row exists per key and that it holds one of the written analyses. Run it against a
+scratch database with migrations/003_sentiment_result_unique_keys.sql applied (DB
+settings come from .env, as for the app):
+
+    python benchmarks/stress_upsert.py --threads 32 --iterations 50
+    python benchmarks/stress_upsert.py --employee-id 990001 --company-id 990001 --keep
+
+The test rows are deleted at the end unless --keep is given. Exits non-zero on failure.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool  # noqa: E402
+import main as server  # noqa: E402
+import structured_output  # noqa: E402
+
+
+def make_analysis(tag):
+    analysis = {field: f"{field} {tag}" for field in structured_output.TEXT_FIELDS}
+    analysis.update(positive_sentiment=50, neutral_sentiment=30, negative_sentiment=20)
+    return analysis
+
+
+def count_rows(cursor, table, column, key):
+    cursor.execute(f"SELECT COUNT(*), MAX(summary_opinion) FROM {table} WHERE {column} = %s", (key,))
+    return cursor.fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--employee-id", type=int, default=990001)
+    parser.add_argument("--company-id", type=int, default=990001)
+    parser.add_argument("--company", default="stress-test")
+    parser.add_argument("--keep", action="store_true", help="leave the test rows in place")
+    args = parser.parse_args()
+
+    latencies = []
+    errors = []
+    written = set()
+    lock = threading.Lock()
+
+    def worker(thread_no):
+        for i in range(args.iterations):
+            tag = f"t{thread_no}-i{i}"
+            analysis = make_analysis(tag)
+            for save in (
+                lambda: server.save_analysis_to_fortai_db(args.employee_id, args.company, analysis),
+                lambda: server.save_company_analysis_to_db(args.company_id, analysis),
+            ):
+                start = time.perf_counter()
+                try:
+                    save()
+                    with lock:
+                        latencies.append((time.perf_counter() - start) * 1000)
+                        written.add(analysis["summary_opinion"])
+                except Exception as e:
+                    with lock:
+                        errors.append(f"{tag}: {e}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(worker, range(args.threads)))
+    wall = time.perf_counter() - start
+
+    with db_pool.connection() as connection:
+        cursor = connection.cursor()
+        try:
+            employee_rows, employee_summary = count_rows(
+                cursor, "responses_langchain_sentiment", "employeesID", args.employee_id
+            )
+            company_rows, company_summary = count_rows(
+                cursor, "company_reports_sentiment", "company_id", args.company_id
+            )
+            if not args.keep:
+                cursor.execute("DELETE FROM responses_langchain_sentiment WHERE employeesID = %s", (args.employee_id,))
+                cursor.execute("DELETE FROM company_reports_sentiment WHERE company_id = %s", (args.company_id,))
+                connection.commit()
+        finally:
+            cursor.close()
+
+    writes = args.threads * args.iterations * 2
+    print(f"{writes} upserts from {args.threads} threads in {wall:.2f}s ({writes / wall:.0f}/s)")
+    if latencies:
+        latencies.sort()
+        print(f"latency p50 {statistics.median(latencies):.1f} ms, "
+              f"p95 {latencies[max(0, int(len(latencies) * 0.95) - 1)]:.1f} ms")
+    print(f"deadlock retries: {db_pool.pool_stats().get('transaction_retries', 0)}, errors: {len(errors)}")
+    for error in errors[:10]:
+        print(f"  {error}")
+
+    failures = []
+    if employee_rows != 1:
+        failures.append(f"expected 1 employee row, found {employee_rows}")
+    if company_rows != 1:
+        failures.append(f"expected 1 company row, found {company_rows}")
+    if employee_summary not in written or company_summary not in written:
+        failures.append("final row does not match any written analysis")
+    if errors:
+        failures.append(f"{len(errors)} saves failed")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK: one row per key, holding one of the written analyses")
+
+
+if __name__ == "__main__":
+    main()
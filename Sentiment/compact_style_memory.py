@@ -0,0 +1,16 @@
+"""Compact the style memory vector database.
+
+Deleting evicted examples leaves holes in Chroma's index, so the collection keeps its size.
+This applies the STYLE_MEMORY_MAX_GENERATED_EXAMPLES cap and rebuilds the collection from
+its stored vectors (no embedding calls), then deletes the old collection's index files and
+VACUUMs chroma.sqlite3. Running workers reopen the new collection on their next lookup.
+"""
+from style_memory import compact
+
+
+if __name__ == "__main__":
+    result = compact()
+    print(
+        f"Compacted style memory: {result['documents']} documents kept, {result['evicted']} examples evicted, "
+        f"{result['bytes_before'] / 1e6:.1f} MB -> {result['bytes_after'] / 1e6:.1f} MB on disk."
+    )
@@ -0,0 +1,249 @@
+"""Incrementally maintained per-company aggregate of employee analyses.
+
+Every saved employee analysis adjusts a running aggregate for the employee's company
+(see migrations/004_company_sentiment_aggregate.sql) in the same transaction:
+
+- company_sentiment_aggregate: analysed headcount and the sums of the three sentiment
+  percentages, so headcount-weighted percentages need no scan of the employees
+- company_theme_counts: how many employees named each key positive / attrition factor
+
+The old analysis is subtracted and the new one added, so re-analysing an employee does
+not double count. The aggregate of a company is built from scratch with ``rebuild`` the
+first time it is needed; until then saves leave that company alone.
+
+Enable maintenance with COMPANY_INCREMENTAL_AGGREGATE=true. Every function takes a cursor
+so it runs inside the caller's transaction.
+"""
+import os
+import re
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_FIELDS = ["positive_sentiment", "neutral_sentiment", "negative_sentiment"]
+THEME_FIELDS = {
+    "positive": ["key_positive_1", "key_positive_2", "key_positive_3"],
+    "factor": ["attrition_factor_1", "attrition_factor_2", "attrition_factor_3"],
+}
+_THEME_COLUMNS = [field for fields in THEME_FIELDS.values() for field in fields]
+_THEME_MAX_LENGTH = 255
+
+# Same population as main.COMPANY_RESPONSES_QUERY: filled-in, non-HR employees
+_EMPLOYEE_FILTER = "e.role != 'HR' AND e.is_filled = 1"
+# Provisional and fallback analyses (main.ANALYSIS_PROVISIONAL etc.) are not counted
+_ANALYSIS_FILTER = "r.analysis_status = 'complete'"
+
+
+def enabled() -> bool:
+    return os.getenv("COMPANY_INCREMENTAL_AGGREGATE", "False").lower() == "true"
+
+
+def theme_key(text) -> str:
+    """Normalised theme label so 'Work-life balance.' and 'work life balance' count together."""
+    text = re.sub(r"[^\w\s]", " ", str(text or "").lower())
+    return re.sub(r"\s+", " ", text).strip()[:_THEME_MAX_LENGTH]
+
+
+def _themes(analysis: dict) -> List[Tuple[str, str]]:
+    themes = []
+    for kind, fields in THEME_FIELDS.items():
+        for key in {theme_key(analysis.get(field)) for field in fields}:
+            if key:
+                themes.append((kind, key))
+    return themes
+
+
+def lock_previous(cursor, employee_ids: Sequence) -> Dict[str, Tuple[Optional[int], Optional[dict]]]:
+    """Lock the aggregates the employees' saves will change and return their current analyses.
+
+    Returns {employee_id: (company_id, analysis or None)} for employees of companies whose
+    aggregate has been built; the others need no maintenance. The analysis is None when the
+    employee has none that is counted (missing, provisional or fallback). Call before upserting the
+    new analyses. The aggregate rows are locked (in company_id order, so concurrent
+    batches cannot deadlock) to serialize saves per company, so two saves of the same
+    employee cannot both apply their deltas against the same old analysis. The employees
+    table itself is only read, not locked.
+    """
+    if not employee_ids:
+        return {}
+    cursor.execute(
+        "SELECT e.employeesID, e.company_id FROM employees e "
+        f"WHERE e.employeesID IN ({', '.join(['%s'] * len(employee_ids))}) AND {_EMPLOYEE_FILTER}",
+        list(employee_ids),
+    )
+    companies = {str(employee_id): company_id for employee_id, company_id in cursor.fetchall() if company_id is not None}
+    if not companies:
+        return {}
+
+    company_ids = sorted(set(companies.values()))
+    cursor.execute(
+        "SELECT company_id FROM company_sentiment_aggregate WHERE company_id IN ("
+        + ", ".join(["%s"] * len(company_ids)) + ") ORDER BY company_id FOR UPDATE",
+        company_ids,
+    )
+    built = {row[0] for row in cursor.fetchall()}
+    maintained = [employee_id for employee_id, company_id in companies.items() if company_id in built]
+    if not maintained:
+        return {}
+
+    # A locking read sees the latest committed analyses, not the transaction's snapshot
+    columns = ", ".join(f"r.{field}" for field in SENTIMENT_FIELDS + _THEME_COLUMNS)
+    cursor.execute(
+        f"SELECT r.employeesID, {columns} FROM responses_langchain_sentiment r "
+        f"WHERE r.employeesID IN ({', '.join(['%s'] * len(maintained))}) AND {_ANALYSIS_FILTER} FOR UPDATE",
+        maintained,
+    )
+    analyses = {str(row[0]): dict(zip(SENTIMENT_FIELDS + _THEME_COLUMNS, row[1:])) for row in cursor.fetchall()}
+    return {employee_id: (companies[employee_id], analyses.get(employee_id)) for employee_id in maintained}
+
+
+def apply_changes(cursor, previous: Dict[str, Tuple[Optional[int], Optional[dict]]],
+                  changes: Iterable[Tuple[object, Optional[dict]]]) -> None:
+    """Move each company aggregate from the locked previous analyses to the new ones.
+
+    ``changes`` is (employee_id, new_analysis) for analyses just saved, with None for a
+    saved analysis that is not counted (the employee's old one is removed); employees absent
+    from ``previous`` (not filled-in non-HR employees, or their company's aggregate was not
+    built when it was locked) are skipped.
+    """
+    headcount: Counter = Counter()
+    sums: Dict[object, Counter] = {}
+    themes: Counter = Counter()
+
+    for employee_id, analysis in changes:
+        entry = previous.get(str(employee_id))
+        if entry is None or entry[0] is None:
+            continue
+        company_id, old = entry
+        if old is None and analysis is None:
+            continue
+        company_sums = sums.setdefault(company_id, Counter())
+        if old is None:
+            headcount[company_id] += 1
+        else:
+            for field in SENTIMENT_FIELDS:
+                company_sums[field] -= int(old[field] or 0)
+            for kind, key in _themes(old):
+                themes[(company_id, kind, key)] -= 1
+        if analysis is None:
+            headcount[company_id] -= 1
+            continue
+        for field in SENTIMENT_FIELDS:
+            company_sums[field] += int(analysis[field])
+        for kind, key in _themes(analysis):
+            themes[(company_id, kind, key)] += 1
+
+    if not sums:
+        return
+
+    # Only companies whose aggregate has been built are maintained incrementally
+    company_ids = list(sums)
+    cursor.execute(
+        "SELECT company_id FROM company_sentiment_aggregate WHERE company_id IN ("
+        + ", ".join(["%s"] * len(company_ids)) + ") FOR UPDATE",
+        company_ids,
+    )
+    built = {row[0] for row in cursor.fetchall()}
+    if not built:
+        return
+
+    cursor.executemany(
+        "UPDATE company_sentiment_aggregate SET employees = employees + %s, positive_sum = positive_sum + %s, "
+        "neutral_sum = neutral_sum + %s, negative_sum = negative_sum + %s, updated_at = CURRENT_TIMESTAMP "
+        "WHERE company_id = %s",
+        [
+            (headcount[company_id], *(sums[company_id][field] for field in SENTIMENT_FIELDS), company_id)
+            for company_id in company_ids if company_id in built
+        ],
+    )
+
+    theme_rows = [
+        (company_id, kind, key, delta)
+        for (company_id, kind, key), delta in themes.items()
+        if delta and company_id in built
+    ]
+    if theme_rows:
+        cursor.executemany(
+            "INSERT INTO company_theme_counts (company_id, kind, theme, mention_count) VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE mention_count = mention_count + VALUES(mention_count)",
+            theme_rows,
+        )
+        cursor.execute(
+            "DELETE FROM company_theme_counts WHERE mention_count <= 0 AND company_id IN ("
+            + ", ".join(["%s"] * len(built)) + ")",
+            list(built),
+        )
+
+
+def rebuild(cursor, company_id) -> None:
+    """Recompute a company's aggregate from every complete stored employee analysis."""
+    columns = ", ".join(f"r.{field}" for field in SENTIMENT_FIELDS + _THEME_COLUMNS)
+    cursor.execute(
+        f"SELECT {columns} FROM responses_langchain_sentiment r "
+        "JOIN employees e ON e.employeesID = r.employeesID "
+        f"WHERE e.company_id = %s AND {_EMPLOYEE_FILTER} AND {_ANALYSIS_FILTER}",
+        (company_id,),
+    )
+    sums: Counter = Counter()
+    themes: Counter = Counter()
+    employees = 0
+    for row in cursor.fetchall():
+        analysis = dict(zip(SENTIMENT_FIELDS + _THEME_COLUMNS, row))
+        employees += 1
+        for field in SENTIMENT_FIELDS:
+            sums[field] += int(analysis[field] or 0)
+        for kind, key in _themes(analysis):
+            themes[(kind, key)] += 1
+
+    cursor.execute(
+        "INSERT INTO company_sentiment_aggregate "
+        "(company_id, employees, positive_sum, neutral_sum, negative_sum, updated_at) "
+        "VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP) "
+        "ON DUPLICATE KEY UPDATE employees = VALUES(employees), positive_sum = VALUES(positive_sum), "
+        "neutral_sum = VALUES(neutral_sum), negative_sum = VALUES(negative_sum), updated_at = CURRENT_TIMESTAMP",
+        (company_id, employees, *(sums[field] for field in SENTIMENT_FIELDS)),
+    )
+    cursor.execute("DELETE FROM company_theme_counts WHERE company_id = %s", (company_id,))
+    if themes:
+        cursor.executemany(
+            "INSERT INTO company_theme_counts (company_id, kind, theme, mention_count) VALUES (%s, %s, %s, %s)",
+            [(company_id, kind, key, count) for (kind, key), count in themes.items()],
+        )
+    logger.info(f"Rebuilt sentiment aggregate for company_id {company_id} from {employees} analyses")
+
+
+def load(cursor, company_id, top_themes: int = 10) -> Optional[dict]:
+    """The company's aggregate with its most frequent themes, or None if never built."""
+    cursor.execute(
+        "SELECT employees, positive_sum, neutral_sum, negative_sum FROM company_sentiment_aggregate "
+        "WHERE company_id = %s",
+        (company_id,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    aggregate = {"employees": int(row[0]), "sums": dict(zip(SENTIMENT_FIELDS, (int(v) for v in row[1:])))}
+    for kind in THEME_FIELDS:
+        cursor.execute(
+            "SELECT theme, mention_count FROM company_theme_counts WHERE company_id = %s AND kind = %s "
+            "ORDER BY mention_count DESC, theme LIMIT %s",
+            (company_id, kind, top_themes),
+        )
+        aggregate[kind] = [(theme, int(count)) for theme, count in cursor.fetchall()]
+    return aggregate
+
+
+def render(aggregate: dict, sentiment: Dict[str, int]) -> str:
+    """Compact prompt text for an aggregate: headcount, weighted sentiment and theme frequencies."""
+    lines = [
+        f"Employees analysed: {aggregate['employees']}",
+        "Headcount-weighted sentiment: " + ", ".join(f"{field} {value}%" for field, value in sentiment.items()),
+        "Most frequent key positives (employees mentioning):",
+    ]
+    lines += [f"- {theme}: {count}" for theme, count in aggregate["positive"]] or ["- none recorded"]
+    lines.append("Most frequent attrition factors (employees mentioning):")
+    lines += [f"- {theme}: {count}" for theme, count in aggregate["factor"]] or ["- none recorded"]
+    return "\n".join(lines)
@@ -0,0 +1,196 @@
+"""Hierarchical (map-reduce) company sentiment analysis.
+
+Large companies do not fit into a single prompt, so employees are packed into
+token-budgeted batches, each batch is analysed to the usual 16-field JSON schema in
+parallel, and the partial results are reduced: sentiment percentages are averaged
+weighted by headcount, and the text fields are merged by a final LLM pass (itself
+split into rounds when the partial results do not fit the budget either).
+
+The LLM calls are injected by main.py so this module stays free of LangChain imports.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_FIELDS = ["positive_sentiment", "neutral_sentiment", "negative_sentiment"]
+
+# Working context windows (num_ctx) used per model family when OLLAMA_NUM_CTX is not set.
+# These are deliberately conservative compared to the models' maximums (llama3.1 supports
+# 128k) because the KV cache for a larger window has to fit on the Ollama host.
+MODEL_CONTEXT_WINDOWS = {
+    "llama3.1": 8192,
+    "llama3.2": 8192,
+    "llama3": 8192,
+    "qwen2.5": 8192,
+    "mistral": 8192,
+    "gemma2": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# Rough English average for Llama-family tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def context_window_for_model(model: str) -> int:
+    """Return the working context window for an Ollama model name such as 'llama3.1:latest'."""
+    family = model.split(":", 1)[0].lower()
+    for prefix in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if family.startswith(prefix):
+            return MODEL_CONTEXT_WINDOWS[prefix]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def batch_token_budget(num_ctx: int, template: str, response_reserve: int) -> int:
+    """Tokens available for survey data once the template and the response are accounted for."""
+    return max(256, num_ctx - estimate_tokens(template) - response_reserve)
+
+
+def chunk_employees(
+    employee_data: Sequence[dict],
+    format_batch: Callable[[Sequence[dict]], str],
+    token_budget: int,
+) -> List[List[dict]]:
+    """Greedily pack employees into batches whose formatted text fits ``token_budget``."""
+    batches: List[List[dict]] = []
+    current: List[dict] = []
+    current_tokens = estimate_tokens(format_batch([]))
+
+    for emp in employee_data:
+        emp_tokens = estimate_tokens(format_batch([emp])) - estimate_tokens(format_batch([]))
+        if current and current_tokens + emp_tokens > token_budget:
+            batches.append(current)
+            current = []
+            current_tokens = estimate_tokens(format_batch([]))
+        if emp_tokens > token_budget:
+            logger.warning(
+                f"Employee {emp.get('employeesID')} alone needs ~{emp_tokens} tokens "
+                f"(budget {token_budget}); the model will see a truncated survey"
+            )
+        current.append(emp)
+        current_tokens += emp_tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def weighted_sentiment(partials: Sequence[Tuple[int, dict]]) -> Dict[str, int]:
+    """Headcount-weighted sentiment percentages, rounded to integers that sum to 100."""
+    total = sum(count for count, _ in partials)
+    if total <= 0:
+        return {}
+
+    raw = {
+        field: sum(count * float(analysis[field]) for count, analysis in partials) / total
+        for field in SENTIMENT_FIELDS
+    }
+    scale = sum(raw.values())
+    if scale <= 0:
+        return {}
+    raw = {field: value * 100 / scale for field, value in raw.items()}
+
+    # Largest-remainder rounding keeps the sum at exactly 100
+    result = {field: int(value) for field, value in raw.items()}
+    leftover = 100 - sum(result.values())
+    for field in sorted(raw, key=lambda f: raw[f] - result[f], reverse=True)[:leftover]:
+        result[field] += 1
+    return result
+
+
+def render_partials(partials: Sequence[Tuple[int, dict]]) -> str:
+    return json.dumps(
+        [
+            {"batch": idx, "employees": count, "analysis": analysis}
+            for idx, (count, analysis) in enumerate(partials, 1)
+        ],
+        indent=1,
+        ensure_ascii=False,
+    )
+
+
+def _group_partials(partials: List[Tuple[int, dict]], token_budget: int) -> List[List[Tuple[int, dict]]]:
+    groups: List[List[Tuple[int, dict]]] = [[]]
+    for partial in partials:
+        candidate = groups[-1] + [partial]
+        if groups[-1] and estimate_tokens(render_partials(candidate)) > token_budget:
+            groups.append([partial])
+        else:
+            groups[-1] = candidate
+    # Always make progress, even if a single pair of partials exceeds the budget
+    if len(groups) == len(partials) and len(partials) > 1:
+        groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+    return groups
+
+
+def map_reduce_company_analysis(
+    employee_data: Sequence[dict],
+    format_batch: Callable[[Sequence[dict]], str],
+    analyze_batch: Callable[[str], dict],
+    merge_partials: Callable[[str], dict],
+    token_budget: int,
+    max_workers: int = 4,
+    on_progress: Optional[Callable[[int], None]] = None,
+    reduce_token_budget: Optional[int] = None,
+) -> dict:
+    """Analyse employees in token-budgeted batches and reduce them into one company analysis.
+
+    ``on_progress`` is called with the number of employees analysed so far after each batch.
+    ``reduce_token_budget`` bounds the partial analyses per merge prompt (default
+    ``token_budget``); it is measured against the merge template, which differs from the
+    batch template.
+    """
+    if reduce_token_budget is None:
+        reduce_token_budget = token_budget
+    batches = chunk_employees(employee_data, format_batch, token_budget)
+    logger.info(
+        f"Hierarchical company analysis: {len(employee_data)} employees in {len(batches)} batches "
+        f"(token budget {token_budget}, {max_workers} parallel)"
+    )
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        # Map: one 16-field analysis per batch
+        processed = 0
+        progress_lock = threading.Lock()
+
+        def run_batch(batch):
+            nonlocal processed
+            analysis = analyze_batch(format_batch(batch))
+            if on_progress:
+                with progress_lock:
+                    processed += len(batch)
+                    on_progress(processed)
+            return analysis
+
+        analyses = list(pool.map(run_batch, batches))
+        partials: List[Tuple[int, dict]] = [(len(b), a) for b, a in zip(batches, analyses)]
+        sentiment = weighted_sentiment(partials)
+
+        # Reduce: merge text fields with the LLM, in rounds if needed
+        round_no = 0
+        while len(partials) > 1:
+            round_no += 1
+            if estimate_tokens(render_partials(partials)) <= reduce_token_budget:
+                groups = [partials]
+            else:
+                groups = _group_partials(partials, reduce_token_budget)
+            logger.info(f"Reduce round {round_no}: merging {len(partials)} partial analyses in {len(groups)} groups")
+
+            merged = list(pool.map(
+                lambda group: merge_partials(render_partials(group)) if len(group) > 1 else group[0][1],
+                groups,
+            ))
+            partials = [(sum(count for count, _ in group), m) for group, m in zip(groups, merged)]
+
+    result = dict(partials[0][1])
+    # Numeric sentiment comes from the batch results, not from the merge prompt
+    result.update(sentiment)
+    return result
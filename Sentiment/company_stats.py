@@ -0,0 +1,138 @@
+"""Numeric company sentiment computed from the stored per-employee analyses.
+
+The company-level positive/neutral/negative percentages no longer have to be guessed by
+the model from the mega-prompt: this module loads every employee's percentages from
+responses_langchain_sentiment into an (n, 3) NumPy array and computes means, medians,
+spread, percentiles, the distribution of each score and of each employee's dominant
+sentiment, and a per-group breakdown (employees.role by default) in one vectorized pass.
+
+The result is served by GET /company-stats/<company_id> and rendered into the company
+prompt as ground truth; the percentages in the saved company report are taken from it.
+"""
+import os
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import company_mapreduce
+
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_FIELDS = ["positive_sentiment", "neutral_sentiment", "negative_sentiment"]
+PERCENTILES = (10, 25, 50, 75, 90)
+# Distribution buckets: 0-9, 10-19, ..., 90-100
+HISTOGRAM_EDGES = np.array([0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 101])
+
+# employees columns a breakdown may be grouped by (identifiers are interpolated into SQL)
+GROUP_COLUMNS = [c.strip() for c in os.getenv("COMPANY_STATS_GROUP_COLUMNS", "role").split(",") if c.strip()]
+
+
+def _round(values: np.ndarray) -> List[float]:
+    return [round(float(v), 2) for v in values]
+
+
+def _per_field(values: np.ndarray) -> Dict[str, float]:
+    return dict(zip(SENTIMENT_FIELDS, _round(values)))
+
+
+def _dominant_shares(scores: np.ndarray) -> Dict[str, float]:
+    """Share of employees whose largest score is each sentiment (ties go to the first field)."""
+    counts = np.bincount(scores.argmax(axis=1), minlength=len(SENTIMENT_FIELDS))
+    return _per_field(counts / len(scores) * 100)
+
+
+def compute_stats(scores: np.ndarray, groups: Optional[Sequence] = None) -> dict:
+    """Statistics for an (n, 3) array of positive/neutral/negative percentages.
+
+    ``groups`` optionally labels each row (e.g. the employee's role) for the breakdown.
+    """
+    scores = np.asarray(scores, dtype=np.float64).reshape(-1, len(SENTIMENT_FIELDS))
+    n = len(scores)
+    if n == 0:
+        return {"employees": 0}
+
+    mean = scores.mean(axis=0)
+    stats = {
+        "employees": n,
+        # Integers summing to 100, as stored in company_reports_sentiment
+        "sentiment": company_mapreduce.weighted_sentiment([(1, _per_field(mean))]),
+        "mean": _per_field(mean),
+        "median": _per_field(np.median(scores, axis=0)),
+        "std": _per_field(scores.std(axis=0)),
+        "percentiles": {
+            field: dict(zip((f"p{p}" for p in PERCENTILES), _round(column)))
+            for field, column in zip(SENTIMENT_FIELDS, np.percentile(scores, PERCENTILES, axis=0).T)
+        },
+        "distribution": {
+            "bucket_edges": HISTOGRAM_EDGES[:-1].tolist(),
+            **{
+                field: np.histogram(scores[:, i], bins=HISTOGRAM_EDGES)[0].tolist()
+                for i, field in enumerate(SENTIMENT_FIELDS)
+            },
+        },
+        "dominant": _dominant_shares(scores),
+    }
+
+    if groups is not None:
+        labels, inverse, counts = np.unique(np.asarray(groups, dtype=str), return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+        # Per-group sums in one pass per field, then medians over group-sorted slices
+        sums = np.stack([np.bincount(inverse, weights=scores[:, i], minlength=len(labels))
+                         for i in range(scores.shape[1])], axis=1)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.cumsum(counts)[:-1]
+        breakdown = {}
+        for label, count, group_sum, group_scores in zip(labels, counts, sums, np.split(scores[order], bounds)):
+            breakdown[str(label)] = {
+                "employees": int(count),
+                "mean": _per_field(group_sum / count),
+                "median": _per_field(np.median(group_scores, axis=0)),
+                "dominant": _dominant_shares(group_scores),
+            }
+        stats["groups"] = breakdown
+
+    return stats
+
+
+def load_company_scores(cursor, company_id, group_column: Optional[str] = None):
+    """Fetch the stored percentages (and group labels) of a company's filled-in, non-HR employees.
+
+    Provisional and fallback analyses are left out; only complete ones are counted.
+    """
+    if group_column is not None and group_column not in GROUP_COLUMNS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_COLUMNS)}")
+    group_select = f", COALESCE(e.{group_column}, 'unknown')" if group_column else ""
+    cursor.execute(
+        f"SELECT r.positive_sentiment, r.neutral_sentiment, r.negative_sentiment{group_select} "
+        "FROM responses_langchain_sentiment r "
+        "JOIN employees e ON e.employeesID = r.employeesID "
+        "WHERE e.company_id = %s AND e.role != 'HR' AND e.is_filled = 1 AND r.analysis_status = 'complete'",
+        (company_id,),
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        return np.empty((0, len(SENTIMENT_FIELDS))), None
+    if group_column:
+        scores = np.array([row[:3] for row in rows], dtype=np.float64)
+        return scores, [row[3] for row in rows]
+    return np.array(rows, dtype=np.float64), None
+
+
+def render(stats: dict) -> str:
+    """Prompt text stating the computed numbers as ground truth."""
+    lines = [
+        f"Computed from {stats['employees']} individual employee analyses - treat these numbers as ground truth:",
+        "Company sentiment: " + ", ".join(f"{field} {value}%" for field, value in stats["sentiment"].items()),
+        "Median: " + ", ".join(f"{field} {value}%" for field, value in stats["median"].items()),
+        "Employees whose dominant sentiment is: " + ", ".join(
+            f"{field.split('_')[0]} {value}%" for field, value in stats["dominant"].items()
+        ),
+    ]
+    for label, group in sorted(stats.get("groups", {}).items(), key=lambda item: -item[1]["employees"]):
+        lines.append(
+            f"- {label} ({group['employees']} employees): "
+            + ", ".join(f"{field.split('_')[0]} {value}%" for field, value in group["mean"].items())
+        )
+    return "\n".join(lines)
@@ -0,0 +1,296 @@
+"""Process-wide MySQL connection pool for the ForteAI database.
+
+Connections are borrowed through the ``connection()`` context manager and returned
+to the pool afterwards, so request handlers no longer pay a TCP + auth handshake on
+every call. Pool behaviour is configured via environment variables:
+
+- DB_POOL_SIZE: connections kept open while idle (default 5)
+- DB_POOL_MAX_OVERFLOW: extra connections opened under load and closed on release (default 10)
+- DB_POOL_RECYCLE: seconds after which a connection is replaced (default 3600, 0 disables)
+- DB_POOL_PRE_PING: ping connections before handing them out (default true)
+- DB_POOL_TIMEOUT: seconds to wait for a free connection before failing (default 30)
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class ConnectionPool:
+    """Thread-safe pool with overflow, recycling, pre-ping and wait statistics."""
+
+    def __init__(
+        self,
+        creator: Callable[[], "mysql.connector.MySQLConnection"],
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        recycle: int = 3600,
+        pre_ping: bool = True,
+        timeout: float = 30.0,
+    ):
+        self._creator = creator
+        self.pool_size = max(1, pool_size)
+        self.max_overflow = max(0, max_overflow)
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+
+        self._cond = threading.Condition()
+        self._idle: Deque[Tuple[object, float]] = deque()
+        self._created_at: Dict[int, float] = {}
+        self._open = 0
+        self._checked_out = 0
+
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._connects = 0
+        self._recycled = 0
+        self._ping_failures = 0
+
+    # ---------- internal helpers ----------
+    def _connect(self):
+        conn = self._creator()
+        with self._cond:
+            self._connects += 1
+            self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn) -> None:
+        with self._cond:
+            self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, conn) -> bool:
+        created = self._created_at.get(id(conn), 0.0)
+        if self.recycle > 0 and time.monotonic() - created > self.recycle:
+            with self._cond:
+                self._recycled += 1
+            return False
+        if self.pre_ping:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._ping_failures += 1
+                return False
+        return True
+
+    # ---------- public API ----------
+    def acquire(self):
+        """Borrow a connection, waiting up to ``timeout`` seconds when the pool is exhausted."""
+        deadline = time.monotonic() + self.timeout
+        waited_since: Optional[float] = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    self._checked_out += 1
+                    break
+                if self._open < self.pool_size + self.max_overflow:
+                    conn = None
+                    self._open += 1
+                    self._checked_out += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolError(
+                        f"Connection pool exhausted: {self._checked_out} checked out, "
+                        f"waited {self.timeout:.1f}s for a free connection"
+                    )
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    self._waits += 1
+                self._cond.wait(remaining)
+
+            if waited_since is not None:
+                waited = time.monotonic() - waited_since
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+
+        try:
+            if conn is not None and not self._is_usable(conn):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard: bool = False) -> None:
+        """Return a borrowed connection; overflow and broken connections are closed."""
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._checked_out -= 1
+            keep = not discard and len(self._idle) < self.pool_size
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+        if not keep:
+            self._discard(conn)
+
+    def dispose(self) -> None:
+        """Close every idle connection (checked-out ones are closed when released)."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "overflow": max(0, self._open - self.pool_size),
+                "waits": self._waits,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 2),
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 2),
+                "timeouts": self._timeouts,
+                "connects": self._connects,
+                "recycled": self._recycled,
+                "ping_failures": self._ping_failures,
+            }
+
+
+_creator: Optional[Callable[[], "mysql.connector.MySQLConnection"]] = None
+_pool: Optional[ConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def configure(creator: Callable[[], "mysql.connector.MySQLConnection"]) -> None:
+    """Register the function used to open raw connections for the process-wide pool."""
+    global _creator
+    _creator = creator
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it lazily (and again after a fork)."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            if _creator is None:
+                raise RuntimeError("db_pool.configure() must be called before using the pool")
+            _pool = ConnectionPool(
+                _creator,
+                pool_size=int(os.getenv("DB_POOL_SIZE", 5)),
+                max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", 10)),
+                recycle=int(os.getenv("DB_POOL_RECYCLE", 3600)),
+                pre_ping=_env_bool("DB_POOL_PRE_PING", True),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+            )
+            _pool_pid = pid
+            logger.info(
+                f"Created MySQL connection pool (size={_pool.pool_size}, "
+                f"overflow={_pool.max_overflow}, recycle={_pool.recycle}s)"
+            )
+    return _pool
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection; uncommitted work is rolled back on error."""
+    pool = get_pool()
+    conn = pool.acquire()
+    broken = False
+    try:
+        yield conn
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
+        raise
+    finally:
+        pool.release(conn, discard=broken)
+
+
+# Deadlock (1213) and lock wait timeout (1205): InnoDB rolled the statement back, so the
+# whole transaction can be retried safely
+RETRYABLE_ERRNOS = (1205, 1213)
+_transaction_retries = 0
+
+
+def run_transaction(work: Callable, retries: int = 3):
+    """Run ``work(cursor)`` on a pooled connection and commit, retrying on deadlock.
+
+    Query and commit time are recorded per calling function (the function ``work`` is
+    defined in).
+    """
+    global _transaction_retries
+    function = work.__qualname__.split(".")[0]
+    for attempt in range(retries + 1):
+        try:
+            with connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    with metrics.timed(metrics.DB_LATENCY, function=function, phase="query"):
+                        result = work(cursor)
+                    with metrics.timed(metrics.DB_LATENCY, function=function, phase="commit"):
+                        conn.commit()
+                    return result
+                finally:
+                    cursor.close()
+        except mysql.connector.Error as e:
+            if getattr(e, "errno", None) not in RETRYABLE_ERRNOS or attempt == retries:
+                raise
+            _transaction_retries += 1
+            metrics.DB_RETRIES.inc()
+            logger.warning(f"Retrying transaction after MySQL error {e.errno} (attempt {attempt + 1})")
+            time.sleep(0.05 * (attempt + 1))
+
+
+def pool_stats() -> Dict[str, object]:
+    """Pool statistics for monitoring; empty if the pool has not been used yet."""
+    if _pool is None or _pool_pid != os.getpid():
+        return {}
+    return dict(_pool.stats(), transaction_retries=_transaction_retries)
@@ -0,0 +1,250 @@
+"""Disk-backed cache of text embeddings for style memory.
+
+Embedding the same style docs, exemplars and fixed retrieval queries again on every call
+costs a network or model round trip each time. CachedEmbeddings wraps any embedding
+function and keeps every vector it computes:
+
+- key: SHA-256 of (embedding model id, document/query, text); queries and documents are
+  separate because some models embed them differently
+- vectors: one float32 row per entry in a fixed-size file, memory-mapped so reads are a
+  copy out of the page cache
+- index: SQLite (WAL) mapping key -> row and last use, shared by the workers on a host
+- row keys: the key each row was written for, in a second file. Another process may reuse
+  a row between a lookup and the copy, so a row whose key no longer matches is a miss
+
+Each embedding model gets its own directory under STYLE_EMBEDDING_CACHE_DIR (default
+./cache/embeddings). Once STYLE_EMBEDDING_CACHE_MAX_ENTRIES (20000) rows are in use, the
+least recently used entry's row is reused. Hits and misses are counted per process and in
+the forteai_embedding_cache_lookups_total metric.
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("STYLE_EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+MAX_ENTRIES = int(os.getenv("STYLE_EMBEDDING_CACHE_MAX_ENTRIES", 20000))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key BLOB PRIMARY KEY,
+    slot INTEGER NOT NULL UNIQUE,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# SQLite's default limit on host parameters is 999
+_LOOKUP_CHUNK = 500
+# SHA-256 digest (CachedEmbeddings._key)
+_KEY_BYTES = 32
+
+
+def default_cache_dir() -> str:
+    return os.getenv("STYLE_EMBEDDING_CACHE_DIR") or os.path.join(os.path.dirname(__file__), "cache", "embeddings")
+
+
+class EmbeddingCache:
+    """Fixed-capacity store of float32 vectors: memory-mapped rows plus an LRU index."""
+
+    def __init__(self, directory: str, max_entries: int = MAX_ENTRIES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_entries = max(1, max_entries)
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._vectors: Optional[np.memmap] = None
+        self._keys_path = os.path.join(directory, "keys.bin")
+        self._keys: Optional[np.memmap] = None
+        self.dim: Optional[int] = None
+        self.capacity: Optional[int] = None
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "index.sqlite3"), check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # A lost entry is only re-embedded, so durability can be relaxed
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    # ---------- vector file (lock held) ----------
+    @staticmethod
+    def _map(path: str, dtype, shape) -> np.memmap:
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)  # sparse until rows are written
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _open_vectors(self, dim: Optional[int] = None) -> bool:
+        """Map the vector and key files; the first writer fixes their dimension and capacity."""
+        if self._vectors is not None:
+            return True
+        if dim is not None:
+            self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (dim,))
+            self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('capacity', ?)", (self.max_entries,))
+        meta = dict(self._conn.execute("SELECT name, value FROM meta").fetchall())
+        if "dim" not in meta:
+            return False
+        self.dim, self.capacity = meta["dim"], meta["capacity"]
+
+        self._vectors = self._map(self._vectors_path, np.float32, (self.capacity, self.dim))
+        # Caches created before the key file existed start with zeroed keys: their rows
+        # read as misses and are rewritten by the next put
+        self._keys = self._map(self._keys_path, np.uint8, (self.capacity, _KEY_BYTES))
+        return True
+
+    def _row_key(self, slot: int) -> bytes:
+        return self._keys[slot].tobytes()
+
+    def _write_row(self, slot: int, key: bytes, vector) -> None:
+        # Clear the key first: a reader that copies the row mid-write sees a mismatch
+        self._keys[slot] = 0
+        self._vectors[slot] = vector
+        self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+
+    # ---------- public API ----------
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            slots = {}
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                slots.update(rows)
+            if slots and self._open_vectors():
+                for key, slot in slots.items():
+                    vector = np.array(self._vectors[slot])
+                    # Checked after the copy: the row may have been reused since the lookup
+                    if self._row_key(slot) == key:
+                        found[key] = vector
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = julianday('now') WHERE key = ?", [(key,) for key in found]
+                )
+            self._hits += len(found)
+            self._misses += len(keys) - len(found)
+        metrics.EMBEDDING_CACHE_LOOKUPS.labels(result="hit").inc(len(found))
+        metrics.EMBEDDING_CACHE_LOOKUPS.labels(result="miss").inc(len(keys) - len(found))
+        return found
+
+    def put_many(self, items: Dict[bytes, List[float]]) -> None:
+        if not items:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not self._open_vectors(len(next(iter(items.values())))):
+                    self._conn.execute("ROLLBACK")
+                    return
+                used = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                for key, vector in items.items():
+                    if len(vector) != self.dim:
+                        logger.warning(f"Not caching a {len(vector)}-dim embedding in a {self.dim}-dim cache")
+                        continue
+                    existing = self._conn.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                    if existing:
+                        if self._row_key(existing[0]) != key:
+                            self._write_row(existing[0], key, vector)  # row from before the key file
+                        continue
+                    if used < self.capacity:
+                        slot = used
+                        used += 1
+                    else:
+                        # Reuse the least recently used row
+                        old_key, slot = self._conn.execute(
+                            "SELECT key, slot FROM entries ORDER BY last_used LIMIT 1"
+                        ).fetchone()
+                        self._conn.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                        self._evictions += 1
+                    self._write_row(slot, key, vector)
+                    self._conn.execute(
+                        "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, julianday('now'))", (key, slot)
+                    )
+                # Rows must be on disk before other processes can find them through the index
+                self._vectors.flush()
+                self._keys.flush()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self._hits + self._misses
+            return {
+                "directory": self.directory,
+                "entries": entries,
+                "capacity": self.capacity or self.max_entries,
+                "dim": self.dim,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embedding function that serves repeated texts from an EmbeddingCache."""
+
+    def __init__(self, inner: Embeddings, model_id: str, cache: EmbeddingCache):
+        self.inner = inner
+        self.model_id = model_id
+        self.cache = cache
+
+    def _key(self, kind: str, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_id}\0{kind}\0{text}".encode("utf-8")).digest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        keys = [self._key("document", text) for text in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            self.cache.put_many(computed)
+            found.update({key: np.asarray(vector, dtype=np.float32) for key, vector in computed.items()})
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        found = self.cache.get_many([key])
+        if key in found:
+            return found[key].tolist()
+        vector = self.inner.embed_query(text)
+        self.cache.put_many({key: vector})
+        return list(vector)
+
+
+def cached(inner: Embeddings, model_id: str) -> Embeddings:
+    """Wrap ``inner`` with the disk cache for ``model_id`` (unchanged when the cache is disabled)."""
+    if not CACHE_ENABLED:
+        return inner
+    directory = os.path.join(default_cache_dir(), re.sub(r"[^A-Za-z0-9._-]+", "_", model_id))
+    return CachedEmbeddings(inner, model_id, EmbeddingCache(directory))
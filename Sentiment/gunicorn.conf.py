@@ -0,0 +1,79 @@
+"""Gunicorn configuration for the ForteAI sentiment service.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Environment variables:
+- FLASK_HOST / FLASK_PORT: bind address (default 0.0.0.0:5000)
+- GUNICORN_WORKERS: worker processes (default 2; LLM calls are I/O-bound on Ollama, so
+  a few processes with several threads each go further than many processes)
+- GUNICORN_THREADS: request threads per worker (default 8)
+- GUNICORN_TIMEOUT: seconds a request may run before the worker is restarted (default 600,
+  company analyses take minutes)
+- GUNICORN_GRACEFUL_TIMEOUT: seconds in-flight requests and background jobs get to finish
+  on shutdown/reload before being killed (default 300)
+- GUNICORN_MAX_REQUESTS: recycle a worker after this many requests (default 0 = never)
+- PROMETHEUS_MULTIPROC_DIR: where workers write /metrics samples (default ./prometheus_multiproc,
+  emptied on every start)
+"""
+import os
+import shutil
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+# Must be set before the app (and prometheus_client) is imported so every worker writes
+# its samples where /metrics can aggregate them
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prometheus_multiproc")
+)
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{int(os.getenv('FLASK_PORT', 5000))}"
+
+workers = int(os.getenv("GUNICORN_WORKERS", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+worker_class = "gthread"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 600))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 300))
+keepalive = 5
+
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+# Import Flask, LangChain and the MySQL driver in the master before forking
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be added to this run's counters
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    # Pools, queues and threads must be created per worker, never inherited from the master
+    from main import init_worker
+
+    init_worker()
+
+
+def worker_exit(server, worker):
+    # Gunicorn has stopped accepting requests and waited for in-flight ones (up to
+    # graceful_timeout); give running background jobs the same budget before closing the pool.
+    from main import shutdown_worker
+
+    shutdown_worker(timeout=graceful_timeout)
+
+
+def child_exit(server, worker):
+    from metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
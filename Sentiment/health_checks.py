@@ -0,0 +1,157 @@
+"""Background dependency checks behind GET /ready.
+
+Load-balancer probes must stay cheap, so no probe touches MySQL, Ollama or the vector
+store itself: a background thread per worker checks each dependency every
+READINESS_CHECK_INTERVAL seconds (10) and /ready serves the last results. Each result has
+a status ('ok' or 'error'), latency_ms, checked_at and the error message.
+
+- database: SELECT 1 on a pooled connection
+- ollama: GET /api/version on every Ollama backend (ok when at least one answers)
+- vector_store: document count of the style memory collection
+
+READINESS_REQUIRED (default "database,ollama") lists the dependencies that must be ok for
+/ready to return 200; the others are reported only. Results older than three intervals
+count as errors, so a stuck checker cannot keep a worker ready.
+"""
+import os
+import time
+import logging
+import threading
+import urllib.request
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import db_pool
+
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = float(os.getenv("READINESS_CHECK_INTERVAL", 10))
+CHECK_TIMEOUT = float(os.getenv("READINESS_CHECK_TIMEOUT", 5))
+REQUIRED = [d.strip() for d in os.getenv("READINESS_REQUIRED", "database,ollama").split(",") if d.strip()]
+
+
+def check_database() -> dict:
+    with db_pool.connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        finally:
+            cursor.close()
+    return {}
+
+
+def check_ollama(base_urls: List[str]) -> dict:
+    backends = {}
+    for url in base_urls:
+        start = time.monotonic()
+        try:
+            with urllib.request.urlopen(f"{url}/api/version", timeout=CHECK_TIMEOUT) as response:
+                response.read()
+            backends[url] = {"status": "ok"}
+        except Exception as e:
+            backends[url] = {"status": "error", "error": str(e)}
+        backends[url]["latency_ms"] = round((time.monotonic() - start) * 1000, 1)
+    if not any(b["status"] == "ok" for b in backends.values()):
+        return {"status": "error", "error": "No Ollama backend reachable", "backends": backends}
+    return {"backends": backends}
+
+
+def check_vector_store() -> dict:
+    import style_memory  # optional dependencies (Chroma); a failed import is reported as an error
+
+    return {"documents": style_memory.collection_count()}
+
+
+class DependencyChecker:
+    """Runs named checks on an interval and keeps the latest result of each."""
+
+    def __init__(self, checks: Dict[str, Callable[[], dict]], interval: float = CHECK_INTERVAL,
+                 required: Optional[List[str]] = None):
+        self.checks = checks
+        self.interval = interval
+        self.required = [name for name in (REQUIRED if required is None else required) if name in checks]
+        self._results: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_checks(self) -> None:
+        for name, check in self.checks.items():
+            start = time.monotonic()
+            try:
+                # A check raises, or returns details with its own status/error for partial failures
+                result = dict({"status": "ok", "error": None}, **(check() or {}))
+            except Exception as e:
+                result = {"status": "error", "error": str(e)}
+            result["latency_ms"] = round((time.monotonic() - start) * 1000, 1)
+            result["checked_at"] = datetime.now().isoformat()
+            result["_checked"] = time.monotonic()
+
+            with self._lock:
+                previous = self._results.get(name, {}).get("status")
+                self._results[name] = result
+            if result["status"] != previous and previous is not None:
+                log = logger.info if result["status"] == "ok" else logger.warning
+                log(f"Dependency {name} is now {result['status']}" + (f": {result['error']}" if result["error"] else ""))
+
+    def _run(self) -> None:
+        while True:
+            self.run_checks()
+            if self._stopping.wait(self.interval):
+                return
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="readiness-checks", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def status(self) -> dict:
+        """{'ready': bool, 'dependencies': {...}} from the latest results."""
+        now = time.monotonic()
+        dependencies = {}
+        with self._lock:
+            for name in self.checks:
+                result = dict(self._results.get(name) or {"status": "error", "error": "not checked yet"})
+                checked = result.pop("_checked", None)
+                if checked is not None and now - checked > 3 * self.interval:
+                    result.update(status="error", error=f"stale: last checked {round(now - checked)} s ago")
+                dependencies[name] = result
+        ready = all(dependencies[name]["status"] == "ok" for name in self.required)
+        return {"ready": ready, "required": self.required, "dependencies": dependencies}
+
+
+_checker: Optional[DependencyChecker] = None
+_checker_pid: Optional[int] = None
+_checker_lock = threading.Lock()
+
+
+def start(ollama_base_urls: List[str]) -> DependencyChecker:
+    """Start this process's dependency checker (called from init_worker)."""
+    global _checker, _checker_pid
+    with _checker_lock:
+        if _checker is None or _checker_pid != os.getpid():
+            _checker = DependencyChecker({
+                "database": check_database,
+                "ollama": lambda: check_ollama(ollama_base_urls),
+                "vector_store": check_vector_store,
+            })
+            _checker_pid = os.getpid()
+            _checker.start()
+    return _checker
+
+
+def stop() -> None:
+    if _checker is not None and _checker_pid == os.getpid():
+        _checker.stop()
+
+
+def dependency_status() -> dict:
+    if _checker is None or _checker_pid != os.getpid():
+        return {"ready": False, "required": REQUIRED, "dependencies": {}, "error": "checks not started"}
+    return _checker.status()
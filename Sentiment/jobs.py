@@ -0,0 +1,302 @@
+"""Background job queue for long-running analyses.
+
+Jobs are stored in a local SQLite database so the queue needs no external broker:
+set JOBS_DB_PATH to a file path (default ./jobs/jobs.sqlite3, shared by every worker
+process on the host) or to ':memory:' for a purely in-process queue. A bounded pool
+of worker threads (JOB_WORKERS, default 2) drains queued jobs; each job reports
+progress that callers poll via ``get_job``. Jobs enqueued with ``run_after`` are not
+started before that time (used to defer work to off-peak hours).
+
+Handlers are registered per job kind and called as ``handler(payload, progress)``,
+where ``progress(done, total)`` records how far the job has got. The handler's return
+value is stored as the job result. A handler that raises ``RetryLater`` puts its job back
+in the queue until ``run_after``: the job id stays valid and its status stays queued,
+with the failed attempt's message as the error.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER,
+    result TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    run_after TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class RetryLater(Exception):
+    """Raised by a handler to run the same job again at ``run_after`` (optionally with a new payload)."""
+
+    def __init__(self, message: str, run_after: datetime, payload: Optional[dict] = None):
+        super().__init__(message)
+        self.run_after = run_after
+        self.payload = payload
+
+
+def _default_db_path() -> str:
+    base = os.path.join(os.path.dirname(__file__), "jobs")
+    os.makedirs(base, exist_ok=True)
+    return os.path.join(base, "jobs.sqlite3")
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """SQLite-backed job queue drained by a fixed number of worker threads."""
+
+    def __init__(self, db_path: str, workers: int = 2, poll_interval: float = 1.0, retention_hours: float = 24):
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.retention_hours = retention_hours
+
+        self._handlers: Dict[str, Callable] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads = []
+        self._stopping = False
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        if db_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # Job files created before run_after existed
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "run_after" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN run_after TEXT")
+        self._requeue_orphans()
+
+    # ---------- storage helpers ----------
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _requeue_orphans(self) -> None:
+        """Put back jobs whose worker process died mid-run (e.g. after a restart)."""
+        rows = self._execute("SELECT id, worker_pid FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+        for row in rows:
+            if not _pid_alive(row["worker_pid"]):
+                self._execute(
+                    "UPDATE jobs SET status = ?, worker_pid = NULL, progress_done = 0 WHERE id = ? AND status = ?",
+                    (QUEUED, row["id"], RUNNING),
+                )
+                logger.warning(f"Re-queued orphaned job {row['id']}")
+
+    def _claim_next(self) -> Optional[sqlite3.Row]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND (run_after IS NULL OR run_after <= ?) "
+                "ORDER BY created_at LIMIT 1",
+                (QUEUED, _now()),
+            ).fetchone()
+            if row is None:
+                return None
+            # The status guard makes the claim atomic across processes sharing the file
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = ?, worker_pid = ?, started_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, os.getpid(), _now(), row["id"], QUEUED),
+            ).rowcount
+            if not claimed:
+                return None
+            return self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+
+    def _prune(self) -> None:
+        cutoff = datetime.fromtimestamp(time.time() - self.retention_hours * 3600).isoformat()
+        self._execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (SUCCEEDED, FAILED, cutoff),
+        )
+
+    # ---------- workers ----------
+    def _ensure_workers(self) -> None:
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._worker_loop, name=f"job-worker-{len(self._threads)}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _worker_loop(self) -> None:
+        while not self._stopping:
+            job = self._claim_next()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            self._run(job)
+
+    def _run(self, job: sqlite3.Row) -> None:
+        job_id = job["id"]
+        handler = self._handlers.get(job["kind"])
+
+        def progress(done: int, total: Optional[int] = None) -> None:
+            if total is None:
+                self._execute("UPDATE jobs SET progress_done = ? WHERE id = ?", (done, job_id))
+            else:
+                self._execute(
+                    "UPDATE jobs SET progress_done = ?, progress_total = ? WHERE id = ?", (done, total, job_id)
+                )
+
+        start = time.monotonic()
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind '{job['kind']}'")
+            result = handler(json.loads(job["payload"]), progress)
+            self._execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ? WHERE id = ?",
+                (SUCCEEDED, json.dumps(result, default=str), _now(), job_id),
+            )
+            logger.info(f"Job {job_id} ({job['kind']}) succeeded in {time.monotonic() - start:.1f}s")
+        except RetryLater as e:
+            logger.warning(f"Job {job_id} ({job['kind']}) will be retried at {e.run_after.isoformat()}: {e}")
+            self._execute(
+                "UPDATE jobs SET status = ?, error = ?, run_after = ?, payload = COALESCE(?, payload), "
+                "worker_pid = NULL, progress_done = 0 WHERE id = ?",
+                (QUEUED, str(e), e.run_after.isoformat(),
+                 json.dumps(e.payload) if e.payload is not None else None, job_id),
+            )
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['kind']}) failed: {e}")
+            self._execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (FAILED, str(e), _now(), job_id),
+            )
+
+    # ---------- public API ----------
+    def register(self, kind: str, handler: Callable) -> None:
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind: str, payload: dict, run_after: Optional[datetime] = None) -> str:
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, kind, payload, status, run_after, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), QUEUED, run_after.isoformat() if run_after else None, _now()),
+        )
+        self._prune()
+        self._ensure_workers()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "jobId": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": {"processed": row["progress_done"], "total": row["progress_total"]},
+            "payload": json.loads(row["payload"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "run_after": row["run_after"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    def depth(self) -> Dict[str, int]:
+        rows = self._execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Stop claiming new jobs and wait for running ones to finish."""
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for t in list(self._threads):
+            t.join(timeout)
+
+
+_queue: Optional[JobQueue] = None
+_queue_pid: Optional[int] = None
+_queue_lock = threading.Lock()
+_handlers: Dict[str, Callable] = {}
+
+
+def register(kind: str, handler: Callable) -> None:
+    """Register the handler for a job kind (applies to the current and any future queue)."""
+    _handlers[kind] = handler
+    if _queue is not None:
+        _queue.register(kind, handler)
+
+
+def get_queue() -> JobQueue:
+    """Return the process-wide queue, creating it lazily (and again after a fork)."""
+    global _queue, _queue_pid
+    pid = os.getpid()
+    if _queue is not None and _queue_pid == pid:
+        return _queue
+
+    with _queue_lock:
+        if _queue is None or _queue_pid != pid:
+            _queue = JobQueue(
+                os.getenv("JOBS_DB_PATH") or _default_db_path(),
+                workers=int(os.getenv("JOB_WORKERS", 2)),
+                poll_interval=float(os.getenv("JOB_POLL_INTERVAL", 1.0)),
+                retention_hours=float(os.getenv("JOB_RETENTION_HOURS", 24)),
+            )
+            for kind, handler in _handlers.items():
+                _queue.register(kind, handler)
+            _queue_pid = pid
+            logger.info(f"Job queue ready at {_queue.db_path} with {_queue.workers} workers")
+            # Pick up jobs left queued by a previous run
+            _queue._ensure_workers()
+    return _queue
+
+
+def enqueue(kind: str, payload: dict, run_after: Optional[datetime] = None) -> str:
+    return get_queue().enqueue(kind, payload, run_after)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    return get_queue().get(job_id)
+
+
+def shutdown(timeout: Optional[float] = None) -> None:
+    """Drain this process's queue (no-op if it never started one)."""
+    if _queue is not None and _queue_pid == os.getpid():
+        _queue.shutdown(timeout)
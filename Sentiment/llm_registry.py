@@ -0,0 +1,128 @@
+"""Shared ChatOllama / LLMChain instances and keep-alive HTTP clients for Ollama.
+
+Building a ChatOllama, PromptTemplate and LLMChain on every request is wasted work, and
+every ChatOllama opens its own ``ollama.Client`` (and with it a new HTTP connection pool).
+This registry builds each model once per (base_url, model, temperature, options) and each
+chain once per model + template. It also hands every ChatOllama the same thread-safe
+``ollama.Client`` per base URL, so TCP connections to Ollama are kept alive and reused
+across requests, threads and models.
+"""
+import logging
+import threading
+from typing import Dict, Hashable, Sequence, Tuple
+
+import ollama
+from langchain.chains import LLMChain
+from langchain.prompts import PromptTemplate
+from langchain_ollama import ChatOllama
+
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_clients: Dict[str, ollama.Client] = {}
+_models: Dict[Tuple[Hashable, ...], ChatOllama] = {}
+_chains: Dict[Tuple[Hashable, ...], LLMChain] = {}
+_stats = {"model_builds": 0, "model_hits": 0, "chain_builds": 0, "chain_hits": 0, "client_builds": 0}
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+
+def get_client(base_url: str) -> ollama.Client:
+    """Return the process-wide keep-alive ``ollama.Client`` for ``base_url``.
+
+    ``ollama.Client`` wraps an ``httpx.Client``, whose connection pool is safe to share
+    between threads.
+    """
+    client = _clients.get(base_url)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = ollama.Client(host=base_url)
+            _stats["client_builds"] += 1
+            logger.info(f"Created shared Ollama HTTP client for {base_url}")
+    return client
+
+
+def _use_shared_client(instance: ChatOllama, base_url: str) -> None:
+    """Replace the ``ollama.Client`` a ChatOllama built for itself with the shared one.
+
+    langchain-ollama (0.1.3 as pinned, and later releases) creates ``_client`` when the model
+    is constructed and generates through it. Fail loudly if a release stops doing that,
+    instead of silently opening a client per model again.
+    """
+    if not isinstance(getattr(instance, "_client", None), ollama.Client):
+        raise RuntimeError(
+            "Unsupported langchain-ollama version: ChatOllama has no ollama.Client in _client "
+            "(see requirements.txt for the supported version)"
+        )
+    client = get_client(base_url)
+    try:
+        instance._client = client  # private attribute on pydantic v2 models (langchain-ollama >= 0.2)
+    except ValueError:
+        instance.__dict__["_client"] = client  # pydantic v1 models reject unknown attributes
+
+
+def _options_key(options: dict) -> Tuple[Tuple[str, Hashable], ...]:
+    return tuple(sorted(options.items()))
+
+
+def get_model(base_url: str, model: str, temperature: float, **options) -> ChatOllama:
+    """Return a shared ChatOllama for (base_url, model, temperature, options)."""
+    key = (base_url, model, float(temperature), _options_key(options))
+    instance = _models.get(key)
+    if instance is not None:
+        _count("model_hits")
+        return instance
+    with _lock:
+        instance = _models.get(key)
+        if instance is None:
+            instance = ChatOllama(
+                base_url=base_url,
+                model=model,
+                temperature=temperature,
+                **options,
+            )
+            _use_shared_client(instance, base_url)
+            _models[key] = instance
+            _stats["model_builds"] += 1
+            logger.info(f"Built ChatOllama for {model} at {base_url} (temperature={temperature}, options={options})")
+        else:
+            _stats["model_hits"] += 1
+    return instance
+
+
+def get_chain(
+    template: str,
+    input_variables: Sequence[str],
+    base_url: str,
+    model: str,
+    temperature: float,
+    **options,
+) -> LLMChain:
+    """Return a shared LLMChain for the given prompt template on a shared ChatOllama."""
+    key = (template, tuple(input_variables), base_url, model, float(temperature), _options_key(options))
+    chain = _chains.get(key)
+    if chain is not None:
+        _count("chain_hits")
+        return chain
+    llm = get_model(base_url, model, temperature, **options)
+    with _lock:
+        chain = _chains.get(key)
+        if chain is None:
+            prompt = PromptTemplate(template=template, input_variables=list(input_variables))
+            chain = _chains[key] = LLMChain(llm=llm, prompt=prompt)
+            _stats["chain_builds"] += 1
+        else:
+            _stats["chain_hits"] += 1
+    return chain
+
+
+def registry_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats, models=len(_models), chains=len(_chains), clients=len(_clients))
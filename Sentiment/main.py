@@ -7,17 +7,33 @@ except Exception:
     pass
 
 import mysql.connector
-from langchain_ollama import ChatOllama
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-import itertools
+import db_pool
+import company_mapreduce
+import llm_registry
+import jobs
+import structured_output
+import analysis_cache
+import admission
+import write_behind
+import company_aggregate
+import company_stats
+import prescorer
+import streaming
+import ollama_router
+import model_warmup
+import health_checks
+import metrics
 import logging
 import sys
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import json
 import re
-from datetime import datetime
+import time
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -114,49 +130,38 @@ Answer: {q25}
 """
 
 # ================= LLM SETUP =================
-# --- API Key Rotation ---
-# (Kept for backward compatibility but not required for Ollama)
-_raw_keys = os.getenv('GOOGLE_API_KEYS')
-API_KEYS = [k.strip() for k in _raw_keys.split(',') if k.strip()] if _raw_keys else []
-key_cycle = itertools.cycle(API_KEYS) if API_KEYS else None
-request_count = 0
-REQUEST_LIMIT = int(os.getenv('GOOGLE_API_REQUEST_LIMIT', 15))
-CURRENT_API_KEY = API_KEYS[0] if API_KEYS else os.getenv('GOOGLE_API_KEY', '')
-
 # OLLAMA configuration (the user requested these values)
-OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+# Ollama backends generations are routed across: OLLAMA_BASE_URLS (comma-separated) or
+# the single OLLAMA_BASE_URL (see ollama_router)
+OLLAMA_BASE_URLS = ollama_router.configured_urls()
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.1:latest')
-
-def get_api_key():
-    """Return an API key. Rotates through configured keys when REQUEST_LIMIT is exceeded.
-
-    If no keys are configured via environment variables, returns an empty string which
-    allows callers to decide how to proceed (the LangChain client will likely raise
-    an error if no valid key is provided).
-    """
-    global request_count, CURRENT_API_KEY, key_cycle
-    if not API_KEYS:
-        return CURRENT_API_KEY
-
-    request_count += 1
-    if request_count > REQUEST_LIMIT:
-        try:
-            CURRENT_API_KEY = next(key_cycle)
-        except Exception:
-            # Recreate cycle and continue
-            key_cycle = itertools.cycle(API_KEYS)
-            CURRENT_API_KEY = next(key_cycle)
-        request_count = 1
-        logger.info(f"Switching to new API key: ...{CURRENT_API_KEY[-4:]}")
-    return CURRENT_API_KEY
+# Context window requested from Ollama; defaults to a working window for the configured model family
+OLLAMA_NUM_CTX = int(os.getenv('OLLAMA_NUM_CTX', company_mapreduce.context_window_for_model(OLLAMA_MODEL)))
+# How long Ollama keeps the model loaded after each request (see model_warmup)
+OLLAMA_KEEP_ALIVE = model_warmup.KEEP_ALIVE
 
 # ================= NEW: FLASK WEB SERVICE INTEGRATION =================
 app = Flask(__name__)
 CORS(app)
 
+@app.before_request
+def _start_request_timer():
+    request.environ['forteai.start'] = time.perf_counter()
+
+@app.after_request
+def _record_request_latency(response):
+    """Request latency per route template (for streamed responses: until the stream starts)"""
+    start = request.environ.get('forteai.start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.REQUEST_LATENCY.labels(
+            route=route, method=request.method, status=str(response.status_code)
+        ).observe(time.perf_counter() - start)
+    return response
+
 # Updated database connection for forteai_nexus database
 def get_fortai_db_connection():
-    """Updated DB connection for the main ForteAI database"""
+    """Open a raw connection to the main ForteAI database (used by the connection pool)"""
     return mysql.connector.connect(
         host=os.getenv('DB_HOST', 'localhost'),
         user=os.getenv('DB_USER', 'root'),
@@ -165,6 +170,9 @@ def get_fortai_db_connection():
         port=int(os.getenv('DB_PORT', 3306))
     )
 
+# All request paths borrow connections through db_pool.connection()
+db_pool.configure(get_fortai_db_connection)
+
 # Updated structured prompt with stricter JSON formatting requirements
 STRUCTURED_ANALYSIS_TEMPLATE = """
 CRITICAL INSTRUCTIONS - READ CAREFULLY:
@@ -185,6 +193,10 @@ positive_sentiment, neutral_sentiment, negative_sentiment, summary_opinion, key_
 
 """
 
+EMPLOYEE_ANALYSIS_TEMPERATURE = 0.3
+# Part of the analysis cache key: editing the prompt invalidates cached results
+EMPLOYEE_PROMPT_VERSION = analysis_cache.prompt_version(STRUCTURED_ANALYSIS_TEMPLATE)
+
 # ================= COMPANY ANALYSIS TEMPLATE =================
 COMPANY_ANALYSIS_TEMPLATE = """
 CRITICAL INSTRUCTIONS - READ CAREFULLY:
@@ -206,119 +218,221 @@ positive_sentiment, neutral_sentiment, negative_sentiment, summary_opinion, key_
 
 """
 
-def save_analysis_to_fortai_db(employee_id, company, analysis_data):
-    """Save the AI analysis results to responses_langchain_sentiment table"""
-    connection = None
-    cursor = None
+# ================= COMPANY REDUCE TEMPLATE =================
+COMPANY_REDUCE_TEMPLATE = """
+CRITICAL INSTRUCTIONS - READ CAREFULLY:
+1. You MUST return ONLY a valid JSON object - nothing else
+2. NO text before the opening JSON
+3. NO text after the closing JSON
+4. NO markdown formatting, NO code blocks, NO explanations
+5. Return only the JSON object
+Each item below is a sentiment analysis of one batch of this company's employees, with the number of employees in that batch.
+Merge them into ONE company-wide JSON analysis. Weigh each batch by its employee count, keep the themes that recur across
+batches, and pick the three most significant positives and attrition factors for the whole company.
 
-    try:
-        connection = get_fortai_db_connection()
-        cursor = connection.cursor()
+COMPANY STATISTICS:
+{ground_truth}
 
-        # Check if record already exists
-        check_query = "SELECT id FROM responses_langchain_sentiment WHERE employeesID = %s"
-        cursor.execute(check_query, (employee_id,))
-        existing_record = cursor.fetchone()
-
-        if existing_record:
-            # Update existing record
-            update_query = """
-            UPDATE responses_langchain_sentiment SET
-                company = %s,
-                positive_sentiment = %s,
-                neutral_sentiment = %s,
-                negative_sentiment = %s,
-                summary_opinion = %s,
-                key_positive_1 = %s,
-                key_positive_2 = %s,
-                key_positive_3 = %s,
-                attrition_factor_1 = %s,
-                attrition_problem_1 = %s,
-                retention_strategy_1 = %s,
-                attrition_factor_2 = %s,
-                attrition_problem_2 = %s,
-                retention_strategy_2 = %s,
-                attrition_factor_3 = %s,
-                attrition_problem_3 = %s,
-                retention_strategy_3 = %s,
-                created_at = CURRENT_TIMESTAMP
-            WHERE employeesID = %s
-            """
+PARTIAL BATCH ANALYSES:
+{partial_analyses}
 
-            values = (
-                company,
-                analysis_data['positive_sentiment'],
-                analysis_data['neutral_sentiment'],
-                analysis_data['negative_sentiment'],
-                analysis_data['summary_opinion'],
-                analysis_data['key_positive_1'],
-                analysis_data['key_positive_2'],
-                analysis_data['key_positive_3'],
-                analysis_data['attrition_factor_1'],
-                analysis_data['attrition_problem_1'],
-                analysis_data['retention_strategy_1'],
-                analysis_data['attrition_factor_2'],
-                analysis_data['attrition_problem_2'],
-                analysis_data['retention_strategy_2'],
-                analysis_data['attrition_factor_3'],
-                analysis_data['attrition_problem_3'],
-                analysis_data['retention_strategy_3'],
-                employee_id
-            )
+RETURN ONLY THIS JSON STRUCTURE (no other text):
+    YOU MUST INCLUDE ALL THESE FIELDS:
+positive_sentiment, neutral_sentiment, negative_sentiment, summary_opinion, key_positive_1, key_positive_2, key_positive_3, attrition_factor_1, attrition_problem_1, retention_strategy_1, attrition_factor_2, attrition_problem_2, retention_strategy_2, attrition_factor_3, attrition_problem_3, retention_strategy_3
+"""
 
-            cursor.execute(update_query, values)
-            logger.info(f"Updated existing analysis record for employee: {employee_id}")
+COMPANY_INCREMENTAL_TEMPLATE = """
+CRITICAL INSTRUCTIONS - READ CAREFULLY:
+1. You MUST return ONLY a valid JSON object - nothing else
+2. NO text before the opening JSON
+3. NO text after the closing JSON
+4. NO markdown formatting, NO code blocks, NO explanations
+5. Return only the JSON object
+Update this company's sentiment report. The aggregate below covers every analysed employee; the previous report was
+written before the listed employees' analyses changed. Keep what still holds, revise the summary, positives and attrition
+factors where the aggregate and the changed employees show a shift, and weigh themes by how many employees mention them.
 
-        else:
-            # Insert new record
-            insert_query = """
-            INSERT INTO responses_langchain_sentiment
-            (employeesID, company, positive_sentiment, neutral_sentiment, negative_sentiment,
-             summary_opinion, key_positive_1, key_positive_2, key_positive_3,
-             attrition_factor_1, attrition_problem_1, retention_strategy_1,
-             attrition_factor_2, attrition_problem_2, retention_strategy_2,
-             attrition_factor_3, attrition_problem_3, retention_strategy_3)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
+COMPANY AGGREGATE:
+{company_aggregate}
 
-            values = (
-                employee_id,
-                company,
-                analysis_data['positive_sentiment'],
-                analysis_data['neutral_sentiment'],
-                analysis_data['negative_sentiment'],
-                analysis_data['summary_opinion'],
-                analysis_data['key_positive_1'],
-                analysis_data['key_positive_2'],
-                analysis_data['key_positive_3'],
-                analysis_data['attrition_factor_1'],
-                analysis_data['attrition_problem_1'],
-                analysis_data['retention_strategy_1'],
-                analysis_data['attrition_factor_2'],
-                analysis_data['attrition_problem_2'],
-                analysis_data['retention_strategy_2'],
-                analysis_data['attrition_factor_3'],
-                analysis_data['attrition_problem_3'],
-                analysis_data['retention_strategy_3']
-            )
+PREVIOUS REPORT:
+{previous_report}
 
-            cursor.execute(insert_query, values)
-            logger.info(f"Inserted new analysis record for employee: {employee_id}")
+NEW OR CHANGED EMPLOYEE ANALYSES:
+{changed_employees}
 
-        connection.commit()
+RETURN ONLY THIS JSON STRUCTURE (no other text):
+    YOU MUST INCLUDE ALL THESE FIELDS:
+positive_sentiment, neutral_sentiment, negative_sentiment, summary_opinion, key_positive_1, key_positive_2, key_positive_3, attrition_factor_1, attrition_problem_1, retention_strategy_1, attrition_factor_2, attrition_problem_2, retention_strategy_2, attrition_factor_3, attrition_problem_3, retention_strategy_3
+"""
+
+# ================= COMPANY ANALYSIS MODE =================
+# 'single' (one prompt), 'hierarchical' (map-reduce over batches), 'auto', or 'incremental'
+# (aggregate + employees changed since the last report); overridable per request
+COMPANY_ANALYSIS_MODES = ('auto', 'single', 'hierarchical', 'incremental')
+COMPANY_ANALYSIS_MODE = os.getenv('COMPANY_ANALYSIS_MODE', 'auto').lower()
+# Tokens kept free in the context window for the model's JSON answer
+COMPANY_RESPONSE_TOKEN_RESERVE = int(os.getenv('COMPANY_RESPONSE_TOKEN_RESERVE', 1024))
+# Survey-data tokens per batch; derived from OLLAMA_NUM_CTX unless set explicitly
+COMPANY_BATCH_TOKEN_BUDGET = int(os.getenv(
+    'COMPANY_BATCH_TOKEN_BUDGET',
+    company_mapreduce.batch_token_budget(OLLAMA_NUM_CTX, COMPANY_ANALYSIS_TEMPLATE, COMPANY_RESPONSE_TOKEN_RESERVE)
+))
+# Partial-analysis tokens per reduce prompt (before the statistics block is subtracted)
+COMPANY_REDUCE_TOKEN_BUDGET = int(os.getenv(
+    'COMPANY_REDUCE_TOKEN_BUDGET',
+    company_mapreduce.batch_token_budget(OLLAMA_NUM_CTX, COMPANY_REDUCE_TEMPLATE, COMPANY_RESPONSE_TOKEN_RESERVE)
+))
+# Batches analysed in parallel in hierarchical mode
+COMPANY_MAP_CONCURRENCY = int(os.getenv('COMPANY_MAP_CONCURRENCY', 4))
+# Company percentages computed from stored employee analyses (company_stats.py) are given to
+# the model as ground truth and replace its numeric output
+COMPANY_NUMERIC_GROUND_TRUTH = os.getenv('COMPANY_NUMERIC_GROUND_TRUTH', 'True').lower() == 'true'
+# Most recently changed employees shown to the model in incremental mode
+COMPANY_INCREMENTAL_MAX_CHANGED = int(os.getenv('COMPANY_INCREMENTAL_MAX_CHANGED', 50))
+# A report's snapshot time is taken this many seconds early, so analyses whose transaction
+# was still open when the report started are picked up by the next incremental report
+COMPANY_SNAPSHOT_MARGIN_SECONDS = int(os.getenv('COMPANY_SNAPSHOT_MARGIN_SECONDS', 60))
+
+# Single-statement upserts keyed by the unique keys from
+# migrations/003_sentiment_result_unique_keys.sql: one round trip, and concurrent saves
+# of the same employee/company can no longer both take the INSERT branch
+ANALYSIS_COLUMNS = ", ".join(structured_output.ANALYSIS_FIELDS)
+ANALYSIS_UPDATES = ", ".join(f"{field} = VALUES({field})" for field in structured_output.ANALYSIS_FIELDS)
+
+# responses_langchain_sentiment.analysis_status (migrations/006_employee_analysis_status.sql).
+# Only complete analyses feed company aggregates, statistics and pre-scorer training.
+ANALYSIS_COMPLETE = 'complete'
+ANALYSIS_PROVISIONAL = 'provisional'
+ANALYSIS_FALLBACK = 'fallback'
+ANALYSIS_FAILED = 'failed'
+
+EMPLOYEE_ANALYSIS_ROW = "(" + ", ".join(["%s"] * (len(structured_output.ANALYSIS_FIELDS) + 4)) + ")"
+EMPLOYEE_ANALYSIS_UPSERT = f"""
+INSERT INTO responses_langchain_sentiment (employeesID, company, {ANALYSIS_COLUMNS}, analysis_status, deferral_id)
+VALUES {{rows}}
+ON DUPLICATE KEY UPDATE company = VALUES(company), {ANALYSIS_UPDATES}, analysis_status = VALUES(analysis_status),
+    deferral_id = VALUES(deferral_id), created_at = CURRENT_TIMESTAMP
+"""
+
+COMPANY_ANALYSIS_UPSERT = f"""
+INSERT INTO company_reports_sentiment (company_id, {ANALYSIS_COLUMNS}, snapshot_at, is_filled)
+VALUES ({", ".join(["%s"] * (len(structured_output.ANALYSIS_FIELDS) + 2))}, 1)
+ON DUPLICATE KEY UPDATE {ANALYSIS_UPDATES}, snapshot_at = VALUES(snapshot_at), created_at = CURRENT_TIMESTAMP, is_filled = 1
+"""
+
+def _analysis_values(analysis_data):
+    return [analysis_data[field] for field in structured_output.ANALYSIS_FIELDS]
+
+def analysis_status(cache_status):
+    """analysis_status to store for a result of analyze_sentiment_with_cache"""
+    return ANALYSIS_FALLBACK if cache_status == 'error' else ANALYSIS_COMPLETE
+
+def _counted(analysis_data, status):
+    """The analysis as seen by the company aggregate: None unless it is complete"""
+    return analysis_data if status == ANALYSIS_COMPLETE else None
+
+def save_analysis_to_fortai_db(employee_id, company, analysis_data, status=ANALYSIS_COMPLETE, deferral_id=None):
+    """Save the AI analysis results to responses_langchain_sentiment table"""
+    try:
+        def upsert(cursor):
+            previous = company_aggregate.lock_previous(cursor, [employee_id]) if company_aggregate.enabled() else None
+            cursor.execute(
+                EMPLOYEE_ANALYSIS_UPSERT.format(rows=EMPLOYEE_ANALYSIS_ROW),
+                [employee_id, company, *_analysis_values(analysis_data), status, deferral_id]
+            )
+            # MySQL reports 1 affected row for an insert and 2 for an update
+            affected = cursor.rowcount
+            if previous is not None:
+                company_aggregate.apply_changes(cursor, previous, [(employee_id, _counted(analysis_data, status))])
+            return affected
+
+        affected = db_pool.run_transaction(upsert)
+        action = "Inserted new" if affected == 1 else "Updated existing"
+        logger.info(f"{action} analysis record for employee: {employee_id}")
         return True
 
     except mysql.connector.Error as e:
         logger.error(f"Database save error: {e}")
-        if connection:
-            connection.rollback()
         raise
 
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+# Rows per multi-row statement when saving a batch of analyses
+ANALYSIS_WRITE_CHUNK_SIZE = int(os.getenv('ANALYSIS_WRITE_CHUNK_SIZE', 500))
+
+def save_analyses_to_fortai_db(records):
+    """Save many analyses to responses_langchain_sentiment in one transaction
+
+    `records` is a list of (employee_id, company, analysis_data, status[, deferral_id]),
+    written with one multi-row upsert per ANALYSIS_WRITE_CHUNK_SIZE rows.
+    """
+    if not records:
+        return 0
+
+    # Last analysis wins if an employee appears twice
+    latest = {}
+    for employee_id, company, analysis_data, status, *deferral_id in records:
+        latest[employee_id] = (company, analysis_data, status, deferral_id[0] if deferral_id else None)
+    employee_ids = list(latest)
+
+    try:
+        def upsert(cursor):
+            for start in range(0, len(employee_ids), ANALYSIS_WRITE_CHUNK_SIZE):
+                chunk = employee_ids[start:start + ANALYSIS_WRITE_CHUNK_SIZE]
+                previous = company_aggregate.lock_previous(cursor, chunk) if company_aggregate.enabled() else None
+                values = []
+                for employee_id in chunk:
+                    company, analysis_data, status, deferral_id = latest[employee_id]
+                    values.extend((employee_id, company, *_analysis_values(analysis_data), status, deferral_id))
+                cursor.execute(
+                    EMPLOYEE_ANALYSIS_UPSERT.format(rows=", ".join([EMPLOYEE_ANALYSIS_ROW] * len(chunk))),
+                    values
+                )
+                if previous is not None:
+                    company_aggregate.apply_changes(
+                        cursor, previous,
+                        [(employee_id, _counted(*latest[employee_id][1:3])) for employee_id in chunk]
+                    )
+
+        db_pool.run_transaction(upsert)
+        logger.info(f"Saved {len(employee_ids)} analysis records in one transaction")
+        return len(employee_ids)
+
+    except mysql.connector.Error as e:
+        logger.error(f"Database batch save error: {e}")
+        raise
+
+def _flush_employee_analyses(payloads):
+    # Entries journaled before analysis_status existed are complete analyses
+    save_analyses_to_fortai_db([
+        (p['employeeId'], p['company'], p['analysis'], p.get('status', ANALYSIS_COMPLETE), p.get('deferralId'))
+        for p in payloads
+    ])
+
+# Data errors (e.g. a value too long for its column) and malformed entries fail again on
+# every retry; such entries are dead-lettered instead of blocking the journal
+write_behind.register(
+    'employee_analysis', _flush_employee_analyses,
+    permanent_errors=(mysql.connector.DataError, mysql.connector.IntegrityError, KeyError, TypeError)
+)
+
+def persist_employee_analyses(records):
+    """Save (employee_id, company, analysis_data, status[, deferral_id]) records, or journal them in write-behind mode
+
+    Returns 'queued' when the records were appended to the local write-behind journal
+    (flushed to MySQL in the background) and 'saved' when they were written directly.
+    """
+    if write_behind.enabled():
+        write_behind.append_many('employee_analysis', [
+            {'employeeId': employee_id, 'company': company, 'analysis': analysis_data, 'status': status,
+             'deferralId': deferral_id[0] if deferral_id else None}
+            for employee_id, company, analysis_data, status, *deferral_id in records
+        ])
+        return 'queued'
+    if len(records) == 1:
+        save_analysis_to_fortai_db(*records[0])
+    else:
+        save_analyses_to_fortai_db(records)
+    return 'saved'
 
 def format_survey_responses_for_flask(answers):
     """Format the survey answers for analysis in Flask"""
@@ -335,43 +449,77 @@ def format_survey_responses_for_flask(answers):
 
     return "\n".join(formatted_responses)
 
-def analyze_sentiment_for_flask(answers):
-    """Perform sentiment analysis using Ollama via LangChain with improved error handling"""
-    try:
-        # Format the survey responses
-        survey_text = format_survey_responses_for_flask(answers)
+def _analyze_survey_text(survey_text, on_token=None):
+    """Run the structured employee analysis prompt and return the validated 16-field result
 
-        if not survey_text.strip():
-            raise ValueError("No valid survey responses found")
+    The generation is routed to one of the OLLAMA_BASE_URLS backends and moved to another
+    one if that backend turns out to be down. on_token: optional callback receiving
+    generated text as it streams from Ollama.
+    """
+    return _routed(lambda base_url, emit: _analyze_survey_text_at(base_url, survey_text, emit), on_token)
+
+def _routed(generate, on_token=None):
+    """Run generate(base_url, on_token) through the Ollama router
+
+    A generation that already streamed tokens to the client is not restarted elsewhere.
+    """
+    streamed = []
+
+    def emit(text):
+        streamed.append(True)
+        on_token(text)
+
+    return ollama_router.call(
+        lambda base_url: generate(base_url, emit if on_token else None),
+        can_retry=lambda: not streamed,
+    )
 
-        logger.info("Starting sentiment analysis with structured output using ChatOllama...")
+def _analyze_survey_text_at(base_url, survey_text, on_token=None):
+    """Employee analysis against one Ollama backend (see _analyze_survey_text)"""
+    logger.info(f"Starting sentiment analysis with structured output using ChatOllama at {base_url}...")
 
-        # Create the ChatOllama model instance
+    # Shared ChatOllama + LLMChain for the structured prompt (built once per process)
+    try:
+        chain = llm_registry.get_chain(
+            STRUCTURED_ANALYSIS_TEMPLATE,
+            ["survey_responses"],
+            base_url=base_url,
+            model=OLLAMA_MODEL,
+            temperature=EMPLOYEE_ANALYSIS_TEMPERATURE,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+        )
+    except Exception as e:
+        logger.error(f"Model initialization error (ChatOllama): {e}")
+        raise ValueError(f"Failed to initialize ChatOllama model: {e}")
+
+    analysis_data = None
+
+    # Constrained decoding: a single generation returns schema-valid JSON
+    if structured_output.enabled():
         try:
-            model = ChatOllama(
-                base_url=OLLAMA_BASE_URL,
-                model=OLLAMA_MODEL,
-                temperature=0.3,
+            analysis_data = structured_output.generate_analysis(
+                llm_registry.get_client(base_url),
+                OLLAMA_MODEL,
+                chain.prompt.format(survey_responses=survey_text),
+                {'temperature': EMPLOYEE_ANALYSIS_TEMPERATURE},
+                source='employee',
+                on_chunk=on_token,
+                keep_alive=OLLAMA_KEEP_ALIVE,
             )
+            logger.info("Successfully generated structured JSON response")
         except Exception as e:
-            logger.error(f"Model initialization error (ChatOllama): {e}")
-            raise ValueError(f"Failed to initialize ChatOllama model: {e}")
+            structured_output.record_path('employee_structured_failed')
+            logger.warning(f"Structured output failed, falling back to cleanup path: {e}")
 
-        # Create structured prompt and LLMChain
-        structured_prompt = PromptTemplate(
-            template=STRUCTURED_ANALYSIS_TEMPLATE,
-            input_variables=["survey_responses"]
-        )
-        chain = LLMChain(llm=model, prompt=structured_prompt)
-
-        # Generate the analysis with retry logic
+    # Fallback: free-form generation with cleanup and retry logic
+    if analysis_data is None:
         max_attempts = 3
-        analysis_data = None
         for attempt in range(max_attempts):
             try:
                 logger.info(f"Attempt {attempt + 1} of {max_attempts}")
 
-                analysis_text = chain.predict(survey_responses=survey_text).strip()
+                with metrics.generation('employee', 'fallback'):
+                    analysis_text = chain.predict(survey_responses=survey_text).strip()
 
                 logger.info(f"Raw AI response length: {len(analysis_text)}")
                 logger.info(f"Raw AI response preview: {analysis_text[:200]}...")
@@ -410,6 +558,7 @@ def analyze_sentiment_for_flask(answers):
                 try:
                     analysis_data = json.loads(analysis_text)
                     logger.info("Successfully parsed JSON response")
+                    structured_output.record_path(f"employee_cleanup_attempt_{attempt + 1}")
                     break  # Success, exit retry loop
 
                 except json.JSONDecodeError as e:
@@ -423,6 +572,7 @@ def analyze_sentiment_for_flask(answers):
                             try:
                                 analysis_data = json.loads(json_match.group())
                                 logger.info("Successfully extracted JSON from partial response")
+                                structured_output.record_path("employee_cleanup_extracted")
                                 break
                             except:
                                 pass
@@ -435,67 +585,122 @@ def analyze_sentiment_for_flask(answers):
             except Exception as e:
                 logger.error(f"Generation error on attempt {attempt + 1}: {e}")
                 if attempt == max_attempts - 1:
+                    structured_output.record_path("employee_cleanup_failed")
                     raise
 
-        if analysis_data is None:
-            raise ValueError("Failed to generate valid JSON analysis from the model")
+    if analysis_data is None:
+        raise ValueError("Failed to generate valid JSON analysis from the model")
 
-        # Validate required fields
-        required_fields = [
-            'positive_sentiment' , 'neutral_sentiment', 'negative_sentiment',
-            'summary_opinion', 'key_positive_1', 'key_positive_2', 'key_positive_3',
-            'attrition_factor_1', 'attrition_problem_1', 'retention_strategy_1',
-            'attrition_factor_2', 'attrition_problem_2', 'retention_strategy_2',
-            'attrition_factor_3', 'attrition_problem_3', 'retention_strategy_3'
-        ]
+    # Validate required fields
+    required_fields = [
+        'positive_sentiment' , 'neutral_sentiment', 'negative_sentiment',
+        'summary_opinion', 'key_positive_1', 'key_positive_2', 'key_positive_3',
+        'attrition_factor_1', 'attrition_problem_1', 'retention_strategy_1',
+        'attrition_factor_2', 'attrition_problem_2', 'retention_strategy_2',
+        'attrition_factor_3', 'attrition_problem_3', 'retention_strategy_3'
+    ]
 
-        missing_fields = [field for field in required_fields if field not in analysis_data]
-        if missing_fields:
-            raise ValueError(f"Missing required fields: {missing_fields}")
+    missing_fields = [field for field in required_fields if field not in analysis_data]
+    if missing_fields:
+        raise ValueError(f"Missing required fields: {missing_fields}")
 
-        # Validate and normalize sentiment percentages
-        try:
-            pos_sent = int(analysis_data['positive_sentiment'])
-            neu_sent = int(analysis_data['neutral_sentiment'])
-            neg_sent = int(analysis_data['negative_sentiment'])
-
-            total_sentiment = pos_sent + neu_sent + neg_sent
-
-            if abs(total_sentiment - 100) > 10:  # Allow 10% tolerance
-                logger.warning(f"Sentiment percentages don't add up to 100: {total_sentiment}. Normalizing...")
-                # Normalize the percentages
-                if total_sentiment > 0:
-                    factor = 100 / total_sentiment
-                    analysis_data['positive_sentiment'] = int(pos_sent * factor)
-                    analysis_data['neutral_sentiment'] = int(neu_sent * factor)
-                    analysis_data['negative_sentiment'] = 100 - analysis_data['positive_sentiment'] - analysis_data['neutral_sentiment']
-                else:
-                    # Default distribution if all zero
-                    analysis_data['positive_sentiment'] = 40
-                    analysis_data['neutral_sentiment'] = 40
-                    analysis_data['negative_sentiment'] = 20
-
-        except (ValueError, TypeError) as e:
-            logger.error(f"Sentiment validation error: {e}")
-            # Provide default values
-            analysis_data['positive_sentiment'] = 40
-            analysis_data['neutral_sentiment'] = 40
-            analysis_data['negative_sentiment'] = 20
-
-        # Ensure all text fields are strings and not empty
-        text_fields = [
-            'summary_opinion', 'key_positive_1', 'key_positive_2', 'key_positive_3',
-            'attrition_factor_1', 'attrition_problem_1', 'retention_strategy_1',
-            'attrition_factor_2', 'attrition_problem_2', 'retention_strategy_2',
-            'attrition_factor_3', 'attrition_problem_3', 'retention_strategy_3'
-        ]
+    # Validate and normalize sentiment percentages
+    try:
+        pos_sent = int(analysis_data['positive_sentiment'])
+        neu_sent = int(analysis_data['neutral_sentiment'])
+        neg_sent = int(analysis_data['negative_sentiment'])
+
+        total_sentiment = pos_sent + neu_sent + neg_sent
+
+        if abs(total_sentiment - 100) > 10:  # Allow 10% tolerance
+            logger.warning(f"Sentiment percentages don't add up to 100: {total_sentiment}. Normalizing...")
+            # Normalize the percentages
+            if total_sentiment > 0:
+                factor = 100 / total_sentiment
+                analysis_data['positive_sentiment'] = int(pos_sent * factor)
+                analysis_data['neutral_sentiment'] = int(neu_sent * factor)
+                analysis_data['negative_sentiment'] = 100 - analysis_data['positive_sentiment'] - analysis_data['neutral_sentiment']
+            else:
+                # Default distribution if all zero
+                analysis_data['positive_sentiment'] = 40
+                analysis_data['neutral_sentiment'] = 40
+                analysis_data['negative_sentiment'] = 20
+
+    except (ValueError, TypeError) as e:
+        logger.error(f"Sentiment validation error: {e}")
+        # Provide default values
+        analysis_data['positive_sentiment'] = 40
+        analysis_data['neutral_sentiment'] = 40
+        analysis_data['negative_sentiment'] = 20
+
+    # Ensure all text fields are strings and not empty
+    text_fields = [
+        'summary_opinion', 'key_positive_1', 'key_positive_2', 'key_positive_3',
+        'attrition_factor_1', 'attrition_problem_1', 'retention_strategy_1',
+        'attrition_factor_2', 'attrition_problem_2', 'retention_strategy_2',
+        'attrition_factor_3', 'attrition_problem_3', 'retention_strategy_3'
+    ]
+
+    for field in text_fields:
+        if not isinstance(analysis_data.get(field), str) or not analysis_data[field].strip():
+            analysis_data[field] = f"Analysis needed for {field.replace('_', ' ')}"
+
+    return analysis_data
+
+def analyze_sentiment_with_cache(answers, tenant=None, reject_when_full=True, on_token=None, lookup=None):
+    """Sentiment analysis with the content-addressed result cache
+
+    Returns (analysis_data, cache_status) where cache_status is 'memory' or 'shared' for
+    cache hits (the model is skipped), 'miss', 'disabled', or 'error' for the fallback
+    structure returned after a failure (which is never cached). The model call takes a slot
+    from the LLM admission controller under `tenant` (the company) and raises
+    admission.AdmissionRejected when the queue is full, unless reject_when_full is False
+    (bulk callers wait for their turn instead). on_token receives the generated text as it
+    streams (not called on cache hits). lookup is a result of lookup_cached_analysis the
+    caller already made for these answers, so the cache is not asked (and counted) twice.
+    """
+    start = time.perf_counter()
+    analysis_data, cache_status = _analyze_sentiment_with_cache(answers, tenant, reject_when_full, on_token, lookup)
+    metrics.ANALYSIS_LATENCY.labels(kind='employee', mode=cache_status).observe(time.perf_counter() - start)
+    return analysis_data, cache_status
+
+def lookup_cached_analysis(survey_text):
+    """(cache, key, cached analysis or None, cache_status) for a formatted survey
+
+    cache and key are None when the cache is disabled.
+    """
+    cache = analysis_cache.get_cache()
+    if cache is None:
+        return None, None, None, 'disabled'
+    key = analysis_cache.cache_key(survey_text, OLLAMA_MODEL, EMPLOYEE_PROMPT_VERSION, EMPLOYEE_ANALYSIS_TEMPERATURE)
+    cached, cache_status = cache.get(key)
+    metrics.CACHE_LOOKUPS.labels(result=cache_status if cached is not None else analysis_cache.MISS).inc()
+    return cache, key, cached, cache_status
+
+def _analyze_sentiment_with_cache(answers, tenant, reject_when_full, on_token, lookup=None):
+    try:
+        # Format the survey responses
+        survey_text = format_survey_responses_for_flask(answers)
+
+        if not survey_text.strip():
+            raise ValueError("No valid survey responses found")
+
+        cache, key, cached, cache_status = lookup or lookup_cached_analysis(survey_text)
+        if cached is not None:
+            logger.info(f"Analysis cache hit ({cache_status}) - skipping model call")
+            return dict(cached), cache_status
+
+        with admission.slot(tenant, reject_when_full=reject_when_full):
+            analysis_data = _analyze_survey_text(survey_text, on_token=on_token)
 
-        for field in text_fields:
-            if not isinstance(analysis_data.get(field), str) or not analysis_data[field].strip():
-                analysis_data[field] = f"Analysis needed for {field.replace('_', ' ')}"
+        if cache is not None:
+            cache.put(key, analysis_data)
 
         logger.info("Sentiment analysis completed successfully")
-        return analysis_data
+        return analysis_data, analysis_cache.MISS if cache is not None else 'disabled'
+
+    except admission.AdmissionRejected:
+        raise
 
     except Exception as e:
         logger.error(f"Sentiment analysis error: {e}")
@@ -517,81 +722,133 @@ def analyze_sentiment_for_flask(answers):
             "attrition_factor_3": "Service interruption",
             "attrition_problem_3": "Temporary technical difficulties",
             "retention_strategy_3": "Contact IT support for resolution"
-        }
+        }, 'error'
 
-def get_company_employee_data(company_id):
-    """Fetch ALL employee RAW survey responses for a specific company for comprehensive analysis"""
-    connection = None
-    cursor = None
+def analyze_sentiment_for_flask(answers, tenant=None):
+    """Perform sentiment analysis using Ollama via LangChain with improved error handling"""
+    analysis_data, _ = analyze_sentiment_with_cache(answers, tenant=tenant)
+    return analysis_data
 
-    try:
-        connection = get_fortai_db_connection()
-        cursor = connection.cursor(dictionary=True)
-
-        # Get all employees in the company (excluding HR)
-        employees_query = """
-        SELECT employeesID, name
-        FROM employees
-        WHERE company_id = %s AND role != 'HR' AND COALESCE(is_filled, 0) = 1
-        ORDER BY employeesID
-        """
-
-        cursor.execute(employees_query, (company_id,))
-        employees = cursor.fetchall()
-
-        if not employees:
-            logger.warning(f"No employees found for company_id: {company_id}")
-            return []
+# ================= ADMISSION TENANTS =================
+# Employee and company analyses share one fair-queue tenant per company_id. The free-text
+# company name in request bodies is never used, so clients cannot create extra tenants.
+EMPLOYEE_COMPANY_QUERY = "SELECT employeesID, company_id FROM employees WHERE employeesID IN ({ids})"
+EMPLOYEE_TENANT_CACHE_SIZE = 10000
+_employee_companies = {}
+_employee_companies_lock = threading.Lock()
 
-        logger.info(f"Found {len(employees)} employees for company {company_id}")
-
-        # For each employee, fetch all their survey responses
-        employee_data = []
-
-        for employee in employees:
-            emp_id = employee['employeesID']
-            emp_name = employee['name']
-
-            # Fetch all responses for this employee with question details
-            responses_query = """
-            SELECT
-                rs.form_question_id,
-                rs.answer_text,
-                rs.answer_choice,
-                fq.master_question_id,
-                mq.question_number,
-                fq.question_text
-            FROM responses_sentiment rs
-            JOIN formquestions_sentiment fq ON rs.form_question_id = fq.form_question_id
-            JOIN masterquestions_sentiment mq ON fq.master_question_id = mq.master_question_id
-            WHERE rs.employeesID = %s
-            ORDER BY mq.question_number
-            """
+def company_tenant(company_id):
+    """Admission tenant for a company"""
+    return f"company:{company_id}"
 
-            cursor.execute(responses_query, (emp_id,))
-            responses = cursor.fetchall()
+def employee_tenants(employee_ids):
+    """{employee_id: tenant} from the employees' company_id (cached per process)
 
-            if not responses:
-                logger.warning(f"No responses found for employee {emp_id}")
-                continue
+    Unknown employees, or all of them when the lookup fails, share admission.DEFAULT_TENANT.
+    """
+    # Request bodies may carry ids as strings while MySQL returns integers
+    keys = {employee_id: str(employee_id) for employee_id in employee_ids}
+    with _employee_companies_lock:
+        known = {key: _employee_companies[key] for key in keys.values() if key in _employee_companies}
+    missing = [key for key in dict.fromkeys(keys.values()) if key not in known]
+    if missing:
+        found = {}
+        try:
+            with db_pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    for start in range(0, len(missing), ANALYSIS_WRITE_CHUNK_SIZE):
+                        chunk = missing[start:start + ANALYSIS_WRITE_CHUNK_SIZE]
+                        cursor.execute(EMPLOYEE_COMPANY_QUERY.format(ids=", ".join(["%s"] * len(chunk))), chunk)
+                        for employee_id, company_id in cursor.fetchall():
+                            if company_id is not None:
+                                found[str(employee_id)] = company_id
+                finally:
+                    cursor.close()
+        except Exception as e:
+            logger.warning(f"Could not resolve company_id for admission tenants: {e}")
+        with _employee_companies_lock:
+            if len(_employee_companies) + len(found) > EMPLOYEE_TENANT_CACHE_SIZE:
+                _employee_companies.clear()
+            _employee_companies.update(found)
+        known.update(found)
+    return {
+        employee_id: company_tenant(known[key]) if key in known else admission.DEFAULT_TENANT
+        for employee_id, key in keys.items()
+    }
+
+def employee_tenant(employee_id):
+    return employee_tenants([employee_id])[employee_id]
+
+# Rows are streamed from the server in batches of this size instead of being buffered
+COMPANY_FETCH_BATCH_SIZE = int(os.getenv('COMPANY_FETCH_BATCH_SIZE', 1000))
+
+# One set-based query for the whole company (see migrations/001_company_employee_data_indexes.sql).
+# `is_filled = 1` replaces COALESCE(is_filled, 0) = 1 (same result for NULLs) so the index can be used.
+COMPANY_RESPONSES_QUERY = """
+SELECT
+    e.employeesID,
+    e.name,
+    rs.form_question_id,
+    rs.answer_text,
+    rs.answer_choice,
+    fq.master_question_id,
+    mq.question_number,
+    fq.question_text
+FROM employees e
+JOIN responses_sentiment rs ON rs.employeesID = e.employeesID
+JOIN formquestions_sentiment fq ON rs.form_question_id = fq.form_question_id
+JOIN masterquestions_sentiment mq ON fq.master_question_id = mq.master_question_id
+WHERE e.company_id = %s AND e.role != 'HR' AND e.is_filled = 1
+ORDER BY e.employeesID, mq.question_number
+"""
 
-            # Format responses into a structured dictionary
-            formatted_responses = {}
-            for response in responses:
-                q_num = response['question_number']
-                question_text = response['question_text']
-                answer = response['answer_text'] if response['answer_text'] else response['answer_choice']
+def group_company_responses(rows):
+    """Group (employee, question) response rows into the per-employee structure used for analysis"""
+    employees = {}
+    for row in rows:
+        emp_id = row['employeesID']
+        employee = employees.get(emp_id)
+        if employee is None:
+            employee = employees[emp_id] = {
+                "employeesID": emp_id,
+                "name": row['name'],
+                "responses": {}
+            }
 
-                formatted_responses[f"q{q_num}"] = {
-                    "question": question_text,
-                    "answer": answer or "No response"
-                }
+        answer = row['answer_text'] if row['answer_text'] else row['answer_choice']
+        employee["responses"][f"q{row['question_number']}"] = {
+            "question": row['question_text'],
+            "answer": answer or "No response"
+        }
 
-            employee_data.append({
-                "employeesID": emp_id,
-                "name": emp_name,
-                "responses": formatted_responses
-            })
+    return list(employees.values())
+
+def _stream_rows(cursor, batch_size):
+    """Yield rows from an unbuffered cursor without materialising the full result set"""
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        yield from batch
+
+def get_company_employee_data(company_id):
+    """Fetch ALL employee RAW survey responses for a specific company for comprehensive analysis"""
+    try:
+        with db_pool.connection() as connection:
+            # Unbuffered cursor: rows stream from MySQL while they are grouped
+            cursor = connection.cursor(dictionary=True, buffered=False)
+            try:
+                # Employees (excluding HR) and all their answers in a single round trip
+                with metrics.timed(metrics.DB_LATENCY, function='get_company_employee_data', phase='query'):
+                    cursor.execute(COMPANY_RESPONSES_QUERY, (company_id,))
+                    employee_data = group_company_responses(_stream_rows(cursor, COMPANY_FETCH_BATCH_SIZE))
+            finally:
+                cursor.close()
+
+        if not employee_data:
+            logger.warning(f"No employees with survey responses found for company_id: {company_id}")
+            return []
 
         logger.info(f"Successfully fetched survey data for {len(employee_data)} employees")
         return employee_data
@@ -600,12 +857,6 @@ def get_company_employee_data(company_id):
         logger.error(f"Database error getting company employee data: {e}")
         raise
 
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
-
 def format_company_data_for_analysis(employee_data):
     """Format ALL employee RAW survey responses for comprehensive company analysis"""
     if not employee_data:
@@ -644,48 +895,58 @@ def format_company_data_for_analysis(employee_data):
 
     return "\n".join(formatted_data)
 
-def analyze_company_sentiment(company_id):
-    """Perform company-wide sentiment analysis using ChatOllama via LangChain"""
-    try:
-        # Get all employee data for the company
-        employee_data = get_company_employee_data(company_id)
+def _generate_company_analysis(template, on_token=None, **inputs):
+    """Run a company-level prompt through ChatOllama and return the validated 16-field analysis
 
-        if not employee_data:
-            raise ValueError(f"No employee sentiment data found for company_id: {company_id}")
+    Routed across the OLLAMA_BASE_URLS backends like _analyze_survey_text.
+    """
+    return _routed(lambda base_url, emit: _generate_company_analysis_at(base_url, template, emit, **inputs), on_token)
 
-        # Format the data for analysis
-        formatted_company_data = format_company_data_for_analysis(employee_data)
+def _generate_company_analysis_at(base_url, template, on_token=None, **inputs):
+    """Company analysis against one Ollama backend (see _generate_company_analysis)"""
+    # Shared ChatOllama + LLMChain for this prompt, with explicit JSON instruction
+    try:
+        chain = llm_registry.get_chain(
+            "You must return valid JSON only. " + template,
+            sorted(inputs),
+            base_url=base_url,
+            model=OLLAMA_MODEL,
+            temperature=0.3,
+            num_ctx=OLLAMA_NUM_CTX,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+        )
+    except Exception as e:
+        logger.error(f"Model initialization error (ChatOllama): {e}")
+        raise ValueError(f"Failed to initialize ChatOllama model: {e}")
 
-        logger.info(f"Starting company sentiment analysis for {len(employee_data)} employees...")
-        logger.info(f"Sample of data being sent to AI: {formatted_company_data[:500]}...")  # Log first 500 chars
+    analysis_data = None
 
-        # Create the ChatOllama model instance
+    # Constrained decoding: a single generation returns schema-valid JSON
+    if structured_output.enabled():
         try:
-            model = ChatOllama(
-                base_url=OLLAMA_BASE_URL,
-                model=OLLAMA_MODEL,
-                temperature=0.3,
+            analysis_data = structured_output.generate_analysis(
+                llm_registry.get_client(base_url),
+                OLLAMA_MODEL,
+                chain.prompt.format(**inputs),
+                {'temperature': 0.3, 'num_ctx': OLLAMA_NUM_CTX},
+                source='company',
+                on_chunk=on_token,
+                keep_alive=OLLAMA_KEEP_ALIVE,
             )
+            logger.info("Successfully generated structured company JSON response")
         except Exception as e:
-            logger.error(f"Model initialization error (ChatOllama): {e}")
-            raise ValueError(f"Failed to initialize ChatOllama model: {e}")
-
-        # Create structured prompt with explicit JSON instruction
-        company_prompt = PromptTemplate(
-            template="You must return valid JSON only. " + COMPANY_ANALYSIS_TEMPLATE,
-            input_variables=["all_employee_data"]
-        )
-
-        chain = LLMChain(llm=model, prompt=company_prompt)
+            structured_output.record_path('company_structured_failed')
+            logger.warning(f"Structured company output failed, falling back to cleanup path: {e}")
 
-        # Generate the analysis with retry logic
+    # Fallback: free-form generation with cleanup and retry logic
+    if analysis_data is None:
         max_attempts = 3
-        analysis_data = None
         for attempt in range(max_attempts):
             try:
                 logger.info(f"Company analysis attempt {attempt + 1} of {max_attempts}")
 
-                analysis_text = chain.predict(all_employee_data=formatted_company_data).strip()
+                with metrics.generation('company', 'fallback'):
+                    analysis_text = chain.predict(**inputs).strip()
 
                 # Get the response content
                 logger.info(f"Raw company AI response length: {len(analysis_text)}")
@@ -727,6 +988,7 @@ def analyze_company_sentiment(company_id):
                 try:
                     analysis_data = json.loads(analysis_text)
                     logger.info("Successfully parsed company JSON response")
+                    structured_output.record_path(f"company_cleanup_attempt_{attempt + 1}")
                     break
 
                 except json.JSONDecodeError as e:
@@ -745,6 +1007,7 @@ def analyze_company_sentiment(company_id):
 
                             analysis_data = json.loads(fixed_text)
                             logger.info("Successfully parsed company JSON after fixing")
+                            structured_output.record_path("company_cleanup_fixed")
                             break
                         except:
                             logger.error("Failed to parse JSON even after attempted fixes")
@@ -756,223 +1019,338 @@ def analyze_company_sentiment(company_id):
             except Exception as e:
                 logger.error(f"Company generation error on attempt {attempt + 1}: {e}")
                 if attempt == max_attempts - 1:
+                    structured_output.record_path("company_cleanup_failed")
                     raise
 
-        if analysis_data is None:
-            raise ValueError("Failed to generate valid JSON analysis from the model")
+    if analysis_data is None:
+        raise ValueError("Failed to generate valid JSON analysis from the model")
 
-        # Validate required fields
-        required_fields = [
-            'positive_sentiment', 'neutral_sentiment', 'negative_sentiment',
-            'summary_opinion', 'key_positive_1', 'key_positive_2', 'key_positive_3',
-            'attrition_factor_1', 'attrition_problem_1', 'retention_strategy_1',
-            'attrition_factor_2', 'attrition_problem_2', 'retention_strategy_2',
-            'attrition_factor_3', 'attrition_problem_3', 'retention_strategy_3'
-        ]
+    # Validate required fields
+    required_fields = [
+        'positive_sentiment', 'neutral_sentiment', 'negative_sentiment',
+        'summary_opinion', 'key_positive_1', 'key_positive_2', 'key_positive_3',
+        'attrition_factor_1', 'attrition_problem_1', 'retention_strategy_1',
+        'attrition_factor_2', 'attrition_problem_2', 'retention_strategy_2',
+        'attrition_factor_3', 'attrition_problem_3', 'retention_strategy_3'
+    ]
 
-        missing_fields = [field for field in required_fields if field not in analysis_data]
-        if missing_fields:
-            raise ValueError(f"Missing required fields: {missing_fields}")
+    missing_fields = [field for field in required_fields if field not in analysis_data]
+    if missing_fields:
+        raise ValueError(f"Missing required fields: {missing_fields}")
 
-        # Validate and normalize sentiment percentages
+    # Validate and normalize sentiment percentages
+    try:
+        pos_sent = int(analysis_data['positive_sentiment'])
+        neu_sent = int(analysis_data['neutral_sentiment'])
+        neg_sent = int(analysis_data['negative_sentiment'])
+
+        total_sentiment = pos_sent + neu_sent + neg_sent
+
+        if abs(total_sentiment - 100) > 10:
+            logger.warning(f"Company sentiment percentages don't add up to 100: {total_sentiment}. Normalizing...")
+            if total_sentiment > 0:
+                factor = 100 / total_sentiment
+                analysis_data['positive_sentiment'] = int(pos_sent * factor)
+                analysis_data['neutral_sentiment'] = int(neu_sent * factor)
+                analysis_data['negative_sentiment'] = 100 - analysis_data['positive_sentiment'] - analysis_data['neutral_sentiment']
+            else:
+                analysis_data['positive_sentiment'] = 50
+                analysis_data['neutral_sentiment'] = 30
+                analysis_data['negative_sentiment'] = 20
+
+    except (ValueError, TypeError) as e:
+        logger.error(f"Company sentiment validation error: {e}")
+        analysis_data['positive_sentiment'] = 50
+        analysis_data['neutral_sentiment'] = 30
+        analysis_data['negative_sentiment'] = 20
+
+    # Ensure all text fields are strings and not empty
+    text_fields = [
+        'summary_opinion', 'key_positive_1', 'key_positive_2', 'key_positive_3',
+        'attrition_factor_1', 'attrition_problem_1', 'retention_strategy_1',
+        'attrition_factor_2', 'attrition_problem_2', 'retention_strategy_2',
+        'attrition_factor_3', 'attrition_problem_3', 'retention_strategy_3'
+    ]
+
+    for field in text_fields:
+        if not isinstance(analysis_data.get(field), str) or not analysis_data[field].strip():
+            analysis_data[field] = f"Company analysis needed for {field.replace('_', ' ')}"
+
+    return analysis_data
+
+def get_company_stats(company_id, group_by=None):
+    """Vectorized sentiment statistics over the company's stored employee analyses"""
+    with db_pool.connection() as connection:
+        cursor = connection.cursor()
         try:
-            pos_sent = int(analysis_data['positive_sentiment'])
-            neu_sent = int(analysis_data['neutral_sentiment'])
-            neg_sent = int(analysis_data['negative_sentiment'])
-
-            total_sentiment = pos_sent + neu_sent + neg_sent
-
-            if abs(total_sentiment - 100) > 10:
-                logger.warning(f"Company sentiment percentages don't add up to 100: {total_sentiment}. Normalizing...")
-                if total_sentiment > 0:
-                    factor = 100 / total_sentiment
-                    analysis_data['positive_sentiment'] = int(pos_sent * factor)
-                    analysis_data['neutral_sentiment'] = int(neu_sent * factor)
-                    analysis_data['negative_sentiment'] = 100 - analysis_data['positive_sentiment'] - analysis_data['neutral_sentiment']
-                else:
-                    analysis_data['positive_sentiment'] = 50
-                    analysis_data['neutral_sentiment'] = 30
-                    analysis_data['negative_sentiment'] = 20
-
-        except (ValueError, TypeError) as e:
-            logger.error(f"Company sentiment validation error: {e}")
-            analysis_data['positive_sentiment'] = 50
-            analysis_data['neutral_sentiment'] = 30
-            analysis_data['negative_sentiment'] = 20
-
-        # Ensure all text fields are strings and not empty
-        text_fields = [
-            'summary_opinion', 'key_positive_1', 'key_positive_2', 'key_positive_3',
-            'attrition_factor_1', 'attrition_problem_1', 'retention_strategy_1',
-            'attrition_factor_2', 'attrition_problem_2', 'retention_strategy_2',
-            'attrition_factor_3', 'attrition_problem_3', 'retention_strategy_3'
-        ]
+            scores, groups = company_stats.load_company_scores(cursor, company_id, group_by)
+        finally:
+            cursor.close()
+    return company_stats.compute_stats(scores, groups)
 
-        for field in text_fields:
-            if not isinstance(analysis_data.get(field), str) or not analysis_data[field].strip():
-                analysis_data[field] = f"Company analysis needed for {field.replace('_', ' ')}"
+def _company_ground_truth(company_id):
+    """Statistics to anchor the company prompt, or None when disabled or unavailable"""
+    if not COMPANY_NUMERIC_GROUND_TRUTH:
+        return None
+    try:
+        stats = get_company_stats(company_id, company_stats.GROUP_COLUMNS[0] if company_stats.GROUP_COLUMNS else None)
+    except Exception as e:
+        logger.warning(f"Company sentiment statistics unavailable for company_id {company_id}: {e}")
+        return None
+    return stats if stats['employees'] else None
+
+CHANGED_EMPLOYEES_QUERY = f"""
+SELECT e.name, {", ".join("r." + field for field in structured_output.ANALYSIS_FIELDS)}
+FROM responses_langchain_sentiment r
+JOIN employees e ON e.employeesID = r.employeesID
+WHERE e.company_id = %s AND e.role != 'HR' AND e.is_filled = 1 AND r.analysis_status = 'complete'
+    AND r.created_at >= %s
+ORDER BY r.created_at DESC
+"""
 
-        logger.info("Company sentiment analysis completed successfully")
-        return analysis_data
+def _format_changed_employee(name, analysis):
+    positives = "; ".join(analysis[f"key_positive_{i}"] for i in range(1, 4))
+    factors = "; ".join(analysis[f"attrition_factor_{i}"] for i in range(1, 4))
+    return (
+        f"Employee: {name}\n"
+        f"Sentiment: {analysis['positive_sentiment']}% positive, {analysis['neutral_sentiment']}% neutral, "
+        f"{analysis['negative_sentiment']}% negative\n"
+        f"Summary: {analysis['summary_opinion']}\n"
+        f"Key positives: {positives}\n"
+        f"Attrition factors: {factors}\n"
+    )
 
-    except Exception as e:
-        logger.error(f"Company sentiment analysis error: {e}")
-        # Return a fallback analysis structure
-        return {
-            "positive_sentiment": 50,
-            "neutral_sentiment": 30,
-            "negative_sentiment": 20,
-            "summary_opinion": f"Company analysis could not be completed due to technical issues: {str(e)}",
-            "key_positive_1": "Unable to determine - technical issue",
-            "key_positive_2": "Unable to determine - technical issue",
-            "key_positive_3": "Unable to determine - technical issue",
-            "attrition_factor_1": "Technical analysis failure",
-            "attrition_problem_1": "System unable to process company data",
-            "retention_strategy_1": "Manual review required",
-            "attrition_factor_2": "Data processing error",
-            "attrition_problem_2": "AI analysis service unavailable",
-            "retention_strategy_2": "Retry analysis when service is restored",
-            "attrition_factor_3": "Service interruption",
-            "attrition_problem_3": "Temporary technical difficulties",
-            "retention_strategy_3": "Contact IT support for resolution"
-        }
+def _analyze_company_incremental(company_id, generate, progress=None, on_token=None):
+    """Company report from the running aggregate plus the employees changed since the last report"""
+    def load_state(cursor):
+        aggregate = company_aggregate.load(cursor, company_id)
+        # Without maintenance on save (COMPANY_INCREMENTAL_AGGREGATE) a stored aggregate may be stale
+        if aggregate is None or not company_aggregate.enabled():
+            company_aggregate.rebuild(cursor, company_id)
+            aggregate = company_aggregate.load(cursor, company_id)
+
+        # Reports saved before migrations/005 have no snapshot time; fall back to created_at
+        cursor.execute(
+            f"SELECT {ANALYSIS_COLUMNS}, COALESCE(snapshot_at, created_at) FROM company_reports_sentiment "
+            "WHERE company_id = %s",
+            (company_id,)
+        )
+        row = cursor.fetchone()
+        previous = dict(zip(structured_output.ANALYSIS_FIELDS, row)) if row else None
+        since = row[-1] if row else datetime(1970, 1, 1)
+
+        cursor.execute(CHANGED_EMPLOYEES_QUERY, (company_id, since))
+        changed = [(row[0], dict(zip(structured_output.ANALYSIS_FIELDS, row[1:]))) for row in cursor.fetchall()]
+        return aggregate, previous, changed
+
+    aggregate, previous, changed = db_pool.run_transaction(load_state)
+
+    if not aggregate['employees']:
+        raise ValueError(f"No employee analyses found for company_id: {company_id}")
+
+    sentiment = company_mapreduce.weighted_sentiment([(1, aggregate['sums'])])
+
+    if progress:
+        progress(0, len(changed))
+
+    if previous is not None and not changed:
+        logger.info(f"No employee analyses changed for company_id {company_id}; reusing the previous narrative")
+        return dict(previous, **sentiment)
 
-def save_company_analysis_to_db(company_id, analysis_data):
-    """Save the company AI analysis results to company_reports_sentiment table"""
-    connection = None
-    cursor = None
+    # Most recent changes first, as many as fit the batch budget
+    changed_text = []
+    used_tokens = 0
+    for name, analysis in changed[:COMPANY_INCREMENTAL_MAX_CHANGED]:
+        text = _format_changed_employee(name, analysis)
+        used_tokens += company_mapreduce.estimate_tokens(text)
+        if changed_text and used_tokens > COMPANY_BATCH_TOKEN_BUDGET:
+            break
+        changed_text.append(text)
 
+    logger.info(
+        f"Starting incremental company analysis for company_id {company_id}: {aggregate['employees']} employees "
+        f"in aggregate, {len(changed)} changed ({len(changed_text)} sent to the model)"
+    )
+
+    previous_report = (
+        "\n".join(f"{field}: {previous[field]}" for field in structured_output.TEXT_FIELDS)
+        if previous is not None else "None - this is the first report for this company"
+    )
+
+    analysis_data = generate(
+        COMPANY_INCREMENTAL_TEMPLATE,
+        on_token=on_token,
+        company_aggregate=company_aggregate.render(aggregate, sentiment),
+        previous_report=previous_report,
+        changed_employees="\n".join(changed_text) or "None",
+    )
+    # Percentages come from the exact headcount-weighted sums, not from the model
+    analysis_data.update(sentiment)
+
+    if progress:
+        progress(len(changed))
+    return analysis_data
+
+def analyze_company_sentiment(company_id, mode=None, progress=None, on_token=None):
+    """Perform company-wide sentiment analysis using ChatOllama via LangChain
+
+    mode: 'single' sends every employee in one prompt, 'hierarchical' analyses token-budgeted
+    batches in parallel and merges them, 'auto' (default) picks hierarchical only when the
+    single prompt would not fit the model's context window.
+    progress: optional callback progress(processed, total) reporting employees analysed.
+    on_token: optional callback receiving generated text as it streams (single and incremental
+    modes; hierarchical batches run in parallel and report through progress instead).
+    'incremental' skips the raw answers and prompts with the stored company aggregate plus
+    the employees re-analysed since the last report.
+    Raises on failure (ValueError when the company has no data), so a failed analysis ends a
+    job as failed and is never saved.
+    """
+    mode = (mode or COMPANY_ANALYSIS_MODE).lower()
+    start = time.perf_counter()
     try:
-        connection = get_fortai_db_connection()
-        cursor = connection.cursor()
+        def generate(template, on_token=None, **inputs):
+            # Company analyses wait for a fair-queue LLM slot instead of being rejected
+            with admission.slot(company_tenant(company_id), reject_when_full=False):
+                return _generate_company_analysis(template, on_token=on_token, **inputs)
 
-        # Check if record already exists
-        check_query = "SELECT id FROM company_reports_sentiment WHERE company_id = %s"
-        cursor.execute(check_query, (company_id,))
-        existing_record = cursor.fetchone()
-
-        if existing_record:
-            # Update existing record
-            update_query = """
-            UPDATE company_reports_sentiment SET
-                positive_sentiment = %s,
-                neutral_sentiment = %s,
-                negative_sentiment = %s,
-                summary_opinion = %s,
-                key_positive_1 = %s,
-                key_positive_2 = %s,
-                key_positive_3 = %s,
-                attrition_factor_1 = %s,
-                attrition_problem_1 = %s,
-                retention_strategy_1 = %s,
-                attrition_factor_2 = %s,
-                attrition_problem_2 = %s,
-                retention_strategy_2 = %s,
-                attrition_factor_3 = %s,
-                attrition_problem_3 = %s,
-                retention_strategy_3 = %s,
-                created_at = CURRENT_TIMESTAMP,
-                is_filled = 1
-            WHERE company_id = %s
-            """
+        if mode == 'incremental':
+            return _analyze_company_incremental(company_id, generate, progress, on_token)
 
-            values = (
-                analysis_data['positive_sentiment'],
-                analysis_data['neutral_sentiment'],
-                analysis_data['negative_sentiment'],
-                analysis_data['summary_opinion'],
-                analysis_data['key_positive_1'],
-                analysis_data['key_positive_2'],
-                analysis_data['key_positive_3'],
-                analysis_data['attrition_factor_1'],
-                analysis_data['attrition_problem_1'],
-                analysis_data['retention_strategy_1'],
-                analysis_data['attrition_factor_2'],
-                analysis_data['attrition_problem_2'],
-                analysis_data['retention_strategy_2'],
-                analysis_data['attrition_factor_3'],
-                analysis_data['attrition_problem_3'],
-                analysis_data['retention_strategy_3'],
-                company_id
-            )
+        # Get all employee data for the company
+        employee_data = get_company_employee_data(company_id)
+
+        if not employee_data:
+            raise ValueError(f"No employee sentiment data found for company_id: {company_id}")
 
-            cursor.execute(update_query, values)
-            logger.info(f"Updated existing company analysis record for company_id: {company_id}")
+        if progress:
+            progress(0, len(employee_data))
 
+        # Format the data for analysis
+        formatted_company_data = format_company_data_for_analysis(employee_data)
+        ground_truth = _company_ground_truth(company_id)
+
+        if mode == 'auto':
+            estimated_tokens = company_mapreduce.estimate_tokens(formatted_company_data)
+            mode = 'hierarchical' if estimated_tokens > COMPANY_BATCH_TOKEN_BUDGET else 'single'
+            logger.info(f"Company prompt needs ~{estimated_tokens} tokens (budget {COMPANY_BATCH_TOKEN_BUDGET}); using {mode} mode")
+
+        logger.info(f"Starting {mode} company sentiment analysis for {len(employee_data)} employees...")
+
+        if mode == 'hierarchical':
+            # The merge prompt states the computed numbers too, so its themes match them
+            ground_truth_text = company_stats.render(ground_truth) if ground_truth else "None available"
+            analysis_data = company_mapreduce.map_reduce_company_analysis(
+                employee_data,
+                format_batch=format_company_data_for_analysis,
+                analyze_batch=lambda text: generate(COMPANY_ANALYSIS_TEMPLATE, all_employee_data=text),
+                merge_partials=lambda text: generate(
+                    COMPANY_REDUCE_TEMPLATE, partial_analyses=text, ground_truth=ground_truth_text
+                ),
+                token_budget=COMPANY_BATCH_TOKEN_BUDGET,
+                reduce_token_budget=max(
+                    256, COMPANY_REDUCE_TOKEN_BUDGET - company_mapreduce.estimate_tokens(ground_truth_text)
+                ),
+                max_workers=COMPANY_MAP_CONCURRENCY,
+                on_progress=progress,
+            )
         else:
-            # Insert new record
-            insert_query = """
-            INSERT INTO company_reports_sentiment
-            (company_id, positive_sentiment, neutral_sentiment, negative_sentiment,
-             summary_opinion, key_positive_1, key_positive_2, key_positive_3,
-             attrition_factor_1, attrition_problem_1, retention_strategy_1,
-             attrition_factor_2, attrition_problem_2, retention_strategy_2,
-             attrition_factor_3, attrition_problem_3, retention_strategy_3, is_filled)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
+            if ground_truth:
+                formatted_company_data = company_stats.render(ground_truth) + "\n\n" + formatted_company_data
+            logger.info(f"Sample of data being sent to AI: {formatted_company_data[:500]}...")  # Log first 500 chars
+            analysis_data = generate(COMPANY_ANALYSIS_TEMPLATE, on_token=on_token, all_employee_data=formatted_company_data)
+            if progress:
+                progress(len(employee_data))
 
-            values = (
-                company_id,
-                analysis_data['positive_sentiment'],
-                analysis_data['neutral_sentiment'],
-                analysis_data['negative_sentiment'],
-                analysis_data['summary_opinion'],
-                analysis_data['key_positive_1'],
-                analysis_data['key_positive_2'],
-                analysis_data['key_positive_3'],
-                analysis_data['attrition_factor_1'],
-                analysis_data['attrition_problem_1'],
-                analysis_data['retention_strategy_1'],
-                analysis_data['attrition_factor_2'],
-                analysis_data['attrition_problem_2'],
-                analysis_data['retention_strategy_2'],
-                analysis_data['attrition_factor_3'],
-                analysis_data['attrition_problem_3'],
-                analysis_data['retention_strategy_3'],
-                1
-            )
+        if ground_truth:
+            # Percentages come from the stored employee analyses, not from the model
+            analysis_data.update(ground_truth['sentiment'])
 
-            cursor.execute(insert_query, values)
-            logger.info(f"Inserted new company analysis record for company_id: {company_id}")
+        logger.info("Company sentiment analysis completed successfully")
+        return analysis_data
+
+    except Exception as e:
+        # No fallback report: callers must not save a placeholder over the real report
+        logger.error(f"Company sentiment analysis error: {e}")
+        raise
+
+    finally:
+        # mode is the resolved one ('auto' becomes 'single' or 'hierarchical')
+        metrics.ANALYSIS_LATENCY.labels(kind='company', mode=mode).observe(time.perf_counter() - start)
+
+def company_snapshot_time():
+    """Database time to record with a company report whose data is about to be read
+
+    Taken before the analysis starts (minus COMPANY_SNAPSHOT_MARGIN_SECONDS), so employee
+    analyses saved while the report is generating count as changed for the next
+    incremental report.
+    """
+    with db_pool.connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT CURRENT_TIMESTAMP - INTERVAL %s SECOND", (COMPANY_SNAPSHOT_MARGIN_SECONDS,))
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+def save_company_analysis_to_db(company_id, analysis_data, snapshot_at=None):
+    """Save the company AI analysis results to company_reports_sentiment table
+
+    snapshot_at: company_snapshot_time() from before the analysis read its data
+    """
+    try:
+        def upsert(cursor):
+            cursor.execute(COMPANY_ANALYSIS_UPSERT, [company_id, *_analysis_values(analysis_data), snapshot_at])
+            return cursor.rowcount
 
-        connection.commit()
+        affected = db_pool.run_transaction(upsert)
+        action = "Inserted new" if affected == 1 else "Updated existing"
+        logger.info(f"{action} company analysis record for company_id: {company_id}")
         return True
 
     except mysql.connector.Error as e:
         logger.error(f"Database save error for company analysis: {e}")
-        if connection:
-            connection.rollback()
         raise
 
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
-
 # ================= FLASK ROUTES =================
 
+def admission_rejected_response(e):
+    """429/503 response with Retry-After for a request the LLM admission controller turned away"""
+    logger.warning(f"LLM admission rejected ({e.status_code}): {e}")
+    response = jsonify({'error': str(e), 'retryAfter': e.retry_after})
+    response.status_code = e.status_code
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    try:
-        # Test database connection
-        connection = get_fortai_db_connection()
-        if connection:
-            connection.close()
-            db_status = "connected"
-        else:
-            db_status = "disconnected"
-    except:
-        db_status = "error"
-
+    """Liveness endpoint: answers from memory without touching the database or Ollama
+    (dependency status is served by /ready)"""
     return jsonify({
         'status': 'healthy',
         'service': 'ForteAI Flask Sentiment Analysis',
-        'database': db_status,
+        'pid': os.getpid(),
+        'db_pool': db_pool.pool_stats(),
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 once OLLAMA_MODEL answers within the latency budget (see
+    model_warmup) and the required dependencies passed their last background check (see
+    health_checks), 503 otherwise. Serves cached results only."""
+    model = model_warmup.readiness()
+    dependencies = health_checks.dependency_status()
+    ready = model['ready'] and dependencies['ready']
+    response = jsonify({
+        'ready': ready,
+        'model': model,
+        'dependencies': dependencies['dependencies'],
+        'required': dependencies['required'],
+        'timestamp': datetime.now().isoformat()
+    })
+    response.status_code = 200 if ready else 503
+    return response
+
 @app.route('/analyze', methods=['POST'])
 def analyze_employee_sentiment_flask():
     """Main endpoint for sentiment analysis - integrates with ForteAI database"""
@@ -997,13 +1375,28 @@ def analyze_employee_sentiment_flask():
 
         logger.info(f"Starting analysis for employee: {employee_id} from company: {company}")
 
-        # Perform sentiment analysis using ChatOllama via LangChain
-        analysis_result = analyze_sentiment_for_flask(answers)
+        # Fast CPU pre-score; under the triage policy low-risk surveys skip the LLM for now
+        prescore = None
+        lookup = None
+        if prescorer.POLICY != 'off':
+            survey_text = format_survey_responses_for_flask(answers)
+            if survey_text.strip():
+                prescore = prescorer.score(survey_text)
+                if prescorer.triage(prescore) == prescorer.DEFER:
+                    # Looked up once here and handed to the analysis below
+                    lookup = lookup_cached_analysis(survey_text)
+                    if lookup[2] is None and not _deferred_analysis_failed(employee_id):
+                        return _defer_employee_analysis(employee_id, company, answers, prescore)
+
+        # Perform sentiment analysis using ChatOllama via LangChain (or serve it from the cache)
+        analysis_result, cache_status = analyze_sentiment_with_cache(
+            answers, tenant=employee_tenant(employee_id), lookup=lookup
+        )
 
-        # Save to ForteAI database
-        save_analysis_to_fortai_db(employee_id, company, analysis_result)
+        # Save to ForteAI database (or journal it for write-behind)
+        persisted = persist_employee_analyses([(employee_id, company, analysis_result, analysis_status(cache_status))])
 
-        logger.info(f"Analysis completed and saved for employee: {employee_id}")
+        logger.info(f"Analysis completed and {persisted} for employee: {employee_id}")
 
         return jsonify({
             'success': True,
@@ -1011,9 +1404,16 @@ def analyze_employee_sentiment_flask():
             'employeeId': employee_id,
             'company': company,
             'analysis': analysis_result,
+            'cached': cache_status in (analysis_cache.MEMORY, analysis_cache.SHARED),
+            'cache': cache_status,
+            'persisted': persisted,
+            'prescore': prescore,
             'timestamp': datetime.now().isoformat()
         })
 
+    except admission.AdmissionRejected as e:
+        return admission_rejected_response(e)
+
     except ValueError as e:
         logger.error(f"Validation error: {e}")
         return jsonify({'error': str(e)}), 400
@@ -1022,23 +1422,363 @@ def analyze_employee_sentiment_flask():
         logger.error(f"Analysis error: {e}")
         return jsonify({'error': 'Internal server error occurred during analysis'}), 500
 
+# A failed deferred analysis is retried after EMPLOYEE_DEFERRED_RETRY_SECONDS, doubling each
+# time; after EMPLOYEE_DEFERRED_MAX_ATTEMPTS its provisional row is marked failed
+EMPLOYEE_DEFERRED_MAX_ATTEMPTS = int(os.getenv('EMPLOYEE_DEFERRED_MAX_ATTEMPTS', 5))
+EMPLOYEE_DEFERRED_RETRY_SECONDS = float(os.getenv('EMPLOYEE_DEFERRED_RETRY_SECONDS', 300))
+
+def _deferred_analysis_failed(employee_id):
+    """Whether the employee's stored analysis is a provisional one whose full analysis gave up"""
+    try:
+        with db_pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(
+                    "SELECT analysis_status FROM responses_langchain_sentiment WHERE employeesID = %s", (employee_id,)
+                )
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+    except mysql.connector.Error as e:
+        logger.warning(f"Could not read the analysis status of employee {employee_id}: {e}")
+        return False
+    return row is not None and row[0] == ANALYSIS_FAILED
+
+def mark_deferred_analysis_failed(employee_id, deferral_id=None):
+    """Mark the employee's provisional analysis failed, so the next /analyze runs the model"""
+    def update(cursor):
+        cursor.execute(
+            "UPDATE responses_langchain_sentiment SET analysis_status = %s "
+            "WHERE employeesID = %s AND analysis_status = %s AND deferral_id <=> %s",
+            (ANALYSIS_FAILED, employee_id, ANALYSIS_PROVISIONAL, deferral_id)
+        )
+    db_pool.run_transaction(update)
+
+def replace_provisional_analysis(employee_id, company, analysis_data, deferral_id=None):
+    """Save a deferred job's full analysis over the provisional result it was scheduled for
+
+    Returns True when saved, False when the row was replaced in the meantime (a newer
+    analysis or deferral of the employee) and None when the provisional row is not saved
+    yet (still in the write-behind journal). Written directly, never journaled.
+    """
+    def upsert(cursor):
+        previous = company_aggregate.lock_previous(cursor, [employee_id]) if company_aggregate.enabled() else None
+        cursor.execute(
+            "SELECT analysis_status, deferral_id FROM responses_langchain_sentiment WHERE employeesID = %s FOR UPDATE",
+            (employee_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        if row[0] != ANALYSIS_PROVISIONAL or row[1] != deferral_id:
+            return False
+        cursor.execute(
+            EMPLOYEE_ANALYSIS_UPSERT.format(rows=EMPLOYEE_ANALYSIS_ROW),
+            [employee_id, company, *_analysis_values(analysis_data), ANALYSIS_COMPLETE, None]
+        )
+        if previous is not None:
+            company_aggregate.apply_changes(cursor, previous, [(employee_id, analysis_data)])
+        return True
+
+    return db_pool.run_transaction(upsert)
+
+def _defer_employee_analysis(employee_id, company, answers, prescore):
+    """Save the provisional pre-score result and schedule the full analysis for off-peak hours"""
+    analysis_result = prescorer.provisional_analysis(prescore)
+    deferral_id = uuid.uuid4().hex
+    persisted = persist_employee_analyses([(employee_id, company, analysis_result, ANALYSIS_PROVISIONAL, deferral_id)])
+    run_after = prescorer.next_offpeak()
+    job_id = jobs.enqueue(
+        'employee_analysis',
+        {'employeeId': employee_id, 'company': company, 'answers': answers, 'deferralId': deferral_id},
+        run_after=run_after
+    )
+    logger.info(f"Deferred full analysis of employee {employee_id} to {run_after.isoformat()} (job {job_id})")
+
+    return jsonify({
+        'success': True,
+        'message': 'Provisional sentiment saved; full analysis scheduled',
+        'employeeId': employee_id,
+        'company': company,
+        'analysis': analysis_result,
+        'provisional': True,
+        'prescore': prescore,
+        'persisted': persisted,
+        'jobId': job_id,
+        'statusUrl': f"/jobs/{job_id}",
+        'scheduledFor': run_after.isoformat(),
+        'timestamp': datetime.now().isoformat()
+    }), 202, {'Location': f"/jobs/{job_id}"}
+
+def run_employee_analysis_job(payload, progress):
+    """Job handler: full analysis of a deferred survey, replacing its provisional result
+
+    The result is only saved while the employee's row is still this deferral's provisional
+    one; a newer analysis or deferral saved meanwhile is left alone. On failure the same job
+    is queued again with exponential backoff (its status stays queued); once
+    EMPLOYEE_DEFERRED_MAX_ATTEMPTS have failed the provisional row is marked failed.
+    """
+    employee_id = payload['employeeId']
+    deferral_id = payload.get('deferralId')
+    attempt = payload.get('attempt', 1)
+    try:
+        analysis_result, cache_status = analyze_sentiment_with_cache(
+            payload['answers'], tenant=employee_tenant(employee_id), reject_when_full=False
+        )
+        if cache_status == 'error':
+            raise RuntimeError(analysis_result['summary_opinion'])
+        replaced = replace_provisional_analysis(employee_id, payload['company'], analysis_result, deferral_id)
+        if replaced is None:
+            raise RuntimeError(f"Provisional analysis of employee {employee_id} is not saved yet")
+    except Exception as e:
+        if attempt < EMPLOYEE_DEFERRED_MAX_ATTEMPTS:
+            run_after = datetime.now() + timedelta(seconds=EMPLOYEE_DEFERRED_RETRY_SECONDS * 2 ** (attempt - 1))
+            raise jobs.RetryLater(
+                f"Attempt {attempt} of {EMPLOYEE_DEFERRED_MAX_ATTEMPTS} failed: {e}",
+                run_after, dict(payload, attempt=attempt + 1)
+            ) from e
+        logger.error(f"Deferred analysis of employee {employee_id} failed {attempt} times, giving up: {e}")
+        mark_deferred_analysis_failed(employee_id, deferral_id)
+        raise
+    if not replaced:
+        logger.info(f"Deferred analysis of employee {employee_id} discarded: a newer analysis was saved meanwhile")
+        return {'employeeId': employee_id, 'superseded': True}
+    logger.info(f"Deferred analysis completed for employee: {employee_id}")
+    return analysis_result
+
+jobs.register('employee_analysis', run_employee_analysis_job)
+
+@app.route('/prescore', methods=['POST'])
+def prescore_survey():
+    """Provisional sentiment percentages from the fast local pre-scorer (no LLM call)"""
+    data = request.get_json(silent=True)
+
+    if not data or not isinstance(data.get('answers'), dict):
+        return jsonify({'error': 'answers dictionary is required'}), 400
+
+    survey_text = format_survey_responses_for_flask(data['answers'])
+    if not survey_text.strip():
+        return jsonify({'error': 'No valid survey responses found'}), 400
+
+    prescore = prescorer.score(survey_text)
+    return jsonify({
+        'success': True,
+        'prescore': prescore,
+        'policy': prescorer.POLICY,
+        'decision': prescorer.triage(prescore),
+        'timestamp': datetime.now().isoformat()
+    })
+
+def _stream_analysis_tokens(emit):
+    """on_token callback forwarding generated text and each completed JSON field as SSE events"""
+    fields = streaming.FieldStream()
+
+    def on_token(text):
+        emit('token', {'text': text})
+        for name, value in fields.feed(text):
+            emit('field', {'name': name, 'value': value})
+
+    return on_token
+
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_employee_sentiment_stream():
+    """Streaming variant of /analyze: Server-Sent Events with tokens, fields and the saved result"""
+    data = request.get_json(silent=True)
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    employee_id = data.get('employeeId')
+    company = data.get('company')
+    answers = data.get('answers')
+
+    if not employee_id:
+        return jsonify({'error': 'employeeId is required'}), 400
+
+    if not company:
+        return jsonify({'error': 'company is required'}), 400
+
+    if not answers or not isinstance(answers, dict):
+        return jsonify({'error': 'answers dictionary is required'}), 400
+
+    logger.info(f"Starting streamed analysis for employee: {employee_id} from company: {company}")
+
+    def work(emit):
+        try:
+            analysis_result, cache_status = analyze_sentiment_with_cache(
+                answers, tenant=employee_tenant(employee_id), on_token=_stream_analysis_tokens(emit)
+            )
+        except admission.AdmissionRejected as e:
+            emit('error', {'error': str(e), 'status': e.status_code, 'retryAfter': e.retry_after})
+            return
+
+        persisted = persist_employee_analyses([(employee_id, company, analysis_result, analysis_status(cache_status))])
+        logger.info(f"Streamed analysis completed and {persisted} for employee: {employee_id}")
+
+        emit('result', {
+            'success': True,
+            'message': 'Sentiment analysis completed and saved successfully',
+            'employeeId': employee_id,
+            'company': company,
+            'analysis': analysis_result,
+            'cached': cache_status in (analysis_cache.MEMORY, analysis_cache.SHARED),
+            'cache': cache_status,
+            'persisted': persisted,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    return streaming.sse_response(work)
+
+# Upper bound on items per /analyze-batch request and on analyses run concurrently for it
+ANALYZE_BATCH_MAX_ITEMS = int(os.getenv('ANALYZE_BATCH_MAX_ITEMS', 1000))
+ANALYZE_BATCH_CONCURRENCY = int(os.getenv('ANALYZE_BATCH_CONCURRENCY', 4))
+
+@app.route('/analyze-batch', methods=['POST'])
+def analyze_employee_batch_flask():
+    """Analyse many employees in one request and save them with a single batched write
+
+    Body: {"items": [{"employeeId", "company", "answers"}, ...]}. Analyses run concurrently
+    and wait for their turn in the LLM admission queue; every item gets its own status
+    ('saved', 'invalid' or 'failed') so one bad item does not fail the batch.
+    """
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        items = data.get('items')
+        if not items or not isinstance(items, list):
+            return jsonify({'error': 'items list is required'}), 400
+
+        if len(items) > ANALYZE_BATCH_MAX_ITEMS:
+            return jsonify({'error': f'At most {ANALYZE_BATCH_MAX_ITEMS} items per batch'}), 400
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            employee_id = item.get('employeeId')
+            company = item.get('company')
+            answers = item.get('answers')
+
+            error = None
+            if not employee_id:
+                error = 'employeeId is required'
+            elif not company:
+                error = 'company is required'
+            elif not answers or not isinstance(answers, dict):
+                error = 'answers dictionary is required'
+
+            if error:
+                results[index] = {'index': index, 'employeeId': employee_id, 'status': 'invalid', 'error': error}
+            else:
+                valid.append((index, employee_id, company, answers))
+
+        logger.info(f"Starting batch analysis of {len(valid)} employees ({len(items) - len(valid)} invalid)")
+
+        tenants = employee_tenants([employee_id for _, employee_id, _, _ in valid])
+
+        def analyze(entry):
+            index, employee_id, company, answers = entry
+            analysis_result, cache_status = analyze_sentiment_with_cache(
+                answers, tenant=tenants[employee_id], reject_when_full=False
+            )
+            return entry, analysis_result, cache_status
+
+        with ThreadPoolExecutor(max_workers=max(1, ANALYZE_BATCH_CONCURRENCY)) as pool:
+            analyzed = list(pool.map(analyze, valid))
+
+        records = []
+        for (index, employee_id, company, _), analysis_result, cache_status in analyzed:
+            if cache_status == 'error':
+                # Fallback analyses are not saved so the caller can retry the item
+                results[index] = {
+                    'index': index,
+                    'employeeId': employee_id,
+                    'status': 'failed',
+                    'error': analysis_result['summary_opinion']
+                }
+                continue
+            records.append((employee_id, company, analysis_result, ANALYSIS_COMPLETE))
+            results[index] = {
+                'index': index,
+                'employeeId': employee_id,
+                'status': 'saved',
+                'analysis': analysis_result,
+                'cached': cache_status in (analysis_cache.MEMORY, analysis_cache.SHARED)
+            }
+
+        persisted = None
+        try:
+            if records:
+                persisted = persist_employee_analyses(records)
+        except Exception:
+            for result in results:
+                if result['status'] == 'saved':
+                    result.update(status='failed', error='Database write failed')
+                    result.pop('analysis', None)
+
+        counts = {status: sum(1 for r in results if r['status'] == status) for status in ('saved', 'invalid', 'failed')}
+        logger.info(f"Batch analysis finished: {counts}")
+
+        return jsonify({
+            'success': counts['saved'] == len(items),
+            'total': len(items),
+            **counts,
+            'persisted': persisted,
+            'results': results,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Batch analysis error: {e}")
+        return jsonify({'error': 'Internal server error occurred during batch analysis'}), 500
+
+@app.route('/company-stats/<company_id>', methods=['GET'])
+def company_sentiment_stats(company_id):
+    """Numeric company sentiment (means, medians, percentiles, distributions, breakdown) without an LLM call
+
+    Optional ?group_by=<column> picks the breakdown column (COMPANY_STATS_GROUP_COLUMNS, default role).
+    """
+    try:
+        group_by = request.args.get('group_by') or (company_stats.GROUP_COLUMNS[0] if company_stats.GROUP_COLUMNS else None)
+        stats = get_company_stats(company_id, group_by)
+
+        if not stats['employees']:
+            return jsonify({'error': f'No employee analyses found for company_id: {company_id}'}), 404
+
+        return jsonify({
+            'success': True,
+            'companyId': company_id,
+            'groupBy': group_by,
+            'stats': stats,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        logger.error(f"Company stats error: {e}")
+        return jsonify({'error': 'Internal server error occurred while computing company statistics'}), 500
+
 @app.route('/debug/database', methods=['GET'])
 def debug_database():
     """Debug endpoint to check database connection and table structure"""
     try:
-        connection = get_fortai_db_connection()
-        cursor = connection.cursor()
+        with db_pool.connection() as connection:
+            cursor = connection.cursor()
 
-        # Check table structure
-        cursor.execute("DESCRIBE responses_langchain_sentiment")
-        table_structure = cursor.fetchall()
+            # Check table structure
+            cursor.execute("DESCRIBE responses_langchain_sentiment")
+            table_structure = cursor.fetchall()
 
-        # Check sample data
-        cursor.execute("SELECT COUNT(*) FROM responses_langchain_sentiment")
-        record_count = cursor.fetchone()[0]
+            # Check sample data
+            cursor.execute("SELECT COUNT(*) FROM responses_langchain_sentiment")
+            record_count = cursor.fetchone()[0]
 
-        cursor.close()
-        connection.close()
+            cursor.close()
 
         return jsonify({
             'success': True,
@@ -1057,13 +1797,53 @@ def debug_database():
                 'host': os.getenv('DB_HOST', 'localhost'),
                 'database': os.getenv('DB_NAME', 'forteai_nexus'),
                 'user': os.getenv('DB_USER', 'root')
-            }
+            },
+            'db_pool': db_pool.pool_stats()
         })
 
     except Exception as e:
         logger.error(f"Database debug error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/debug/llm', methods=['GET'])
+def debug_llm():
+    """LLM client reuse, JSON decoding paths, analysis cache hit rates, admission queue and
+    per-backend Ollama routing metrics"""
+    return jsonify({
+        'success': True,
+        'llm_registry': llm_registry.registry_stats(),
+        'json_decoding': structured_output.path_stats(),
+        'analysis_cache': analysis_cache.cache_stats(),
+        'admission': admission.admission_stats(),
+        'ollama_backends': ollama_router.router_stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics for all worker processes (see metrics.py)"""
+    try:
+        depth = jobs.get_queue().depth()
+        for status in (jobs.QUEUED, jobs.RUNNING, jobs.SUCCEEDED, jobs.FAILED):
+            metrics.JOBS_QUEUED.labels(status=status).set(depth.get(status, 0))
+        if write_behind.enabled():
+            metrics.WRITE_BEHIND_DEPTH.set(write_behind.journal_stats().get('depth', 0))
+    except Exception as e:
+        logger.warning(f"Could not read queue depths for metrics: {e}")
+
+    body, content_type = metrics.exposition()
+    return body, 200, {'Content-Type': content_type}
+
+@app.route('/debug/pool', methods=['GET'])
+def debug_pool():
+    """Connection pool and write-behind journal statistics (depth, flush latency) for monitoring"""
+    return jsonify({
+        'success': True,
+        'db_pool': db_pool.pool_stats(),
+        'write_behind': write_behind.journal_stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
 @app.route('/test-ai', methods=['POST'])
 def test_ai_connection():
     """Test endpoint to verify AI connection and response format"""
@@ -1071,37 +1851,63 @@ def test_ai_connection():
         data = request.get_json()
         test_text = data.get('text', 'This is a test employee survey response about work satisfaction.')
 
-        logger.info(f"Testing ChatOllama at {OLLAMA_BASE_URL} using model {OLLAMA_MODEL}")
+        simple_prompt = "Respond with exactly this JSON: {\"test\": \"success\", \"message\": \"AI connection working\"}"
 
-        # Test the model directly
-        model = ChatOllama(
-            base_url=OLLAMA_BASE_URL,
-            model=OLLAMA_MODEL,
-            temperature=0,
-        )
+        def predict(base_url):
+            logger.info(f"Testing ChatOllama at {base_url} using model {OLLAMA_MODEL}")
+            # Test the model directly
+            chain = llm_registry.get_chain(
+                "{input}",
+                ["input"],
+                base_url=base_url,
+                model=OLLAMA_MODEL,
+                temperature=0,
+                keep_alive=OLLAMA_KEEP_ALIVE,
+            )
+            return base_url, chain.predict(input=simple_prompt)
 
-        simple_prompt = "Respond with exactly this JSON: {\"test\": \"success\", \"message\": \"AI connection working\"}"
-        prompt = PromptTemplate(template="{input}", input_variables=["input"])
-        chain = LLMChain(llm=model, prompt=prompt)
-        result = chain.predict(input=simple_prompt)
+        with admission.slot('test-ai'):
+            base_url, result = ollama_router.call(predict)
 
         response_text = result
 
         return jsonify({
             'success': True,
             'raw_response': response_text,
-            'ollama_base_url': OLLAMA_BASE_URL,
+            'ollama_base_url': base_url,
             'ollama_model': OLLAMA_MODEL,
-            'test_input': test_text
+            'test_input': test_text,
+            'llm_registry': llm_registry.registry_stats()
         })
 
+    except admission.AdmissionRejected as e:
+        return admission_rejected_response(e)
+
     except Exception as e:
         logger.error(f"AI test error: {e}")
         return jsonify({'error': str(e)}), 500
 
+def run_company_analysis_job(payload, progress):
+    """Job handler: analyse a company and persist the report via save_company_analysis_to_db"""
+    company_id = payload['companyId']
+    snapshot_at = company_snapshot_time()
+    analysis_result = analyze_company_sentiment(company_id, mode=payload.get('mode'), progress=progress)
+    save_company_analysis_to_db(company_id, analysis_result, snapshot_at)
+    logger.info(f"Company analysis completed and saved for company_id: {company_id}")
+    return analysis_result
+
+jobs.register('company_analysis', run_company_analysis_job)
+
+# Run /analyze-company in the background (202 + polling) unless the request sets "async": false
+COMPANY_ANALYSIS_ASYNC = os.getenv('COMPANY_ANALYSIS_ASYNC', 'True').lower() == 'true'
+
 @app.route('/analyze-company', methods=['POST'])
 def analyze_company_sentiment_flask():
-    """Endpoint for company-wide sentiment analysis - integrates with ForteAI database"""
+    """Endpoint for company-wide sentiment analysis - integrates with ForteAI database
+
+    Enqueues a background job and returns 202 with a job id to poll at GET /jobs/<id>.
+    Send "async": false to run the analysis inline and get the result in the response.
+    """
     try:
         data = request.get_json()
 
@@ -1113,15 +1919,32 @@ def analyze_company_sentiment_flask():
         if not company_id:
             return jsonify({'error': 'companyId or company_id is required'}), 400
 
-        logger.info(f"Starting company analysis for company_id: {company_id}")
+        mode = data.get('mode')
+        if mode is not None and str(mode).lower() not in COMPANY_ANALYSIS_MODES:
+            return jsonify({'error': f"mode must be one of: {', '.join(COMPANY_ANALYSIS_MODES)}"}), 400
 
-        # Perform company-wide sentiment analysis
-        analysis_result = analyze_company_sentiment(company_id)
+        run_async = data.get('async', COMPANY_ANALYSIS_ASYNC)
+        if isinstance(run_async, str):
+            run_async = run_async.lower() == 'true'
 
-        # Save to ForteAI database
-        save_company_analysis_to_db(company_id, analysis_result)
+        if run_async:
+            job_id = jobs.enqueue('company_analysis', {'companyId': company_id, 'mode': mode})
+            logger.info(f"Queued company analysis job {job_id} for company_id: {company_id}")
+
+            return jsonify({
+                'success': True,
+                'message': 'Company sentiment analysis queued',
+                'companyId': company_id,
+                'jobId': job_id,
+                'status': jobs.QUEUED,
+                'statusUrl': f"/jobs/{job_id}",
+                'timestamp': datetime.now().isoformat()
+            }), 202, {'Location': f"/jobs/{job_id}"}
+
+        logger.info(f"Starting company analysis for company_id: {company_id}")
 
-        logger.info(f"Company analysis completed and saved for company_id: {company_id}")
+        # Perform company-wide sentiment analysis and save to ForteAI database
+        analysis_result = run_company_analysis_job({'companyId': company_id, 'mode': mode}, None)
 
         return jsonify({
             'success': True,
@@ -1139,29 +1962,100 @@ def analyze_company_sentiment_flask():
         logger.error(f"Company analysis error: {e}")
         return jsonify({'error': 'Internal server error occurred during company analysis'}), 500
 
+@app.route('/analyze-company/stream', methods=['POST'])
+def analyze_company_sentiment_stream():
+    """Streaming variant of /analyze-company: Server-Sent Events with progress, tokens and the saved report"""
+    data = request.get_json(silent=True)
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    company_id = data.get('companyId') or data.get('company_id')
+
+    if not company_id:
+        return jsonify({'error': 'companyId or company_id is required'}), 400
+
+    mode = data.get('mode')
+    if mode is not None and str(mode).lower() not in COMPANY_ANALYSIS_MODES:
+        return jsonify({'error': f"mode must be one of: {', '.join(COMPANY_ANALYSIS_MODES)}"}), 400
+
+    logger.info(f"Starting streamed company analysis for company_id: {company_id}")
+
+    def work(emit):
+        total = {}
+
+        def progress(done, count=None):
+            if count is not None:
+                total['employees'] = count
+            emit('progress', {'processed': done, 'total': total.get('employees')})
+
+        snapshot_at = company_snapshot_time()
+        analysis_result = analyze_company_sentiment(
+            company_id, mode=mode, progress=progress, on_token=_stream_analysis_tokens(emit)
+        )
+        save_company_analysis_to_db(company_id, analysis_result, snapshot_at)
+        logger.info(f"Streamed company analysis completed and saved for company_id: {company_id}")
+
+        emit('result', {
+            'success': True,
+            'message': 'Company sentiment analysis completed and saved successfully',
+            'companyId': company_id,
+            'analysis': analysis_result,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    return streaming.sse_response(work)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Status, progress (employees processed) and final result of a background job"""
+    try:
+        job = jobs.get_job(job_id)
+
+        if not job:
+            return jsonify({'error': f'Job {job_id} not found'}), 404
+
+        return jsonify({
+            'success': True,
+            'jobId': job['jobId'],
+            'kind': job['kind'],
+            'status': job['status'],
+            'progress': job['progress'],
+            'companyId': job['payload'].get('companyId'),
+            'analysis': job['result'],
+            'error': job['error'],
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at'],
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Job status error: {e}")
+        return jsonify({'error': 'Internal server error occurred while reading job status'}), 500
+
 def fetch_employee_survey_responses(employee_id, company_name):
     """Fetch existing survey responses for a specific employee"""
     try:
-        connection = get_fortai_db_connection()
-        cursor = connection.cursor(dictionary=True)
-
-        query = """
-        SELECT employee_name, work_life_balance, compensation, growth_opportunities,
-               management_quality, team_culture, job_satisfaction, company, feedback,
-               submission_time, work_life_balance_rating, compensation_rating,
-               growth_opportunities_rating, management_quality_rating,
-               team_culture_rating, job_satisfaction_rating
-        FROM Responses_sentiment
-        WHERE employee_name = %s AND company = %s
-        ORDER BY submission_time DESC
-        LIMIT 1
-        """
-
-        cursor.execute(query, (employee_id, company_name))
-        result = cursor.fetchone()
-
-        cursor.close()
-        connection.close()
+        with db_pool.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            query = """
+            SELECT employee_name, work_life_balance, compensation, growth_opportunities,
+                   management_quality, team_culture, job_satisfaction, company, feedback,
+                   submission_time, work_life_balance_rating, compensation_rating,
+                   growth_opportunities_rating, management_quality_rating,
+                   team_culture_rating, job_satisfaction_rating
+            FROM Responses_sentiment
+            WHERE employee_name = %s AND company = %s
+            ORDER BY submission_time DESC
+            LIMIT 1
+            """
+
+            cursor.execute(query, (employee_id, company_name))
+            result = cursor.fetchone()
+
+            cursor.close()
 
         return result
 
@@ -1203,17 +2097,14 @@ def regenerate_employee_report():
             'job_satisfaction_rating': employee_data['job_satisfaction_rating']
         }
 
-        # Re-run sentiment analysis
-        analysis_result = analyze_sentiment_for_flask(survey_data)
+        # Re-run sentiment analysis (unchanged answers are served from the cache)
+        analysis_result, cache_status = analyze_sentiment_with_cache(survey_data, tenant=employee_tenant(employee_id))
 
         if not analysis_result:
             return jsonify({'error': 'Failed to regenerate sentiment analysis'}), 500
 
-        # Save the updated analysis to database
-        save_success = save_analysis_to_fortai_db(employee_id, company_name, analysis_result)
-
-        if not save_success:
-            return jsonify({'error': 'Failed to save regenerated analysis to database'}), 500
+        # Save the updated analysis to database (or journal it for write-behind)
+        persisted = persist_employee_analyses([(employee_id, company_name, analysis_result, analysis_status(cache_status))])
 
         logger.info(f"Successfully regenerated report for employee {employee_id} in company {company_name}")
 
@@ -1222,9 +2113,15 @@ def regenerate_employee_report():
             'employee_name': employee_id,
             'company': company_name,
             'analysis': analysis_result,
+            'cached': cache_status in (analysis_cache.MEMORY, analysis_cache.SHARED),
+            'cache': cache_status,
+            'persisted': persisted,
             'regenerated_at': datetime.now().isoformat()
         }), 200
 
+    except admission.AdmissionRejected as e:
+        return admission_rejected_response(e)
+
     except ValueError as e:
         logger.error(f"Regenerate report validation error: {e}")
         return jsonify({'error': str(e)}), 400
@@ -1234,15 +2131,41 @@ def regenerate_employee_report():
         return jsonify({'error': 'Internal server error occurred during report regeneration'}), 500
 
 # ================= FLASK APPLICATION STARTUP =================
+def init_worker():
+    """Per-process startup: open this worker's DB pool, resume queued background jobs,
+    replay any journaled write-behind results, start probing the Ollama backends,
+    preload the model on them and start the readiness checks.
+
+    Called once in each server process - by gunicorn's post_fork hook (see gunicorn.conf.py)
+    so nothing is shared across forked workers, or directly by the dev server below.
+    """
+    db_pool.get_pool()
+    jobs.get_queue()
+    if write_behind.enabled():
+        write_behind.get_journal()
+    model_warmup.start(OLLAMA_MODEL, ollama_router.get_router().base_urls())
+    health_checks.start(ollama_router.get_router().base_urls())
+    logger.info(f"Worker {os.getpid()} initialised")
+
+def shutdown_worker(timeout=None):
+    """Per-process shutdown: let running background jobs finish, flush journaled results,
+    then close pooled connections"""
+    model_warmup.stop()
+    health_checks.stop()
+    jobs.shutdown(timeout)
+    write_behind.shutdown(timeout)
+    db_pool.get_pool().dispose()
+    logger.info(f"Worker {os.getpid()} shut down")
+
 if __name__ == "__main__":
     print("🚀 Starting ForteAI Flask Sentiment Analysis Service...")
     print(f"📊 Database: {os.getenv('DB_HOST', 'localhost')}/{os.getenv('DB_NAME', 'forteai_nexus')}")
-    print(f"🤖 Ollama Base URL: {OLLAMA_BASE_URL}")
+    print(f"🤖 Ollama Base URLs: {', '.join(OLLAMA_BASE_URLS)}")
     print(f"🧠 Ollama Model: {OLLAMA_MODEL}")
     print(f"🌐 Server will run on: http://localhost:{int(os.getenv('FLASK_PORT', 5000))}")
-    print('GOOGLE_API_KEYS:', os.getenv('GOOGLE_API_KEYS'))
-    print('GOOGLE_API_KEY:', os.getenv('GOOGLE_API_KEY'))
+    print("⚠️  Development server - use `gunicorn -c gunicorn.conf.py wsgi:app` in production")
 
+    init_worker()
     app.run(
         host='0.0.0.0',
         port=int(os.getenv('FLASK_PORT', 5000)),
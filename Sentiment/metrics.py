@@ -0,0 +1,147 @@
+"""Prometheus metrics for the request pipeline, served at GET /metrics.
+
+Under gunicorn every worker writes its samples to memory-mapped files in
+PROMETHEUS_MULTIPROC_DIR (set by gunicorn.conf.py before the app is imported) and a
+scrape of any worker aggregates all of them; without that variable (python main.py) the
+default in-process registry is used. Recording a sample is a few microseconds, cheap
+enough for every request, query and generation.
+
+Names are prefixed with ``forteai_``; see README.md for the list.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# LLM generations and analyses take seconds to minutes; DB work milliseconds
+_SLOW_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+_DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    "forteai_http_request_duration_seconds", "End-to-end request latency by route",
+    ["route", "method", "status"], buckets=_SLOW_BUCKETS,
+)
+ANALYSIS_LATENCY = Histogram(
+    "forteai_analysis_duration_seconds", "Employee and company analysis time including cache lookups",
+    ["kind", "mode"], buckets=_SLOW_BUCKETS,
+)
+LLM_GENERATION = Histogram(
+    "forteai_llm_generation_seconds", "Time of one Ollama generation",
+    ["source", "path", "outcome"], buckets=_SLOW_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "forteai_llm_tokens_total", "Prompt (in) and generated (out) tokens reported by Ollama",
+    ["source", "direction"],
+)
+JSON_PARSE = Counter(
+    "forteai_json_decoding_total", "JSON decoding path taken (or failed) per analysis, see structured_output",
+    ["path"],
+)
+DB_LATENCY = Histogram(
+    "forteai_db_duration_seconds", "Database time per function, split into query and commit",
+    ["function", "phase"], buckets=_DB_BUCKETS,
+)
+DB_RETRIES = Counter("forteai_db_transaction_retries_total", "Transactions retried after a deadlock or lock wait timeout")
+CACHE_LOOKUPS = Counter(
+    "forteai_analysis_cache_lookups_total", "Analysis cache lookups by result (memory, shared, miss)",
+    ["result"],
+)
+ADMISSION_WAIT = Histogram(
+    "forteai_llm_admission_wait_seconds", "Time spent queued for an LLM slot", buckets=_SLOW_BUCKETS,
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "forteai_llm_in_flight", "LLM generations running", multiprocess_mode="livesum",
+)
+ADMISSION_WAITING = Gauge(
+    "forteai_llm_waiting", "Callers queued for an LLM slot", multiprocess_mode="livesum",
+)
+# The job queue and write-behind journal are shared by the workers on a host, so the
+# latest reading from any worker is the host's value
+JOBS_QUEUED = Gauge(
+    "forteai_jobs", "Background jobs by status", ["status"], multiprocess_mode="livemostrecent",
+)
+WRITE_BEHIND_DEPTH = Gauge(
+    "forteai_write_behind_depth", "Analyses journaled but not yet written to MySQL", multiprocess_mode="livemostrecent",
+)
+WRITE_BEHIND_DEAD_LETTERS = Counter(
+    "forteai_write_behind_dead_letters_total", "Journaled writes moved to the dead-letter table", ["kind"],
+)
+STYLE_MEMORY_LATENCY = Histogram(
+    "forteai_style_memory_duration_seconds", "Vector store operations", ["operation"], buckets=_SLOW_BUCKETS,
+)
+STYLE_CONTEXT_LOOKUPS = Counter(
+    "forteai_style_context_lookups_total", "get_style_context calls served from the memo (hit) or searched (miss)",
+    ["result"],
+)
+STYLE_EXAMPLES = Counter(
+    "forteai_style_examples_total", "Generated report examples saved, skipped as duplicates or evicted",
+    ["outcome"],
+)
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "forteai_embedding_cache_lookups_total", "Style memory embedding cache lookups by result (hit, miss)",
+    ["result"],
+)
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observe the duration of the block on ``histogram`` (with ``labels``), also on error."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def generation(source: str, path: str):
+    """Time one LLM generation, labelled with outcome 'ok' or 'error'."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        LLM_GENERATION.labels(source=source, path=path, outcome=outcome).observe(time.perf_counter() - start)
+
+
+def record_tokens(source: str, response) -> None:
+    """Count prompt/eval tokens from an Ollama chat response (or the final streamed chunk)."""
+    try:
+        prompt_tokens = response.get("prompt_eval_count") or 0
+        output_tokens = response.get("eval_count") or 0
+    except AttributeError:
+        return
+    if prompt_tokens:
+        LLM_TOKENS.labels(source=source, direction="in").inc(prompt_tokens)
+    if output_tokens:
+        LLM_TOKENS.labels(source=source, direction="out").inc(output_tokens)
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop a dead worker's live gauges (gunicorn child_exit hook)."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
+
+
+def exposition():
+    """(body, content type) for a /metrics response covering every worker process."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,28 @@
+-- Indexes backing the set-based company fetch in main.get_company_employee_data.
+--
+-- Query shape:
+--   employees e
+--     JOIN responses_sentiment rs          ON rs.employeesID = e.employeesID
+--     JOIN formquestions_sentiment fq      ON rs.form_question_id = fq.form_question_id
+--     JOIN masterquestions_sentiment mq    ON fq.master_question_id = mq.master_question_id
+--   WHERE e.company_id = ? AND e.role != 'HR' AND e.is_filled = 1
+--   ORDER BY e.employeesID, mq.question_number
+--
+-- Run once per database, e.g.:
+--   mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/001_company_employee_data_indexes.sql
+
+-- Equality columns first (company_id, is_filled), then the role range filter.
+-- employeesID and name are included so the employees side is served from the index alone.
+CREATE INDEX idx_employees_company_filled_role
+    ON employees (company_id, is_filled, role, employeesID, name);
+
+-- Per-employee lookup of answers; form_question_id makes the join to
+-- formquestions_sentiment index-only on this side.
+CREATE INDEX idx_responses_sentiment_employee_question
+    ON responses_sentiment (employeesID, form_question_id);
+
+-- formquestions_sentiment.form_question_id and masterquestions_sentiment.master_question_id
+-- are primary keys, so the remaining joins are already served by PRIMARY.
+-- If either table lacks that primary key in your environment, add:
+--   CREATE INDEX idx_formquestions_sentiment_id ON formquestions_sentiment (form_question_id, master_question_id);
+--   CREATE INDEX idx_masterquestions_sentiment_id ON masterquestions_sentiment (master_question_id, question_number);
@@ -0,0 +1,15 @@
+-- Shared tier of the employee analysis cache (analysis_cache.py, ANALYSIS_CACHE_SHARED=mysql).
+-- Rows are keyed by the SHA-256 content hash of the normalised survey text, model,
+-- prompt template version and temperature; expired and least-recently used rows are
+-- trimmed by the application.
+--
+--   mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/002_analysis_cache.sql
+
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    cache_key CHAR(64) NOT NULL PRIMARY KEY,
+    analysis JSON NOT NULL,
+    expires_at DATETIME NOT NULL,
+    last_access DATETIME NOT NULL,
+    KEY idx_analysis_cache_expires (expires_at),
+    KEY idx_analysis_cache_access (last_access)
+);
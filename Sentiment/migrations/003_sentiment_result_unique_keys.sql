@@ -0,0 +1,23 @@
+-- Unique keys backing the single-statement upserts in main.save_analysis_to_fortai_db,
+-- main.save_analyses_to_fortai_db and main.save_company_analysis_to_db
+-- (INSERT ... ON DUPLICATE KEY UPDATE). Without them the upsert would insert a new row
+-- on every save.
+--
+--   mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/003_sentiment_result_unique_keys.sql
+--
+-- The previous SELECT-then-INSERT code could race and leave duplicate rows, so keep
+-- only the newest row (highest id) per employee / company before adding the keys.
+
+DELETE older FROM responses_langchain_sentiment older
+JOIN responses_langchain_sentiment newer
+    ON newer.employeesID = older.employeesID AND newer.id > older.id;
+
+ALTER TABLE responses_langchain_sentiment
+    ADD UNIQUE KEY uq_responses_langchain_sentiment_employee (employeesID);
+
+DELETE older FROM company_reports_sentiment older
+JOIN company_reports_sentiment newer
+    ON newer.company_id = older.company_id AND newer.id > older.id;
+
+ALTER TABLE company_reports_sentiment
+    ADD UNIQUE KEY uq_company_reports_sentiment_company (company_id);
@@ -0,0 +1,31 @@
+-- Running per-company aggregate of employee analyses for the incremental company report
+-- (company_aggregate.py, COMPANY_INCREMENTAL_AGGREGATE=true, /analyze-company "mode": "incremental").
+-- Maintained in the same transaction as every employee analysis upsert; built from
+-- scratch by the application the first time a company is analysed incrementally.
+--
+--   mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/004_company_sentiment_aggregate.sql
+
+CREATE TABLE IF NOT EXISTS company_sentiment_aggregate (
+    company_id INT NOT NULL PRIMARY KEY,
+    employees INT NOT NULL DEFAULT 0,
+    positive_sum BIGINT NOT NULL DEFAULT 0,
+    neutral_sum BIGINT NOT NULL DEFAULT 0,
+    negative_sum BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL
+);
+
+-- kind is 'positive' (key_positive_N) or 'factor' (attrition_factor_N); theme is the
+-- normalised text (company_aggregate.theme_key)
+CREATE TABLE IF NOT EXISTS company_theme_counts (
+    company_id INT NOT NULL,
+    kind VARCHAR(16) NOT NULL,
+    theme VARCHAR(255) NOT NULL,
+    mention_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (company_id, kind, theme),
+    KEY idx_company_theme_counts_top (company_id, kind, mention_count)
+);
+
+-- Changed employees since the last company report are found by created_at, which every
+-- analysis upsert refreshes
+CREATE INDEX idx_responses_langchain_sentiment_created
+    ON responses_langchain_sentiment (created_at, employeesID);
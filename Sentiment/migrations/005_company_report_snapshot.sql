@@ -0,0 +1,8 @@
+-- When the data behind each company report was read. Incremental company reports pick up
+-- the employee analyses saved after this time; the report's created_at is only set once
+-- generation has finished, so analyses saved while it was generating would be missed.
+--
+--   mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/005_company_report_snapshot.sql
+
+ALTER TABLE company_reports_sentiment
+    ADD COLUMN snapshot_at DATETIME NULL;
@@ -0,0 +1,20 @@
+-- Whether an employee analysis is the model's full analysis ('complete'), the pre-scorer's
+-- provisional result awaiting its deferred analysis ('provisional'), the fixed 50/30/20
+-- structure saved after a failed analysis ('fallback'), or a provisional result whose
+-- deferred analysis gave up ('failed'). Only complete rows feed the company aggregate,
+-- company statistics, incremental reports and the pre-scorer's training data.
+-- deferral_id identifies the deferred job a provisional row is waiting for; that job only
+-- replaces the row while it is still provisional with the same id, so it cannot overwrite
+-- a newer analysis or a newer deferral of the same employee.
+--
+--   mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/006_employee_analysis_status.sql
+
+ALTER TABLE responses_langchain_sentiment
+    ADD COLUMN analysis_status VARCHAR(16) NOT NULL DEFAULT 'complete',
+    ADD COLUMN deferral_id CHAR(32) NULL;
+
+-- Rows saved before this migration, recognised by the texts the application wrote
+UPDATE responses_langchain_sentiment SET analysis_status = 'provisional'
+    WHERE key_positive_1 = 'Pending full analysis';
+UPDATE responses_langchain_sentiment SET analysis_status = 'fallback'
+    WHERE summary_opinion LIKE 'Analysis could not be completed due to technical issues:%';
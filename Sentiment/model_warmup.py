@@ -0,0 +1,175 @@
+"""Ollama model warm-up, keep-warm pings and readiness.
+
+Right after a deploy, or once Ollama has unloaded an idle model, the first generation
+pays a multi-second model load. At worker start this module preloads OLLAMA_MODEL on
+every Ollama backend with keep_alive OLLAMA_KEEP_ALIVE (default "30m"; every generation
+also sends it, so real traffic does not shorten it back to Ollama's 5 minutes). It then
+pings each backend with a one-token generation every OLLAMA_KEEP_WARM_INTERVAL seconds
+(120) so the model stays resident through quiet periods.
+
+A backend is ready once its ping answers within OLLAMA_READY_LATENCY_MS (2000). It stays
+ready as long as its pings succeed, even when a ping is slowed by a busy backend. The
+worker is ready (GET /ready) when at least one backend is. Disable everything with
+OLLAMA_WARMUP_ENABLED=false; /ready then only reports whether the worker started.
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import llm_registry
+
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("OLLAMA_WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+KEEP_WARM_INTERVAL = float(os.getenv("OLLAMA_KEEP_WARM_INTERVAL", 120))
+READY_LATENCY_MS = float(os.getenv("OLLAMA_READY_LATENCY_MS", 2000))
+# Retry delay while a backend is not ready yet (model still loading, Ollama down)
+_NOT_READY_RETRY = 5.0
+
+PING_PROMPT = "Reply with OK."
+
+
+class ModelWarmer:
+    """Preloads a model on each backend and keeps it warm from a background thread."""
+
+    def __init__(self, model: str, base_urls: List[str], keep_alive=KEEP_ALIVE,
+                 interval: float = KEEP_WARM_INTERVAL, latency_budget_ms: float = READY_LATENCY_MS):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.latency_budget_ms = latency_budget_ms
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._backends: Dict[str, dict] = {
+            url: {"ready": False, "loaded": False, "latency_ms": None, "load_ms": None,
+                  "pings": 0, "failures": 0, "last_ping": None, "last_error": None}
+            for url in base_urls
+        }
+
+    def preload(self, base_url: str) -> None:
+        """Load the model into memory without generating (an empty prompt only loads it)."""
+        start = time.monotonic()
+        llm_registry.get_client(base_url).generate(model=self.model, prompt="", keep_alive=self.keep_alive)
+        load_ms = round((time.monotonic() - start) * 1000, 1)
+        with self._lock:
+            self._backends[base_url].update(loaded=True, load_ms=load_ms)
+        logger.info(f"Preloaded {self.model} on {base_url} in {load_ms} ms (keep_alive={self.keep_alive})")
+
+    def ping(self, base_url: str) -> bool:
+        """One-token generation that refreshes keep_alive and measures latency; returns readiness."""
+        start = time.monotonic()
+        error = None
+        try:
+            llm_registry.get_client(base_url).generate(
+                model=self.model,
+                prompt=PING_PROMPT,
+                options={"num_predict": 1, "temperature": 0},
+                keep_alive=self.keep_alive,
+            )
+        except Exception as e:
+            error = str(e)
+        latency_ms = round((time.monotonic() - start) * 1000, 1)
+
+        with self._lock:
+            state = self._backends[base_url]
+            state["pings"] += 1
+            state["last_ping"] = datetime.now().isoformat()
+            state["latency_ms"] = latency_ms
+            was_ready = state["ready"]
+            if error is not None:
+                state.update(ready=False, loaded=False, last_error=error)
+                state["failures"] += 1
+            else:
+                state.update(loaded=True, last_error=None)
+                state["ready"] = was_ready or latency_ms <= self.latency_budget_ms
+            ready = state["ready"]
+
+        if error is not None:
+            logger.warning(f"Keep-warm ping to {base_url} failed: {error}")
+        elif ready and not was_ready:
+            logger.info(f"{self.model} on {base_url} is ready ({latency_ms} ms)")
+        elif not ready:
+            logger.info(f"{self.model} on {base_url} answered in {latency_ms} ms, over the "
+                        f"{self.latency_budget_ms:.0f} ms readiness budget")
+        return ready
+
+    def _warm(self, base_url: str) -> bool:
+        with self._lock:
+            loaded = self._backends[base_url]["loaded"]
+        if not loaded:
+            try:
+                self.preload(base_url)
+            except Exception as e:
+                with self._lock:
+                    self._backends[base_url]["last_error"] = str(e)
+                    self._backends[base_url]["failures"] += 1
+                logger.warning(f"Preloading {self.model} on {base_url} failed: {e}")
+                return False
+        return self.ping(base_url)
+
+    def _run(self) -> None:
+        while True:
+            all_ready = all([self._warm(url) for url in self._backends])
+            if self._stopping.wait(self.interval if all_ready else min(self.interval, _NOT_READY_RETRY)):
+                return
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="ollama-keep-warm", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def ready(self) -> bool:
+        with self._lock:
+            return any(state["ready"] for state in self._backends.values())
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "ready": any(state["ready"] for state in self._backends.values()),
+                "model": self.model,
+                "keep_alive": self.keep_alive,
+                "latency_budget_ms": self.latency_budget_ms,
+                "backends": {url: dict(state) for url, state in self._backends.items()},
+            }
+
+
+_warmer: Optional[ModelWarmer] = None
+_warmer_pid: Optional[int] = None
+_warmer_lock = threading.Lock()
+
+
+def start(model: str, base_urls: List[str]) -> Optional[ModelWarmer]:
+    """Start this process's warmer (called from init_worker); None when warm-up is disabled."""
+    global _warmer, _warmer_pid
+    if not WARMUP_ENABLED:
+        return None
+    with _warmer_lock:
+        if _warmer is None or _warmer_pid != os.getpid():
+            _warmer = ModelWarmer(model, base_urls)
+            _warmer_pid = os.getpid()
+            _warmer.start()
+    return _warmer
+
+
+def stop() -> None:
+    if _warmer is not None and _warmer_pid == os.getpid():
+        _warmer.stop()
+
+
+def readiness() -> dict:
+    """Readiness of this worker's model; {'ready': bool, ...} for GET /ready."""
+    if not WARMUP_ENABLED:
+        return {"ready": True, "warmup": "disabled"}
+    if _warmer is None or _warmer_pid != os.getpid():
+        return {"ready": False, "warmup": "not started"}
+    return _warmer.status()
@@ -0,0 +1,244 @@
+"""Routing of LLM calls across several Ollama backends.
+
+OLLAMA_BASE_URLS is a comma-separated list of Ollama servers (falls back to the single
+OLLAMA_BASE_URL). Every generation is routed to a healthy backend chosen by
+OLLAMA_ROUTING:
+
+- least_outstanding (default): fewest requests in flight from this process, ties broken
+  by the lower average latency
+- latency: random choice weighted by 1 / (average latency x (in-flight + 1))
+
+A background thread probes every backend (GET /api/version) each OLLAMA_PROBE_INTERVAL
+seconds (10). A backend is ejected after OLLAMA_EJECT_AFTER consecutive failed or slow
+probes (3; slow = over OLLAMA_PROBE_SLOW_MS, 2000), or immediately when a request fails
+and a probe confirms it is down; that request is retried on another backend. Ejected
+backends are re-admitted after OLLAMA_EJECT_SECONDS (30) once a probe succeeds again.
+If every backend is ejected, requests still go to the one ejected longest ago.
+"""
+import os
+import time
+import random
+import logging
+import threading
+import urllib.request
+from typing import Callable, Dict, List, Optional, TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+STRATEGIES = ("least_outstanding", "latency")
+HEALTHY = "healthy"
+EJECTED = "ejected"
+
+# Weight of the newest sample in the latency moving average
+_EWMA_ALPHA = 0.2
+
+
+class Backend:
+    def __init__(self, url: str):
+        self.url = url
+        self.state = HEALTHY
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.consecutive_failures = 0
+        self.ewma_latency: Optional[float] = None
+        self.ejected_at = 0.0
+        self.last_probe_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "url": self.url,
+            "state": self.state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "latency_avg_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "last_probe_ms": self.last_probe_ms,
+            "last_error": self.last_error,
+        }
+
+
+class OllamaRouter:
+    """Health-aware selection of an Ollama backend per generation."""
+
+    def __init__(self, urls: List[str], strategy: str = "least_outstanding", probe_interval: float = 10.0,
+                 probe_timeout: float = 5.0, probe_slow_ms: float = 2000.0, eject_after: int = 3,
+                 eject_seconds: float = 30.0, max_attempts: int = 2):
+        if not urls:
+            raise ValueError("At least one Ollama backend URL is required")
+        if strategy not in STRATEGIES:
+            logger.warning(f"Unknown OLLAMA_ROUTING '{strategy}', using least_outstanding")
+            strategy = "least_outstanding"
+        self.backends = [Backend(url.rstrip("/")) for url in urls]
+        self.strategy = strategy
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.probe_slow_ms = probe_slow_ms
+        self.eject_after = max(1, eject_after)
+        self.eject_seconds = eject_seconds
+        self.max_attempts = max(1, max_attempts)
+
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- selection ----------
+    def _choose(self, exclude) -> Backend:
+        with self._lock:
+            candidates = [b for b in self.backends if b.state == HEALTHY and b.url not in exclude]
+            if not candidates:
+                # Fail open: better to try a suspect backend than to fail the request outright
+                remaining = [b for b in self.backends if b.url not in exclude] or self.backends
+                candidates = [min(remaining, key=lambda b: b.ejected_at)]
+
+            if self.strategy == "latency" and len(candidates) > 1:
+                default = min((b.ewma_latency for b in candidates if b.ewma_latency), default=1.0)
+                weights = [1.0 / ((b.ewma_latency or default) * (b.outstanding + 1)) for b in candidates]
+                backend = random.choices(candidates, weights=weights)[0]
+            else:
+                backend = min(candidates, key=lambda b: (b.outstanding, b.ewma_latency or 0.0))
+
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def _finish(self, backend: Backend, elapsed: float, ok: bool) -> None:
+        with self._lock:
+            backend.outstanding -= 1
+            if ok:
+                backend.ewma_latency = elapsed if backend.ewma_latency is None else (
+                    _EWMA_ALPHA * elapsed + (1 - _EWMA_ALPHA) * backend.ewma_latency
+                )
+
+    # ---------- health ----------
+    def _eject(self, backend: Backend, reason: str) -> None:
+        if backend.state != EJECTED:
+            backend.state = EJECTED
+            backend.ejections += 1
+            logger.warning(f"Ejected Ollama backend {backend.url}: {reason}")
+        backend.ejected_at = time.monotonic()
+
+    def probe(self, backend: Backend, eject_now: bool = False) -> bool:
+        """Probe one backend and update its state; returns whether it is healthy."""
+        start = time.monotonic()
+        error = None
+        try:
+            with urllib.request.urlopen(f"{backend.url}/api/version", timeout=self.probe_timeout) as response:
+                response.read()
+        except Exception as e:
+            error = str(e)
+        elapsed_ms = round((time.monotonic() - start) * 1000, 1)
+        if error is None and elapsed_ms > self.probe_slow_ms:
+            error = f"probe took {elapsed_ms} ms"
+
+        with self._lock:
+            backend.last_probe_ms = elapsed_ms
+            if error is None:
+                backend.consecutive_failures = 0
+                if backend.state == EJECTED and time.monotonic() - backend.ejected_at >= self.eject_seconds:
+                    backend.state = HEALTHY
+                    logger.info(f"Re-admitted Ollama backend {backend.url}")
+                return backend.state == HEALTHY
+
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            backend.last_error = error
+            if eject_now or backend.consecutive_failures >= self.eject_after:
+                self._eject(backend, error)
+            return False
+
+    def _probe_loop(self) -> None:
+        while not self._stopping.wait(self.probe_interval):
+            for backend in self.backends:
+                self.probe(backend)
+
+    def start(self) -> None:
+        if len(self.backends) > 1 and (self._thread is None or not self._thread.is_alive()):
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._probe_loop, name="ollama-probes", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    # ---------- public API ----------
+    def call(self, fn: Callable[[str], T], can_retry: Optional[Callable[[], bool]] = None) -> T:
+        """Run ``fn(base_url)`` on a chosen backend, failing over when the backend is down.
+
+        Errors from a backend that still answers its probe (bad model output, validation
+        errors, ...) are raised unchanged without a retry. ``can_retry`` is asked before
+        failing over, e.g. so a response that already streamed tokens is not restarted.
+        """
+        tried = set()
+        while True:
+            backend = self._choose(tried)
+            tried.add(backend.url)
+            start = time.monotonic()
+            try:
+                result = fn(backend.url)
+            except Exception:
+                self._finish(backend, time.monotonic() - start, ok=False)
+                if len(tried) >= min(self.max_attempts, len(self.backends)):
+                    raise
+                if self.probe(backend, eject_now=True) or (can_retry is not None and not can_retry()):
+                    raise
+                logger.warning(f"Ollama backend {backend.url} is unavailable, retrying on another backend")
+                continue
+            self._finish(backend, time.monotonic() - start, ok=True)
+            return result
+
+    def base_urls(self) -> List[str]:
+        return [b.url for b in self.backends]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"strategy": self.strategy, "backends": [b.stats() for b in self.backends]}
+
+
+def configured_urls() -> List[str]:
+    raw = os.getenv("OLLAMA_BASE_URLS") or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    return [url.strip() for url in raw.split(",") if url.strip()]
+
+
+_router: Optional[OllamaRouter] = None
+_router_pid: Optional[int] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> OllamaRouter:
+    """Return the process-wide router, creating it (and its probe thread) lazily and again after a fork."""
+    global _router, _router_pid
+    pid = os.getpid()
+    if _router is not None and _router_pid == pid:
+        return _router
+
+    with _router_lock:
+        if _router is None or _router_pid != pid:
+            _router = OllamaRouter(
+                configured_urls(),
+                strategy=os.getenv("OLLAMA_ROUTING", "least_outstanding").lower(),
+                probe_interval=float(os.getenv("OLLAMA_PROBE_INTERVAL", 10)),
+                probe_timeout=float(os.getenv("OLLAMA_PROBE_TIMEOUT", 5)),
+                probe_slow_ms=float(os.getenv("OLLAMA_PROBE_SLOW_MS", 2000)),
+                eject_after=int(os.getenv("OLLAMA_EJECT_AFTER", 3)),
+                eject_seconds=float(os.getenv("OLLAMA_EJECT_SECONDS", 30)),
+                max_attempts=int(os.getenv("OLLAMA_FAILOVER_ATTEMPTS", 2)),
+            )
+            _router_pid = pid
+            _router.start()
+            logger.info(f"Routing Ollama requests across {_router.base_urls()} ({_router.strategy})")
+    return _router
+
+
+def call(fn: Callable[[str], T], can_retry: Optional[Callable[[], bool]] = None) -> T:
+    return get_router().call(fn, can_retry)
+
+
+def router_stats() -> Dict[str, object]:
+    return get_router().stats()
@@ -0,0 +1,283 @@
+"""Fast CPU-only sentiment pre-scorer used to triage surveys before the LLM.
+
+Scores the output of ``format_survey_responses_for_flask`` in well under a millisecond
+and returns provisional positive/neutral/negative percentages plus an uncertainty in
+[0, 1]. Two scorers:
+
+- lexicon (default): positive/negative word lists with negation and intensifiers,
+  plus 1-5 answers to rating questions
+- learned: per-token label means fitted on stored LLM analyses by train_prescorer.py
+  and loaded from PRESCORER_MODEL_PATH (default ./models/prescorer.json) when present
+
+PRESCORER_POLICY controls what /analyze does with the score:
+
+- off (default): no pre-scoring
+- annotate: include the pre-score in responses, every survey still goes to the LLM
+- triage: send surveys with negative >= PRESCORER_NEGATIVE_THRESHOLD (30) or uncertainty
+  >= PRESCORER_UNCERTAINTY_THRESHOLD (0.6) to the LLM right away; save a provisional
+  result for the rest and defer their full analysis to the off-peak window
+  PRESCORER_OFFPEAK_WINDOW (hours, default "22-6")
+"""
+import os
+import re
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("off", "annotate", "triage")
+POLICY = os.getenv("PRESCORER_POLICY", "off").lower()
+NEGATIVE_THRESHOLD = float(os.getenv("PRESCORER_NEGATIVE_THRESHOLD", 30))
+UNCERTAINTY_THRESHOLD = float(os.getenv("PRESCORER_UNCERTAINTY_THRESHOLD", 0.6))
+OFFPEAK_WINDOW = os.getenv("PRESCORER_OFFPEAK_WINDOW", "22-6")
+
+if POLICY not in POLICIES:
+    raise RuntimeError(f"Unknown PRESCORER_POLICY '{POLICY}' (expected one of: {', '.join(POLICIES)})")
+
+LLM = "llm"
+DEFER = "defer"
+
+_TOKEN = re.compile(r"[a-z']+")
+# "On a scale from 1 (very unhappy) to 5 ...", "Rate your manager", "compensation_rating"
+# (underscores count as word breaks); not "separate" or "generate"
+_RATING_QUESTION = re.compile(r"(?<![a-z])(?:rate|rated|rating|ratings|scale)(?![a-z])")
+
+POSITIVE_WORDS = frozenset("""
+good great excellent amazing awesome fantastic outstanding positive happy satisfied enjoy enjoyed
+enjoying love loved like liked supportive helpful appreciate appreciated appreciative valued fair
+flexible friendly collaborative motivated motivating rewarding growth opportunity opportunities
+recognized recognition respect respected comfortable balanced stable encouraging inspiring
+agree proud trust trusted clear transparent fun engaged engaging efficient improved improving
+well best better benefit benefits competitive generous caring empowered
+""".split())
+
+NEGATIVE_WORDS = frozenset("""
+bad poor terrible awful horrible negative unhappy dissatisfied unsatisfied hate hated dislike
+disliked stress stressed stressful toxic unfair overworked overwhelmed burnout burned burnt
+underpaid undervalued unappreciated ignored micromanage micromanaged micromanagement frustrated
+frustrating frustration lack lacking leave leaving quit quitting resign difficult problem problems
+issue issues concern concerns worried worry anxious tired exhausted disagree conflict conflicts
+unclear disorganized chaotic slow worse worst low limited stagnant stuck boring bored unsupported
+discrimination harassment bias biased favoritism inadequate insufficient
+""".split())
+
+NEGATORS = frozenset("not no never nothing hardly barely neither nor don't doesn't didn't isn't wasn't aren't can't cannot won't".split())
+INTENSIFIERS = frozenset("very extremely really highly strongly so too totally absolutely".split())
+
+
+def _answers(survey_text: str) -> List[Tuple[str, str]]:
+    """(question, answer) pairs from format_survey_responses_for_flask output (both formats)."""
+    pairs = []
+    question = ""
+    for line in survey_text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("Answer:"):
+            pairs.append((question, line[len("Answer:"):].strip()))
+            question = ""
+            continue
+        legacy = re.match(r"Question ([^:]+):\s*(.*)", line)
+        if legacy:
+            pairs.append((legacy.group(1), legacy.group(2)))
+            continue
+        question = line
+    return pairs
+
+
+def _rating(question: str, answer: str) -> Optional[float]:
+    """A 1-5 rating answer mapped to [-1, 1], or None."""
+    if not _RATING_QUESTION.search(question.lower()):
+        return None
+    try:
+        value = float(answer)
+    except ValueError:
+        return None
+    if not 1 <= value <= 5:
+        return None
+    return (value - 3) / 2
+
+
+def _percentages(positive: float, negative: float, confidence: float) -> Dict[str, int]:
+    total = positive + negative
+    if total <= 0:
+        return {"positive_sentiment": 0, "neutral_sentiment": 100, "negative_sentiment": 0}
+    pos = round(100 * confidence * positive / total)
+    neg = round(100 * confidence * negative / total)
+    return {"positive_sentiment": pos, "neutral_sentiment": 100 - pos - neg, "negative_sentiment": neg}
+
+
+class LexiconScorer:
+    name = "lexicon"
+
+    def score(self, survey_text: str) -> dict:
+        positive = negative = 0.0
+        for question, answer in _answers(survey_text):
+            rating = _rating(question, answer)
+            if rating is not None:
+                positive += max(rating, 0.0)
+                negative += max(-rating, 0.0)
+                continue
+            tokens = _TOKEN.findall(answer.lower())
+            for i, token in enumerate(tokens):
+                polarity = 1 if token in POSITIVE_WORDS else -1 if token in NEGATIVE_WORDS else 0
+                if not polarity:
+                    continue
+                window = tokens[max(0, i - 3):i]
+                weight = 1.5 if window and window[-1] in INTENSIFIERS else 1.0
+                if any(word in NEGATORS for word in window):
+                    polarity = -polarity
+                if polarity > 0:
+                    positive += weight
+                else:
+                    negative += weight
+
+        evidence = positive + negative
+        # More sentiment-bearing words -> more of the survey is classed as non-neutral
+        confidence = evidence / (evidence + 3)
+        balance = abs(positive - negative) / evidence if evidence else 0.0
+        return dict(
+            _percentages(positive, negative, confidence),
+            uncertainty=round(1 - confidence * balance, 3),
+            evidence=round(evidence, 2),
+            scorer=self.name,
+        )
+
+
+class LearnedScorer:
+    """Smoothed per-token means of the LLM's percentages, fitted by train_prescorer.py."""
+
+    name = "learned"
+
+    def __init__(self, model: dict):
+        self.prior = model["prior"]
+        self.tokens = model["tokens"]
+        self.smoothing = model.get("smoothing", 5.0)
+
+    def score(self, survey_text: str) -> dict:
+        tokens = set()
+        for question, answer in _answers(survey_text):
+            tokens.update(_TOKEN.findall(answer.lower()))
+        known = [self.tokens[t] for t in tokens if t in self.tokens]
+
+        prior_pos, prior_neg = self.prior
+        if known:
+            pos = sum(k[0] for k in known) / len(known)
+            neg = sum(k[1] for k in known) / len(known)
+            spread = (sum((k[0] - pos) ** 2 + (k[1] - neg) ** 2 for k in known) / len(known)) ** 0.5
+        else:
+            pos, neg, spread = prior_pos, prior_neg, 50.0
+        # Few known tokens -> stay close to the corpus average
+        weight = len(known) / (len(known) + self.smoothing)
+        pos = weight * pos + (1 - weight) * prior_pos
+        neg = weight * neg + (1 - weight) * prior_neg
+
+        pos_pct = max(0, min(100, round(pos)))
+        neg_pct = max(0, min(100 - pos_pct, round(neg)))
+        return {
+            "positive_sentiment": pos_pct,
+            "neutral_sentiment": 100 - pos_pct - neg_pct,
+            "negative_sentiment": neg_pct,
+            "uncertainty": round(min(1.0, (1 - weight) + spread / 100), 3),
+            "evidence": len(known),
+            "scorer": self.name,
+        }
+
+
+def fit(documents: List[Tuple[str, float, float]], min_count: int = 3, smoothing: float = 5.0) -> dict:
+    """Fit a LearnedScorer model from (answers_text, positive, negative) examples."""
+    if not documents:
+        raise ValueError("No labelled documents to train on")
+    prior_pos = sum(d[1] for d in documents) / len(documents)
+    prior_neg = sum(d[2] for d in documents) / len(documents)
+    sums: Dict[str, List[float]] = {}
+    for text, positive, negative in documents:
+        for token in set(_TOKEN.findall(text.lower())):
+            entry = sums.setdefault(token, [0.0, 0.0, 0])
+            entry[0] += positive
+            entry[1] += negative
+            entry[2] += 1
+    tokens = {
+        token: [
+            round((pos + smoothing * prior_pos) / (count + smoothing), 2),
+            round((neg + smoothing * prior_neg) / (count + smoothing), 2),
+        ]
+        for token, (pos, neg, count) in sums.items() if count >= min_count
+    }
+    return {
+        "prior": [round(prior_pos, 2), round(prior_neg, 2)],
+        "tokens": tokens,
+        "smoothing": smoothing,
+        "documents": len(documents),
+        "trained_at": datetime.now().isoformat(),
+    }
+
+
+def default_model_path() -> str:
+    return os.getenv("PRESCORER_MODEL_PATH") or os.path.join(os.path.dirname(__file__), "models", "prescorer.json")
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def get_scorer():
+    """The learned scorer if a trained model exists, otherwise the lexicon scorer."""
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                path = default_model_path()
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        _scorer = LearnedScorer(json.load(f))
+                    logger.info(f"Loaded learned pre-scorer from {path}")
+                else:
+                    _scorer = LexiconScorer()
+    return _scorer
+
+
+def score(survey_text: str) -> dict:
+    return get_scorer().score(survey_text)
+
+
+def triage(prescore: dict) -> str:
+    """LLM now for likely-negative or uncertain surveys; DEFER the rest (only under the triage policy)."""
+    if POLICY != "triage":
+        return LLM
+    if prescore["negative_sentiment"] >= NEGATIVE_THRESHOLD or prescore["uncertainty"] >= UNCERTAINTY_THRESHOLD:
+        return LLM
+    return DEFER
+
+
+def next_offpeak(now: Optional[datetime] = None) -> datetime:
+    """Start of the next off-peak window (now, if already inside it)."""
+    now = now or datetime.now()
+    start, end = (int(h) % 24 for h in OFFPEAK_WINDOW.split("-"))
+    hour = now.hour
+    inside = start <= hour < end if start < end else hour >= start or hour < end
+    if inside or start == end:
+        return now
+    candidate = now.replace(hour=start, minute=0, second=0, microsecond=0)
+    return candidate if candidate > now else candidate + timedelta(days=1)
+
+
+def provisional_analysis(prescore: dict) -> dict:
+    """16-field record holding the provisional percentages until the full analysis replaces it."""
+    pending = "Pending full analysis"
+    analysis = {
+        "positive_sentiment": prescore["positive_sentiment"],
+        "neutral_sentiment": prescore["neutral_sentiment"],
+        "negative_sentiment": prescore["negative_sentiment"],
+        "summary_opinion": "Provisional score from the fast pre-scorer; the full analysis is scheduled.",
+    }
+    for i in range(1, 4):
+        analysis[f"key_positive_{i}"] = pending
+        analysis[f"attrition_factor_{i}"] = pending
+        analysis[f"attrition_problem_{i}"] = pending
+        analysis[f"retention_strategy_{i}"] = pending
+    return analysis
@@ -7,7 +7,7 @@ import os
 import glob
 from typing import List
 
-from style_memory import upsert_style_guide, _get_vectorstore
+from style_memory import upsert_style_guide, bump_collection_version, _get_vectorstore
 
 
 def ingest_folder(folder: str) -> int:
@@ -23,6 +23,8 @@ def ingest_folder(folder: str) -> int:
                 count += 1
         except Exception:
             pass
+    if count:
+        bump_collection_version()
     vs.persist()
     return count
 
@@ -0,0 +1,118 @@
+"""Server-Sent Events helpers for the streaming analysis endpoints.
+
+The analysis runs in a background thread and reports through ``emit(event, data)``;
+the response generator forwards each event to the client as it happens
+(``event: <name>`` / ``data: <json>``) and sends a comment line every
+SSE_HEARTBEAT_INTERVAL seconds (15) while nothing else is happening, so proxies keep
+long company analyses open.
+
+Events used by the endpoints:
+- token: a piece of generated text, as Ollama produces it
+- field: a top-level field of the JSON analysis, once its value is complete
+- progress: employees processed / total (company analyses)
+- result: the validated, persisted record (same body as the non-streaming endpoint)
+- error: the analysis failed; no result follows
+
+Field events are provisional: if constrained decoding fails the analysis is retried on
+the cleanup path and the result event carries the values that were actually saved.
+"""
+import os
+import json
+import queue
+import logging
+import threading
+from typing import Callable, List, Tuple
+
+from flask import Response, stream_with_context
+
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", 15))
+
+_decoder = json.JSONDecoder()
+_DONE = object()
+
+
+def format_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class FieldStream:
+    """Picks completed top-level fields out of a flat JSON object as it is streamed."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.fields = {}
+
+    def feed(self, text: str) -> List[Tuple[str, object]]:
+        """Add generated text; returns the (name, value) pairs completed by it."""
+        self.buffer += text
+        completed = []
+        while True:
+            pos = self.pos
+            while pos < len(self.buffer) and self.buffer[pos] in " \t\r\n{,":
+                pos += 1
+            if pos >= len(self.buffer) or self.buffer[pos] != '"':
+                break
+            try:
+                name, pos = _decoder.raw_decode(self.buffer, pos)
+                while pos < len(self.buffer) and self.buffer[pos] in " \t\r\n":
+                    pos += 1
+                if pos >= len(self.buffer) or self.buffer[pos] != ":":
+                    break
+                pos += 1
+                while pos < len(self.buffer) and self.buffer[pos] in " \t\r\n":
+                    pos += 1
+                value, end = _decoder.raw_decode(self.buffer, pos)
+            except json.JSONDecodeError:
+                break
+            # A number is only complete once the next delimiter has arrived
+            rest = self.buffer[end:].lstrip()
+            if not rest or rest[0] not in ",}":
+                break
+            self.fields[name] = value
+            completed.append((name, value))
+            self.pos = end
+        return completed
+
+
+def _stream(work: Callable[[Callable[[str, object], None]], None]):
+    events: "queue.Queue" = queue.Queue()
+
+    def emit(event: str, data) -> None:
+        events.put((event, data))
+
+    def run() -> None:
+        try:
+            work(emit)
+        except Exception as e:
+            logger.error(f"Streaming analysis error: {e}")
+            emit("error", {"error": str(e)})
+        finally:
+            events.put(_DONE)
+
+    threading.Thread(target=run, name="sse-analysis", daemon=True).start()
+
+    while True:
+        try:
+            item = events.get(timeout=HEARTBEAT_INTERVAL)
+        except queue.Empty:
+            yield ": keep-alive\n\n"
+            continue
+        if item is _DONE:
+            return
+        yield format_event(*item)
+
+
+def sse_response(work: Callable[[Callable[[str, object], None]], None]) -> Response:
+    """Run ``work(emit)`` in a background thread and stream what it emits as SSE.
+
+    If the client disconnects the work still runs to completion (and persists its result).
+    """
+    response = Response(stream_with_context(_stream(work)), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,112 @@
+"""Constrained JSON decoding for the 16-field sentiment analysis.
+
+Ollama can constrain generation to valid JSON (``format="json"``) or, from Ollama 0.5,
+to a JSON schema. Generating against the schema below means a single generation
+returns valid, typed output, so the parse-and-retry loops in main.py are only needed
+as a fallback. LLM_STRUCTURED_OUTPUT selects the mode:
+
+- schema (default): JSON schema built from ANALYSIS_FIELDS
+- json: plain JSON mode, for Ollama servers older than 0.5
+- off: skip constrained decoding and use the legacy cleanup path only
+
+Every outcome is counted by ``record_path`` so the retry savings can be measured.
+"""
+import os
+import json
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_FIELDS: List[str] = ["positive_sentiment", "neutral_sentiment", "negative_sentiment"]
+TEXT_FIELDS: List[str] = [
+    "summary_opinion", "key_positive_1", "key_positive_2", "key_positive_3",
+    "attrition_factor_1", "attrition_problem_1", "retention_strategy_1",
+    "attrition_factor_2", "attrition_problem_2", "retention_strategy_2",
+    "attrition_factor_3", "attrition_problem_3", "retention_strategy_3",
+]
+ANALYSIS_FIELDS: List[str] = SENTIMENT_FIELDS + TEXT_FIELDS
+
+ANALYSIS_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **{field: {"type": "integer", "minimum": 0, "maximum": 100} for field in SENTIMENT_FIELDS},
+        **{field: {"type": "string"} for field in TEXT_FIELDS},
+    },
+    "required": ANALYSIS_FIELDS,
+    "additionalProperties": False,
+}
+
+STRUCTURED_OUTPUT_MODE = os.getenv("LLM_STRUCTURED_OUTPUT", "schema").lower()
+
+_lock = threading.Lock()
+_path_counts: Dict[str, int] = {}
+
+
+def enabled() -> bool:
+    return STRUCTURED_OUTPUT_MODE in ("schema", "json")
+
+
+def record_path(name: str) -> None:
+    """Count which decoding path produced (or failed to produce) an analysis."""
+    with _lock:
+        _path_counts[name] = _path_counts.get(name, 0) + 1
+    metrics.JSON_PARSE.labels(path=name).inc()
+
+
+def path_stats() -> Dict[str, object]:
+    with _lock:
+        return {"mode": STRUCTURED_OUTPUT_MODE, "paths": dict(_path_counts)}
+
+
+def generate_analysis(client, model: str, prompt: str, options: dict, source: str,
+                      on_chunk: Optional[Callable[[str], None]] = None, keep_alive=None) -> dict:
+    """Generate one constrained analysis; raises ValueError if the output is unusable.
+
+    ``source`` ('employee' or 'company') only labels the path counters. With ``on_chunk``
+    the generation is streamed and every piece of text is passed to it as it arrives.
+    ``keep_alive`` is passed to Ollama as how long to keep the model loaded afterwards.
+    """
+    output_format = ANALYSIS_JSON_SCHEMA if STRUCTURED_OUTPUT_MODE == "schema" else "json"
+    request = dict(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        format=output_format,
+        options=options,
+    )
+    if keep_alive is not None:
+        request["keep_alive"] = keep_alive
+    response = None
+    with metrics.generation(source, "structured"):
+        if on_chunk is None:
+            response = client.chat(**request)
+            content = response["message"]["content"]
+        else:
+            parts = []
+            for response in client.chat(stream=True, **request):
+                text = response["message"]["content"]
+                if text:
+                    parts.append(text)
+                    on_chunk(text)
+            content = "".join(parts)
+    # Token counts arrive on the (final) response
+    metrics.record_tokens(source, response)
+    logger.info(f"Structured ({STRUCTURED_OUTPUT_MODE}) {source} response length: {len(content)}")
+
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Structured output was not valid JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("Structured output was not a JSON object")
+
+    missing = [field for field in ANALYSIS_FIELDS if field not in data]
+    if missing:
+        raise ValueError(f"Structured output missing required fields: {missing}")
+
+    record_path(f"{source}_structured")
+    return data
@@ -0,0 +1,125 @@
+"""Embedding backends for style memory, selected by STYLE_EMBEDDING_BACKEND.
+
+- google (default): Google Generative AI embeddings (needs GOOGLE_API_KEY and network)
+- ollama: an Ollama embedding model (default nomic-embed-text), routed across the
+  OLLAMA_BASE_URLS backends like the analyses
+- local: a sentence-transformers model on the CPU (default
+  sentence-transformers/all-MiniLM-L6-v2; pip install sentence-transformers)
+
+STYLE_EMBEDDING_MODEL overrides the model of the chosen backend and
+STYLE_EMBEDDING_BATCH_SIZE (32) sets how many texts are embedded per call. Vectors from
+different models are not comparable; ``embedding_id()`` names the backend and model so
+style_memory can re-embed the collection when it changes.
+"""
+import os
+import logging
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("google", "ollama", "local")
+DEFAULT_MODELS = {
+    "google": "models/embedding-001",
+    "ollama": "nomic-embed-text",
+    "local": "sentence-transformers/all-MiniLM-L6-v2",
+}
+
+BACKEND = os.getenv("STYLE_EMBEDDING_BACKEND", "google").lower()
+BATCH_SIZE = int(os.getenv("STYLE_EMBEDDING_BATCH_SIZE", 32))
+
+
+def _batches(texts: List[str], size: int):
+    for start in range(0, len(texts), size):
+        yield texts[start:start + size]
+
+
+class OllamaEmbeddings(Embeddings):
+    """Batched embeddings from Ollama's /api/embed, with failover across backends."""
+
+    def __init__(self, model: str, batch_size: int = BATCH_SIZE):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        import llm_registry
+        import ollama_router
+
+        vectors = []
+        for batch in _batches(list(texts), self.batch_size):
+            response = ollama_router.call(
+                lambda base_url: llm_registry.get_client(base_url).embed(model=self.model, input=batch)
+            )
+            vectors.extend([list(v) for v in response["embeddings"]])
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class LocalEmbeddings(Embeddings):
+    """sentence-transformers on the CPU; the model is downloaded once, then runs offline."""
+
+    def __init__(self, model: str, batch_size: int = BATCH_SIZE):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError(
+                "STYLE_EMBEDDING_BACKEND=local needs sentence-transformers: pip install sentence-transformers"
+            )
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self._model = SentenceTransformer(model, device="cpu")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True, show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _google(model: str) -> Embeddings:
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise RuntimeError(
+            "GOOGLE_API_KEY environment variable is not set. Please set it before running."
+        )
+    return GoogleGenerativeAIEmbeddings(model=model, google_api_key=api_key)
+
+
+def backend() -> str:
+    if BACKEND not in BACKENDS:
+        raise RuntimeError(f"Unknown STYLE_EMBEDDING_BACKEND '{BACKEND}' (expected one of: {', '.join(BACKENDS)})")
+    return BACKEND
+
+
+def model_name(name: str = None) -> str:
+    name = name or backend()
+    override = os.getenv("STYLE_EMBEDDING_MODEL")
+    # The override names a model of the configured backend only
+    return override if override and name == BACKEND else DEFAULT_MODELS[name]
+
+
+def embedding_id(name: str = None, model: str = None) -> str:
+    """'<backend>:<model>', stored with the collection to detect a backend switch."""
+    name = name or backend()
+    return f"{name}:{model or model_name(name)}"
+
+
+def create(name: str = None, model: str = None) -> Embeddings:
+    """Build the embedding function for a backend (the configured one by default)."""
+    name = name or backend()
+    model = model or model_name(name)
+    logger.info(f"Using {name} embeddings ({model}) for style memory")
+    if name == "google":
+        return _google(model)
+    if name == "ollama":
+        return OllamaEmbeddings(model)
+    return LocalEmbeddings(model)
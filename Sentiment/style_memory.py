@@ -1,43 +1,283 @@
+"""Vector memory (Chroma) holding the style guide and exemplars for report generation.
+
+The Chroma store and its embedding client are opened once per process (lazily, and
+again after a fork) and shared by all threads. upsert_style_guide() is idempotent: the
+style docs carry a hash of their content, so calling it before every report only embeds
+and writes them when the text actually changed.
+
+Embeddings come from the backend chosen by STYLE_EMBEDDING_BACKEND (see
+style_embeddings). The collection records which backend/model embedded it; on a switch
+every document is re-embedded into a new collection that replaces the old one only once
+complete, so a failed re-embed leaves the previous collection untouched. Vectors are
+cached on disk per model (embedding_cache), so unchanged texts are not embedded twice.
+
+get_style_context() results are memoized per (query, k) and collection version. Every
+write touches a version file in the persist directory, so a lookup costs one stat() until
+any process changes the collection. Generated examples served from the memo are recorded
+as used in memory and written to their last_used metadata in batches.
+
+Generated report examples are deduplicated and capped: save_output_example() skips a text
+whose embedding is nearly identical to a stored example, and once more than
+STYLE_MEMORY_MAX_GENERATED_EXAMPLES are stored the lowest-quality, least recently used ones
+are deleted. Deletes leave holes in Chroma's index; compact() (compact_style_memory.py)
+rebuilds it into a fresh collection, removes the old collection's index files and
+VACUUMs chroma.sqlite3.
+"""
 import os
-from typing import List
+import fcntl
+import atexit
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
 
+import chromadb
+import numpy as np
 from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_core.embeddings import Embeddings
+
+import embedding_cache
+import metrics
+import style_embeddings
+
 
+logger = logging.getLogger(__name__)
 
 COLLECTION_NAME = "sentiment_style"
+# Collection built during a re-embed or compaction, renamed to COLLECTION_NAME when complete
+REEMBED_COLLECTION_NAME = f"{COLLECTION_NAME}__reembed"
+# Collections created before embedding ids were recorded were embedded with this
+LEGACY_EMBEDDING_ID = "google:models/embedding-001"
+
+_PERSIST_DIR = os.path.join(os.path.dirname(__file__), "vector_store", "sentiment")
+_VERSION_PATH = os.path.join(_PERSIST_DIR, ".collection.version")
+# Replaced when the collection itself is swapped, so other processes reopen it
+_GENERATION_PATH = os.path.join(_PERSIST_DIR, ".collection.generation")
+CONTEXT_CACHE_SIZE = int(os.getenv("STYLE_CONTEXT_CACHE_SIZE", 256))
+# Seconds between writes of the last use of examples served from the memo
+USAGE_FLUSH_INTERVAL = float(os.getenv("STYLE_MEMORY_USAGE_FLUSH_INTERVAL", 60))
+
+GENERATED_TYPE = "generated_example"
+MAX_GENERATED_EXAMPLES = int(os.getenv("STYLE_MEMORY_MAX_GENERATED_EXAMPLES", 200))
+# Cosine similarity above which a new example counts as a duplicate of a stored one
+DEDUP_SIMILARITY = float(os.getenv("STYLE_MEMORY_DEDUP_SIMILARITY", 0.97))
 
 
 def _get_persist_dir() -> str:
-    base = os.path.join(os.path.dirname(__file__), "vector_store", "sentiment")
-    os.makedirs(base, exist_ok=True)
-    return base
+    os.makedirs(_PERSIST_DIR, exist_ok=True)
+    return _PERSIST_DIR
+
+
+def _file_identity(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def _replace_file(path: str) -> None:
+    _get_persist_dir()
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, "w") as f:
+        f.write(f"{os.getpid()} {time.time_ns()}\n")
+    # A new inode per bump, so two writes within the mtime resolution still differ
+    os.replace(tmp_path, path)
+
+
+def _collection_version() -> Optional[Tuple[int, int]]:
+    """Identity of the version file; changes whenever any process writes the collection."""
+    return _file_identity(_VERSION_PATH)
+
+
+def bump_collection_version() -> None:
+    """Invalidate memoized style contexts in every process (call after writing the collection)."""
+    _replace_file(_VERSION_PATH)
+
+
+_embeddings: Optional[Embeddings] = None
+_embeddings_pid: Optional[int] = None
+
+
+def _get_embeddings() -> Embeddings:
+    """The process-wide embedding function; kept when the collection is reopened."""
+    global _embeddings, _embeddings_pid
+    if _embeddings is None or _embeddings_pid != os.getpid():
+        _embeddings = embedding_cache.cached(style_embeddings.create(), style_embeddings.embedding_id())
+        _embeddings_pid = os.getpid()
+    return _embeddings
+
+
+@contextmanager
+def _collection_lock():
+    """Exclusive lock across processes sharing the persist directory (held while rebuilding or saving examples)."""
+    with open(os.path.join(_get_persist_dir(), ".collection.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 
-def _get_embeddings() -> GoogleGenerativeAIEmbeddings:
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise RuntimeError(
-            "GOOGLE_API_KEY environment variable is not set. Please set it before running."
+def _collection_names(client) -> List[str]:
+    # chromadb < 0.6 returns Collection objects, later versions names
+    return [getattr(c, "name", c) for c in client.list_collections()]
+
+
+def _rebuild(client, target_id: str, embeddings: Optional[Embeddings] = None) -> int:
+    """Copy every document into a fresh collection and swap it in (lock held).
+
+    With ``embeddings`` the documents are re-embedded, otherwise their stored vectors are
+    copied, which compacts the index. Returns the number of documents.
+    """
+    names = _collection_names(client)
+    if REEMBED_COLLECTION_NAME in names:
+        client.delete_collection(REEMBED_COLLECTION_NAME)  # left over from an interrupted run
+    source = client.get_collection(COLLECTION_NAME)
+    include = ["documents", "metadatas"] if embeddings is not None else ["documents", "metadatas", "embeddings"]
+    stored = source.get(include=include)
+    target = client.create_collection(
+        REEMBED_COLLECTION_NAME, metadata={**(source.metadata or {}), "embedding_id": target_id}
+    )
+
+    batch_size = style_embeddings.BATCH_SIZE
+    for start in range(0, len(stored["ids"]), batch_size):
+        documents = stored["documents"][start:start + batch_size]
+        if embeddings is not None:
+            vectors = embeddings.embed_documents(documents)
+        else:
+            vectors = stored["embeddings"][start:start + batch_size]
+        target.add(
+            ids=stored["ids"][start:start + batch_size],
+            documents=documents,
+            metadatas=stored["metadatas"][start:start + batch_size],
+            embeddings=vectors,
         )
-    return GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=api_key)
 
+    client.delete_collection(COLLECTION_NAME)
+    target.modify(name=COLLECTION_NAME)
+    _replace_file(_GENERATION_PATH)
+    bump_collection_version()
+    _reclaim_space()
+    return len(stored["ids"])
 
-def _get_vectorstore() -> Chroma:
-    embeddings = _get_embeddings()
+
+def _reclaim_space() -> None:
+    """Free the disk space of dropped collections (lock held).
+
+    Chroma leaves a dropped collection's index directory behind and chroma.sqlite3 keeps
+    its freed pages, so a rebuild alone grows the store.
+    """
     persist_dir = _get_persist_dir()
-    # This will create or load the collection
-    return Chroma(
-        collection_name=COLLECTION_NAME,
-        persist_directory=persist_dir,
-        embedding_function=embeddings,
-    )
+    try:
+        conn = sqlite3.connect(os.path.join(persist_dir, "chroma.sqlite3"), timeout=30)
+        try:
+            live = {row[0] for row in conn.execute("SELECT id FROM segments")}
+            for name in os.listdir(persist_dir):
+                path = os.path.join(persist_dir, name)
+                if name not in live and os.path.isdir(path) and _is_uuid(name):
+                    shutil.rmtree(path, ignore_errors=True)
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not reclaim style memory disk space: {e}")
+
+
+def _is_uuid(name: str) -> bool:
+    try:
+        uuid.UUID(name)
+    except ValueError:
+        return False
+    return True
+
+
+def _ensure_embedding_model(client, embeddings: Embeddings) -> None:
+    """Make the stored collection match the configured embedding backend/model."""
+    target_id = style_embeddings.embedding_id()
+    with _collection_lock():
+        names = _collection_names(client)
+        if COLLECTION_NAME not in names and REEMBED_COLLECTION_NAME in names:
+            # Interrupted between dropping the old collection and renaming the new one
+            client.get_collection(REEMBED_COLLECTION_NAME).modify(name=COLLECTION_NAME)
+            _replace_file(_GENERATION_PATH)
+            bump_collection_version()
+            names = _collection_names(client)
+
+        if COLLECTION_NAME not in names:
+            client.create_collection(COLLECTION_NAME, metadata={"embedding_id": target_id})
+            return
+
+        collection = client.get_collection(COLLECTION_NAME)
+        stored_id = (collection.metadata or {}).get("embedding_id")
+        if stored_id is None:
+            stored_id = LEGACY_EMBEDDING_ID if collection.count() else target_id
+            if stored_id == target_id:
+                collection.modify(metadata={**(collection.metadata or {}), "embedding_id": target_id})
+        if stored_id != target_id:
+            logger.warning(f"Style memory was embedded with {stored_id}, re-embedding with {target_id}")
+            count = _rebuild(client, target_id, embeddings)
+            logger.info(f"Re-embedded {count} style memory documents with {target_id}")
+
+
+_vectorstore: Optional[Chroma] = None
+_vectorstore_pid: Optional[int] = None
+_vectorstore_generation: Optional[Tuple[int, int]] = None
+_vectorstore_lock = threading.Lock()
+# Hash of the style docs already confirmed in the store by this process
+_style_guide_hash: Optional[str] = None
+
+
+def _get_vectorstore() -> Chroma:
+    """Return the process-wide store, reopening the collection when another process replaced it."""
+    global _vectorstore, _vectorstore_pid, _vectorstore_generation, _style_guide_hash
+    pid = os.getpid()
+    # A compaction or re-embed in any process replaces the collection this store points at
+    generation = _file_identity(_GENERATION_PATH)
+    if _vectorstore is not None and _vectorstore_pid == pid and _vectorstore_generation == generation:
+        return _vectorstore
+
+    with _vectorstore_lock:
+        generation = _file_identity(_GENERATION_PATH)
+        if _vectorstore is None or _vectorstore_pid != pid or _vectorstore_generation != generation:
+            # Only the client and collection are reopened; the embedding model stays loaded
+            embeddings = _get_embeddings()
+            client = chromadb.PersistentClient(path=_get_persist_dir())
+            _ensure_embedding_model(client, embeddings)
+            # This will load the collection
+            _vectorstore = Chroma(
+                collection_name=COLLECTION_NAME,
+                persist_directory=_get_persist_dir(),
+                embedding_function=embeddings,
+                client=client,
+            )
+            _vectorstore_pid = pid
+            # Read again: opening may itself have re-embedded and swapped the collection
+            _vectorstore_generation = _file_identity(_GENERATION_PATH)
+            _style_guide_hash = None
+            if _collection_version() is None:
+                bump_collection_version()  # store created before versioning, or new
+            logger.info(f"Opened style memory collection {COLLECTION_NAME}")
+    return _vectorstore
+
+
+def collection_count() -> int:
+    """Number of documents in the style collection, read through the shared store (no embedding call)."""
+    return _get_vectorstore()._collection.count()
 
 
 def upsert_style_guide() -> None:
     """Seed or refresh the style guide and exemplar docs in the vector store."""
-    vs = _get_vectorstore()
+    with metrics.timed(metrics.STYLE_MEMORY_LATENCY, operation="upsert_style_guide"):
+        _upsert_style_guide()
+
 
+def _style_guide_docs():
     core_rules = (
         "Role: HR analytics assistant. Start every response with 'Of course. As an HR analytics assistant,'. "
         "Keep professional HR tone. Prioritize clarity, evidence, and actionable steps."
@@ -62,28 +302,234 @@ def upsert_style_guide() -> None:
         "style_constraints_v1",
         "style_exemplar_v1",
     ]
+    return texts, ids
 
-    try:
-        # Delete then re-add to ensure latest
-        vs.delete(ids=ids)
-    except Exception:
-        pass
 
-    vs.add_texts(texts=texts, ids=ids, metadatas=[{"type": "style"} for _ in texts])
-    vs.persist()
+def _content_hash(texts: List[str], ids: List[str]) -> str:
+    digest = hashlib.sha256()
+    for doc_id, text in zip(ids, texts):
+        digest.update(doc_id.encode("utf-8") + b"\0" + text.encode("utf-8") + b"\0")
+    return digest.hexdigest()
 
 
-def get_style_context(query: str, k: int = 3) -> str:
+def _upsert_style_guide() -> None:
+    global _style_guide_hash
+    texts, ids = _style_guide_docs()
+    content_hash = _content_hash(texts, ids)
+    if _style_guide_hash == content_hash and _vectorstore_pid == os.getpid():
+        return
+
     vs = _get_vectorstore()
-    docs = vs.similarity_search(query=query, k=k)
-    joined = "\n\n".join(d.page_content for d in docs)
+    with _vectorstore_lock:
+        if _style_guide_hash == content_hash:
+            return
+        # Metadata reads need no embedding call; skip the write when every doc is current
+        stored = vs.get(ids=ids, include=["metadatas"])
+        stored_hashes = {doc_id: (meta or {}).get("content_hash") for doc_id, meta in zip(stored["ids"], stored["metadatas"])}
+        if all(stored_hashes.get(doc_id) == content_hash for doc_id in ids):
+            _style_guide_hash = content_hash
+            return
+
+        # add_texts upserts by id, so changed docs are replaced in place
+        vs.add_texts(texts=texts, ids=ids, metadatas=[{"type": "style", "content_hash": content_hash} for _ in texts])
+        bump_collection_version()
+        _style_guide_hash = content_hash
+        logger.info(f"Updated style guide in {COLLECTION_NAME} ({content_hash[:12]})")
+
+
+# (query, k) -> (collection version, joined context, ids of the generated examples in it)
+_context_cache: Dict[Tuple[str, int], Tuple[Optional[Tuple[int, int]], str, Tuple[str, ...]]] = {}
+_context_cache_lock = threading.Lock()
+
+# Generated examples served from the memo since the last flush of their last use
+_used_ids = set()
+_used_ids_flushed = time.monotonic()
+_used_ids_lock = threading.Lock()
+
+
+def get_style_context(query: str, k: int = 3) -> str:
+    # Read the version before searching: a write racing the search leaves a stale version
+    # behind, so the result is recomputed on the next call rather than served stale
+    version = _collection_version()
+    key = (query, k)
+    cached = _context_cache.get(key)
+    if cached is not None and cached[0] == version and version is not None:
+        metrics.STYLE_CONTEXT_LOOKUPS.labels(result="hit").inc()
+        if cached[2]:
+            _record_use(cached[2])
+        return cached[1]
+
+    metrics.STYLE_CONTEXT_LOOKUPS.labels(result="miss").inc()
+    with metrics.timed(metrics.STYLE_MEMORY_LATENCY, operation="get_style_context"):
+        vs = _get_vectorstore()
+        # Same search as vs.similarity_search, but with ids so used examples can be touched
+        result = vs._collection.query(
+            query_embeddings=[vs.embeddings.embed_query(query)], n_results=k, include=["documents", "metadatas"]
+        )
+        _touch_examples(vs._collection, result["ids"][0], result["metadatas"][0])
+    joined = "\n\n".join(result["documents"][0])
+    used = tuple(
+        doc_id for doc_id, meta in zip(result["ids"][0], result["metadatas"][0])
+        if (meta or {}).get("type") == GENERATED_TYPE
+    )
+    if CONTEXT_CACHE_SIZE > 0:
+        with _context_cache_lock:
+            if len(_context_cache) >= CONTEXT_CACHE_SIZE and key not in _context_cache:
+                # Callers use a handful of fixed queries; dropping the oldest entry is enough
+                _context_cache.pop(next(iter(_context_cache)))
+            _context_cache[key] = (version, joined, used)
     return joined
 
 
-def save_output_example(text: str) -> None:
+def _record_use(ids: Tuple[str, ...]) -> None:
+    """Remember examples served from the memo; their last use is written every USAGE_FLUSH_INTERVAL."""
+    with _used_ids_lock:
+        _used_ids.update(ids)
+        if time.monotonic() - _used_ids_flushed < USAGE_FLUSH_INTERVAL:
+            return
+    flush_usage()
+
+
+def flush_usage() -> None:
+    """Write the last use of examples served from the memo since the previous flush."""
+    global _used_ids_flushed
+    with _used_ids_lock:
+        ids = list(_used_ids)
+        _used_ids.clear()
+        _used_ids_flushed = time.monotonic()
+    if not ids or _vectorstore is None or _vectorstore_pid != os.getpid():
+        return
+    try:
+        collection = _get_vectorstore()._collection
+        # Evicted examples are simply not returned
+        stored = collection.get(ids=ids, include=["metadatas"])
+    except Exception as e:
+        logger.warning(f"Could not update last use of style examples: {e}")
+        return
+    _touch_examples(collection, stored["ids"], stored["metadatas"])
+
+
+# Short-lived callers (the report scripts) would otherwise drop their last batch
+atexit.register(flush_usage)
+
+
+def _touch_examples(collection, ids: List[str], metadatas: List[dict], quality: Optional[float] = None) -> None:
+    """Mark generated examples as used now (best effort; does not change search results)."""
+    now = time.time()
+    touched_ids, touched = [], []
+    for doc_id, meta in zip(ids, metadatas):
+        meta = dict(meta or {})
+        if meta.get("type") != GENERATED_TYPE:
+            continue
+        meta["last_used"] = now
+        if quality is not None:
+            meta["quality"] = max(float(quality), meta.get("quality", float(quality)))
+        touched_ids.append(doc_id)
+        touched.append(meta)
+    if not touched_ids:
+        return
+    try:
+        collection.update(ids=touched_ids, metadatas=touched)
+    except Exception as e:
+        logger.warning(f"Could not update last use of style examples: {e}")
+
+
+def _nearest_duplicate(collection, vector: List[float]):
+    """(id, metadata) of a stored generated example nearly identical to ``vector``, else None."""
+    if DEDUP_SIMILARITY > 1:
+        return None
+    result = collection.query(
+        query_embeddings=[vector], n_results=1, where={"type": GENERATED_TYPE}, include=["embeddings", "metadatas"]
+    )
+    if not result["ids"][0]:
+        return None
+    stored = np.asarray(result["embeddings"][0][0], dtype=np.float32)
+    new = np.asarray(vector, dtype=np.float32)
+    norms = float(np.linalg.norm(stored) * np.linalg.norm(new))
+    similarity = float(np.dot(stored, new)) / norms if norms else 0.0
+    if similarity < DEDUP_SIMILARITY:
+        return None
+    return result["ids"][0][0], result["metadatas"][0][0]
+
+
+def _enforce_cap(collection, doc_type: str, cap: int) -> int:
+    """Delete the lowest-quality, least recently used documents of ``doc_type`` beyond ``cap``."""
+    stored = collection.get(where={"type": doc_type}, include=["metadatas"])
+    excess = len(stored["ids"]) - max(0, cap)
+    if excess <= 0:
+        return 0
+    # Examples without a quality score rank lowest; without a last use, oldest
+    ranked = sorted(
+        zip(stored["ids"], stored["metadatas"]),
+        key=lambda item: ((item[1] or {}).get("quality", 0.0), (item[1] or {}).get("last_used", 0.0)),
+    )
+    collection.delete(ids=[doc_id for doc_id, _ in ranked[:excess]])
+    metrics.STYLE_EXAMPLES.labels(outcome="evicted").inc(excess)
+    return excess
+
+
+def save_output_example(text: str, quality: Optional[float] = None) -> None:
+    """Store a generated report as an example, unless a near-identical one is stored already.
+
+    ``quality`` (higher is better) protects the example from eviction once the cap is reached.
+    """
     if not text or not text.strip():
         return
-    vs = _get_vectorstore()
-    # Tag as generated to allow filtering later
-    vs.add_texts([text], metadatas=[{"type": "generated_example"}])
-    vs.persist()
+    with metrics.timed(metrics.STYLE_MEMORY_LATENCY, operation="save_output_example"):
+        vector = _get_vectorstore().embeddings.embed_documents([text])[0]
+        flush_usage()  # so eviction sees this process's latest uses
+        while True:
+            vs = _get_vectorstore()
+            # Serialized across workers so concurrent saves neither both insert nor both evict
+            with _collection_lock():
+                # A compaction or re-embed may have swapped the collection before the lock was
+                # taken; reopen outside the lock, since opening can take it too
+                if vs is not _vectorstore or _file_identity(_GENERATION_PATH) != _vectorstore_generation:
+                    continue
+                duplicate = _nearest_duplicate(vs._collection, vector)
+                if duplicate is not None:
+                    _touch_examples(vs._collection, [duplicate[0]], [duplicate[1]], quality)
+                    metrics.STYLE_EXAMPLES.labels(outcome="duplicate").inc()
+                    return
+
+                now = time.time()
+                metadata = {"type": GENERATED_TYPE, "created_at": now, "last_used": now}
+                if quality is not None:
+                    metadata["quality"] = float(quality)
+                vs._collection.add(ids=[str(uuid.uuid4())], documents=[text], metadatas=[metadata], embeddings=[vector])
+                metrics.STYLE_EXAMPLES.labels(outcome="saved").inc()
+                _enforce_cap(vs._collection, GENERATED_TYPE, MAX_GENERATED_EXAMPLES)
+                break
+        bump_collection_version()
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def compact() -> dict:
+    """Apply the example cap, then rebuild the collection without the holes left by deletes."""
+    with metrics.timed(metrics.STYLE_MEMORY_LATENCY, operation="compact"):
+        flush_usage()
+        client = chromadb.PersistentClient(path=_get_persist_dir())
+        bytes_before = _dir_size(_get_persist_dir())
+        with _collection_lock():
+            collection = client.get_collection(COLLECTION_NAME)
+            evicted = _enforce_cap(collection, GENERATED_TYPE, MAX_GENERATED_EXAMPLES)
+            # Stored vectors are copied as they are, so keep the id of the model that made them
+            embedding_id = (collection.metadata or {}).get("embedding_id")
+            if embedding_id is None:
+                embedding_id = LEGACY_EMBEDDING_ID if collection.count() else style_embeddings.embedding_id()
+            documents = _rebuild(client, embedding_id)
+        bytes_after = _dir_size(_get_persist_dir())
+    logger.info(f"Compacted style memory: {documents} documents, {evicted} evicted, {bytes_before} -> {bytes_after} bytes")
+    if evicted and bytes_after >= bytes_before:
+        logger.warning(f"Style memory compaction evicted {evicted} documents but did not shrink the store")
+    return {"documents": documents, "evicted": evicted, "bytes_before": bytes_before, "bytes_after": bytes_after}
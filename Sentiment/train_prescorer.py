@@ -0,0 +1,63 @@
+"""Train the learned pre-scorer from stored LLM analyses.
+
+Pairs every employee's raw answers (responses_sentiment) with the percentages the LLM
+stored for them (responses_langchain_sentiment, complete analyses only: never the
+pre-scorer's own provisional results or failure fallbacks), fits per-token label means
+(prescorer.fit) and writes the model to PRESCORER_MODEL_PATH (default
+./models/prescorer.json), where prescorer.get_scorer() picks it up on the next start.
+
+    python train_prescorer.py [--min-count 3] [--out models/prescorer.json]
+"""
+import os
+import json
+import argparse
+
+import db_pool
+import main  # noqa: F401 - configures db_pool with the ForteAI connection settings
+import prescorer
+
+
+TRAINING_QUERY = """
+SELECT r.employeesID, r.positive_sentiment, r.negative_sentiment, rs.answer_text, rs.answer_choice
+FROM responses_langchain_sentiment r
+JOIN responses_sentiment rs ON rs.employeesID = r.employeesID
+WHERE r.analysis_status = 'complete'
+ORDER BY r.employeesID
+"""
+
+
+def load_documents():
+    documents = []
+    current, answers, labels = None, [], None
+    with db_pool.connection() as connection:
+        cursor = connection.cursor(buffered=False)
+        try:
+            cursor.execute(TRAINING_QUERY)
+            for employee_id, positive, negative, answer_text, answer_choice in cursor:
+                if employee_id != current:
+                    if answers:
+                        documents.append(("\n".join(answers), *labels))
+                    current, answers, labels = employee_id, [], (float(positive), float(negative))
+                answer = answer_text or answer_choice
+                if answer:
+                    answers.append(str(answer))
+        finally:
+            cursor.close()
+    if answers:
+        documents.append(("\n".join(answers), *labels))
+    return documents
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-count", type=int, default=3, help="ignore tokens seen in fewer employees")
+    parser.add_argument("--smoothing", type=float, default=5.0)
+    parser.add_argument("--out", default=prescorer.default_model_path())
+    args = parser.parse_args()
+
+    documents = load_documents()
+    model = prescorer.fit(documents, min_count=args.min_count, smoothing=args.smoothing)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(model, f)
+    print(f"Trained on {model['documents']} employees, {len(model['tokens'])} tokens -> {args.out}")
@@ -0,0 +1,401 @@
+"""Write-behind persistence for analysis results.
+
+With WRITE_BEHIND_ENABLED=true, request handlers append results to a durable local
+journal (SQLite in WAL mode, WRITE_BEHIND_DB_PATH, default ./journal/write_behind.sqlite3)
+and respond immediately. A background thread drains the journal in id order, handing
+up to WRITE_BEHIND_BATCH_SIZE entries (500) per kind to the registered flush handler,
+which writes them to MySQL in one transaction. Entries are deleted only after the
+flush commits; failed flushes are retried with exponential backoff (capped at
+WRITE_BEHIND_MAX_RETRY_DELAY seconds) and anything left in the file when a process
+stops is replayed by the next one.
+
+One entry that can never be written must not block the rest. When a batch fails with an
+error its handler registered as permanent (e.g. data too long), or contains an entry that
+has failed WRITE_BEHIND_MAX_ATTEMPTS (5) times, its entries are flushed one at a time:
+entries failing permanently, or failing that often while others go through, are moved to
+the dead_writes table (logged and counted in forteai_write_behind_dead_letters_total).
+While nothing goes through (the database is down) entries are only retried.
+
+Worker processes on one host share the journal file, but only one of them flushes at
+a time, so writes reach MySQL in the order they were accepted.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_writes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    claimed_by INTEGER
+);
+CREATE TABLE IF NOT EXISTS dead_writes (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    failed_at REAL NOT NULL
+);
+"""
+
+
+def _default_db_path() -> str:
+    base = os.path.join(os.path.dirname(__file__), "journal")
+    os.makedirs(base, exist_ok=True)
+    return os.path.join(base, "write_behind.sqlite3")
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WriteBehindJournal:
+    """Durable append-only journal flushed to the database by one background thread."""
+
+    def __init__(self, db_path: str, batch_size: int = 500, flush_interval: float = 0.5,
+                 max_retry_delay: float = 60.0, max_attempts: int = 5):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max(1, max_attempts)
+
+        self._handlers: Dict[str, Callable[[List[dict]], object]] = {}
+        self._permanent_errors: Dict[str, Tuple[Type[BaseException], ...]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(threading.Lock())
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._retry_delay = 0.0
+
+        self._flushed = 0
+        self._flush_batches = 0
+        self._flush_failures = 0
+        self._dead_letters = 0
+        self._flush_time_total = 0.0
+        self._flush_time_max = 0.0
+        self._last_flush_ms = 0.0
+        self._last_error: Optional[str] = None
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        if db_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Every append must survive a crash once the caller has been acknowledged
+            self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(_SCHEMA)
+
+    # ---------- storage helpers ----------
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _claim_batch(self) -> List[sqlite3.Row]:
+        """Claim the oldest entries, unless another live process is flushing the journal."""
+        pid = os.getpid()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                holders = {
+                    row[0] for row in self._conn.execute(
+                        "SELECT DISTINCT claimed_by FROM pending_writes WHERE claimed_by IS NOT NULL"
+                    )
+                }
+                live_others = {p for p in holders if p != pid and _pid_alive(p)}
+                if live_others:
+                    self._conn.execute("COMMIT")
+                    return []
+                # Claims left by dead processes (or by ourselves before a failed flush) are taken over
+                rows = self._conn.execute(
+                    "SELECT id, kind, payload, attempts FROM pending_writes ORDER BY id LIMIT ?", (self.batch_size,)
+                ).fetchall()
+                if rows:
+                    self._conn.execute(
+                        "UPDATE pending_writes SET claimed_by = ? WHERE id <= ?", (pid, rows[-1][0])
+                    )
+                self._conn.execute("COMMIT")
+                return rows
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # ---------- flushing ----------
+    def _write(self, kind: str, payloads: List[str]) -> None:
+        handler = self._handlers.get(kind)
+        if handler is None:
+            raise RuntimeError(f"No flush handler registered for '{kind}'")
+        handler([json.loads(payload) for payload in payloads])
+
+    def _is_permanent(self, kind: str, error: Exception) -> bool:
+        # A payload that does not decode never will
+        return isinstance(error, (json.JSONDecodeError, *self._permanent_errors.get(kind, ())))
+
+    def _release(self, ids: List[int], error: Exception) -> None:
+        self._execute(
+            f"UPDATE pending_writes SET attempts = attempts + 1, last_error = ?, claimed_by = NULL "
+            f"WHERE id IN ({', '.join('?' * len(ids))})",
+            (str(error), *ids),
+        )
+
+    def _back_off(self, count: int, error: Exception) -> None:
+        self._flush_failures += 1
+        self._last_error = str(error)
+        self._retry_delay = min(self.max_retry_delay, max(1.0, self._retry_delay * 2))
+        logger.warning(f"Write-behind flush of {count} entries failed, retrying in {self._retry_delay:.0f}s: {error}")
+
+    def _dead_letter(self, row: sqlite3.Row, error: Exception) -> None:
+        entry_id, kind, _, attempts = row
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dead_writes (id, kind, payload, created_at, attempts, last_error, failed_at) "
+                    "SELECT id, kind, payload, created_at, ?, ?, ? FROM pending_writes WHERE id = ?",
+                    (attempts + 1, str(error), time.time(), entry_id),
+                )
+                self._conn.execute("DELETE FROM pending_writes WHERE id = ?", (entry_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._dead_letters += 1
+        metrics.WRITE_BEHIND_DEAD_LETTERS.labels(kind=kind).inc()
+        logger.error(f"Write-behind entry {entry_id} ({kind}) moved to dead_writes after {attempts + 1} attempts: {error}")
+
+    def _record_flush(self, ids: List[int], elapsed: float) -> None:
+        self._execute(f"DELETE FROM pending_writes WHERE id IN ({', '.join('?' * len(ids))})", ids)
+        self._flushed += len(ids)
+        self._flush_batches += 1
+        self._flush_time_total += elapsed
+        self._flush_time_max = max(self._flush_time_max, elapsed)
+        self._last_flush_ms = elapsed * 1000
+
+    def _flush_once(self) -> int:
+        rows = self._claim_batch()
+        if not rows:
+            return 0
+        if max(row[3] for row in rows) >= self.max_attempts:
+            return self._flush_isolated(rows)
+
+        ids = [row[0] for row in rows]
+        by_kind: Dict[str, List[str]] = {}
+        for _, kind, payload, _ in rows:
+            by_kind.setdefault(kind, []).append(payload)
+
+        start = time.monotonic()
+        try:
+            for kind, payloads in by_kind.items():
+                self._write(kind, payloads)
+        except Exception as e:
+            if any(self._is_permanent(kind, e) for kind in by_kind):
+                logger.warning(f"Write-behind flush of {len(ids)} entries failed permanently, isolating the bad entries: {e}")
+                return self._flush_isolated(rows)
+            self._release(ids, e)
+            self._back_off(len(ids), e)
+            return 0
+
+        elapsed = time.monotonic() - start
+        self._record_flush(ids, elapsed)
+        self._retry_delay = 0.0
+        logger.info(f"Write-behind flushed {len(ids)} entries in {elapsed * 1000:.0f} ms")
+        return len(ids)
+
+    def _flush_isolated(self, rows: List[sqlite3.Row]) -> int:
+        """Flush the entries one at a time, dead-lettering those that cannot be written."""
+        flushed = 0
+        failed = []
+        for row in rows:
+            entry_id, kind, payload, _ = row
+            start = time.monotonic()
+            try:
+                self._write(kind, [payload])
+            except Exception as e:
+                if self._is_permanent(kind, e):
+                    self._dead_letter(row, e)
+                else:
+                    failed.append((row, e))
+                continue
+            self._record_flush([entry_id], time.monotonic() - start)
+            flushed += 1
+
+        for row, error in failed:
+            # Others going through shows the database is reachable, so this entry is at fault
+            if flushed and row[3] + 1 >= self.max_attempts:
+                self._dead_letter(row, error)
+            else:
+                self._release([row[0]], error)
+        if failed and not flushed:
+            self._back_off(len(failed), failed[0][1])
+        else:
+            self._retry_delay = 0.0
+        if flushed:
+            logger.info(f"Write-behind flushed {flushed} of {len(rows)} entries one at a time")
+        return flushed
+
+    def _flush_loop(self) -> None:
+        while True:
+            try:
+                flushed = self._flush_once()
+            except Exception as e:
+                logger.error(f"Write-behind flusher error: {e}")
+                flushed = 0
+            if self._stopping and (not flushed or self._retry_delay):
+                return
+            if flushed == self.batch_size:
+                continue
+            with self._wakeup:
+                self._wakeup.wait(self._retry_delay or self.flush_interval)
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._flush_loop, name="write-behind-flusher", daemon=True)
+            self._thread.start()
+
+    # ---------- public API ----------
+    def register(self, kind: str, handler: Callable[[List[dict]], object],
+                 permanent_errors: Tuple[Type[BaseException], ...] = ()) -> None:
+        self._handlers[kind] = handler
+        self._permanent_errors[kind] = tuple(permanent_errors)
+
+    def append_many(self, kind: str, payloads: List[dict]) -> None:
+        """Durably journal the payloads in one SQLite transaction."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO pending_writes (kind, payload, created_at) VALUES (?, ?, ?)",
+                    [(kind, json.dumps(payload, default=str), now) for payload in payloads],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def append(self, kind: str, payload: dict) -> None:
+        self.append_many(kind, [payload])
+
+    def stats(self) -> Dict[str, object]:
+        depth, oldest, max_attempts = self._execute(
+            "SELECT COUNT(*), MIN(created_at), MAX(attempts) FROM pending_writes"
+        ).fetchone()
+        dead = self._execute("SELECT COUNT(*) FROM dead_writes").fetchone()[0]
+        return {
+            "depth": depth,
+            "dead_letters": dead,
+            "oldest_age_s": round(time.time() - oldest, 1) if oldest else 0.0,
+            "max_attempts": max_attempts or 0,
+            "flushed": self._flushed,
+            "flush_batches": self._flush_batches,
+            "flush_failures": self._flush_failures,
+            "dead_lettered": self._dead_letters,
+            "flush_latency_avg_ms": round(self._flush_time_total / self._flush_batches * 1000, 2)
+            if self._flush_batches else 0.0,
+            "flush_latency_max_ms": round(self._flush_time_max * 1000, 2),
+            "last_flush_ms": round(self._last_flush_ms, 2),
+            "retry_delay_s": self._retry_delay,
+            "last_error": self._last_error,
+        }
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Flush what is pending (until the database fails or timeout) and stop the thread."""
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        remaining = self.stats()["depth"]
+        if remaining:
+            logger.warning(f"Write-behind stopped with {remaining} entries left in {self.db_path}; they will be replayed on restart")
+
+
+_journal: Optional[WriteBehindJournal] = None
+_journal_pid: Optional[int] = None
+_journal_lock = threading.Lock()
+_handlers: Dict[str, Tuple[Callable[[List[dict]], object], Tuple[Type[BaseException], ...]]] = {}
+
+
+def enabled() -> bool:
+    return os.getenv("WRITE_BEHIND_ENABLED", "False").lower() == "true"
+
+
+def register(kind: str, handler: Callable[[List[dict]], object],
+             permanent_errors: Tuple[Type[BaseException], ...] = ()) -> None:
+    """Register the batch flush handler for an entry kind, called as ``handler(payloads)``.
+
+    ``permanent_errors`` are exception types that retrying cannot fix (bad data); entries
+    failing with them are moved to the dead-letter table instead of being retried.
+    """
+    _handlers[kind] = (handler, tuple(permanent_errors))
+    if _journal is not None:
+        _journal.register(kind, handler, permanent_errors)
+
+
+def get_journal() -> WriteBehindJournal:
+    """Return the process-wide journal, creating it lazily (and again after a fork)."""
+    global _journal, _journal_pid
+    pid = os.getpid()
+    if _journal is not None and _journal_pid == pid:
+        return _journal
+
+    with _journal_lock:
+        if _journal is None or _journal_pid != pid:
+            _journal = WriteBehindJournal(
+                os.getenv("WRITE_BEHIND_DB_PATH") or _default_db_path(),
+                batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 500)),
+                flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 0.5)),
+                max_retry_delay=float(os.getenv("WRITE_BEHIND_MAX_RETRY_DELAY", 60)),
+                max_attempts=int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", 5)),
+            )
+            for kind, (handler, permanent_errors) in _handlers.items():
+                _journal.register(kind, handler, permanent_errors)
+            _journal_pid = pid
+            # Replays whatever a previous run left in the journal
+            _journal.start()
+            logger.info(f"Write-behind journal ready at {_journal.db_path}")
+    return _journal
+
+
+def append_many(kind: str, payloads: List[dict]) -> None:
+    get_journal().append_many(kind, payloads)
+
+
+def append(kind: str, payload: dict) -> None:
+    get_journal().append(kind, payload)
+
+
+def journal_stats() -> Dict[str, object]:
+    if not enabled():
+        return {"enabled": False}
+    return dict(get_journal().stats(), enabled=True)
+
+
+def shutdown(timeout: Optional[float] = None) -> None:
+    """Flush and stop this process's journal (no-op if it never started one)."""
+    if _journal is not None and _journal_pid == os.getpid():
+        _journal.shutdown(timeout)
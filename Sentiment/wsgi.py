@@ -0,0 +1,8 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing main here loads Flask, LangChain and the MySQL driver once in the gunicorn
+master (preload_app) so forked workers share those pages instead of importing them again.
+"""
+from main import app, init_worker, shutdown_worker  # noqa: F401